@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app import crud, schemas
+from app.core.database import AsyncReadSessionLocal, get_async_read_db
+from app.services.batch_service import BatchService, item_record
+from app.services.workflow_execution_service import WorkflowExecutionService, WorkflowNotFoundError
+from app.services.workflow_graph import WorkflowGraphError
+from app.utils.streaming import check_order, ndjson_response
+
+router = APIRouter(prefix="/batches", tags=["batches"])
+
+async def _batch_with_counts(db: AsyncSession, batch_id: int):
+    batch = await crud.batch_crud.get_batch(db, batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    result = schemas.WorkflowBatch.model_validate(batch)
+    result.counts = await crud.batch_crud.get_status_counts(db, batch_id)
+    return result
+
+@router.get("/{batch_id}", response_model=schemas.WorkflowBatch)
+async def read_batch(batch_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    return await _batch_with_counts(db, batch_id)
+
+@router.post("/{batch_id}/resume")
+async def resume_batch(batch_id: int, order: str = "completion", concurrency: Optional[int] = None,
+                       db: AsyncSession = Depends(get_async_read_db)):
+    """
+    继续执行尚未完成的条目（例如客户端断开或服务重启后），只返回本次执行的结果
+    批次正在执行或已完成时返回409
+    """
+    ordered = check_order(order)
+    batch = await crud.batch_crud.get_batch(db, batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    if batch.status == crud.batch_crud.COMPLETED:
+        raise HTTPException(status_code=409, detail="Batch already completed")
+    try:
+        await WorkflowExecutionService(db).load_plan(batch.workflow_id)
+    except WorkflowGraphError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WorkflowNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    service = BatchService()
+    # 领取使用带状态条件的 UPDATE，同时继续同一批次的请求只有一个会成功
+    if not await service.claim_batch(batch_id):
+        raise HTTPException(status_code=409, detail="Batch is already running or completed")
+    return ndjson_response(service.run_batch(batch_id, ordered, concurrency), headers={"X-Batch-Id": str(batch_id)})
+
+@router.get("/{batch_id}/results")
+async def read_batch_results(batch_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    """按输入顺序以NDJSON返回全部条目（包括未完成的条目）"""
+    if await crud.batch_crud.get_batch(db, batch_id) is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    async def generate():
+        async with AsyncReadSessionLocal() as session:
+            async for item in crud.batch_crud.stream_items(session, batch_id):
+                yield item_record(item.item_index, item.input_data, item.status, item.output, item.error,
+                                  item.execution_id)
+
+    return ndjson_response(generate())
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+import os
+from app.utils.blob_store import MEDIA_TYPES, blob_store
+
+router = APIRouter(prefix="/blobs", tags=["blobs"])
+
+@router.get("/{digest}")
+def read_blob(digest: str):
+    """下载节点输出块（执行时传入 blobs=true 得到的完整模型响应）"""
+    # find 只接受 SHA-256 摘要，避免路径穿越
+    path = blob_store.find(digest)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return FileResponse(path, media_type=MEDIA_TYPES[os.path.splitext(path)[1]])
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app import crud, schemas
+from app.core.database import get_async_read_db
+
+router = APIRouter(prefix="/history", tags=["history"])
+
+@router.get("/executions", response_model=List[schemas.ExecutionRecord])
+async def read_executions(workflow_id: Optional[int] = None, limit: int = 100,
+                          db: AsyncSession = Depends(get_async_read_db)):
+    return await crud.history_crud.get_executions(db, workflow_id, limit)
+
+@router.get("/executions/{execution_id}", response_model=schemas.ExecutionDetail)
+async def read_execution(execution_id: str, db: AsyncSession = Depends(get_async_read_db)):
+    execution = await crud.history_crud.get_execution(db, execution_id)
+    if execution is None:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    detail = schemas.ExecutionDetail.model_validate(execution)
+    detail.nodes = await crud.history_crud.get_node_executions(db, execution_id)
+    return detail
+
+@router.get("/slowest-workflows", response_model=List[schemas.WorkflowLatencyStats])
+async def read_slowest_workflows(limit: int = 20, db: AsyncSession = Depends(get_async_read_db)):
+    """按平均总耗时倒序"""
+    return await crud.history_crud.slowest_workflows(db, limit)
+
+@router.get("/slowest-nodes", response_model=List[schemas.NodeLatencyStats])
+async def read_slowest_nodes(limit: int = 20, db: AsyncSession = Depends(get_async_read_db)):
+    """按平均模型调用耗时倒序，用于找出最慢的提示"""
+    return await crud.history_crud.slowest_nodes(db, limit)
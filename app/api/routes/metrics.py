@@ -0,0 +1,89 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.database import async_engine, async_read_engine, engine
+from app.services.execution_history import execution_history
+from app.services.execution_plan import plan_cache
+from app.services.model_service import get_model_service
+from app.services.node_executors import get_executor
+from app.services.run_queue import run_queue
+from app.services.workflow_cache import workflow_response_cache
+from app.services.write_queue import write_queue
+from app.utils.blob_store import blob_store
+from app.utils.metrics import registry
+from app.utils.resilience import CircuitBreaker
+
+router = APIRouter(tags=["metrics"])
+
+BREAKER_STATES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+def collect_runtime_metrics():
+    """
+    抓取时读取各组件已有的统计，不在热路径上额外计数
+    """
+    service = get_model_service()
+    yield ("workflow_runs_active", "gauge", "Background runs being executed by this process",
+           [({}, run_queue.active_runs)])
+    yield ("execution_history_buffered", "gauge", "Execution records waiting to be written",
+           [({}, len(execution_history._runs))])
+    yield ("execution_history_records_total", "counter", "Execution history records by outcome",
+           [({"outcome": key}, value) for key, value in execution_history.stats.items()])
+    yield ("plan_cache_entries", "gauge", "Compiled workflow plans in the cache", [({}, len(plan_cache))])
+    yield ("workflow_response_cache_entries", "gauge", "Serialized workflow responses in the cache",
+           [({}, len(workflow_response_cache))])
+    yield ("workflow_response_cache_events_total", "counter", "Workflow reads served from the cache, serialized, or answered with 304",
+           [({"event": key}, workflow_response_cache.stats[key]) for key in ("hits", "misses", "not_modified")])
+    yield ("blob_store_events_total", "counter", "Node outputs kept in memory, spilled to disk, deduplicated and pruned",
+           [({"event": key}, blob_store.stats[key]) for key in ("inline", "spilled", "deduplicated", "pruned")])
+    yield ("blob_store_spilled_bytes_total", "counter", "Bytes of node outputs written to disk",
+           [({}, blob_store.stats["spilled_bytes"])])
+    code_runner = get_executor("code").runner
+    yield ("code_node_runs_total", "counter", "Code node executions in the process pool, errors, timeouts and pool restarts",
+           [({"event": key}, code_runner.stats[key]) for key in ("runs", "errors", "timeouts", "restarts")])
+
+    engines = {"sync": engine, "async": async_engine.sync_engine}
+    if async_read_engine is not async_engine:
+        engines["async_read"] = async_read_engine.sync_engine
+    pools = [(name, db_engine.pool) for name, db_engine in engines.items() if hasattr(db_engine.pool, "checkedout")]
+    yield ("db_pool_connections_in_use", "gauge", "Pooled database connections checked out",
+           [({"engine": name}, pool.checkedout()) for name, pool in pools])
+    yield ("db_pool_connections_idle", "gauge", "Pooled database connections available for reuse",
+           [({"engine": name}, pool.checkedin()) for name, pool in pools])
+    if write_queue.running:
+        yield ("write_queue_pending", "gauge", "Writes waiting for the group-commit writer", [({}, write_queue.pending)])
+        yield ("write_queue_events_total", "counter", "Group-commit writer counters",
+               [({"event": key}, write_queue.stats[key]) for key in ("operations", "failed", "commits", "commit_errors")])
+
+    single_flight = service.single_flight
+    yield ("model_single_flight_in_flight", "gauge", "Distinct model calls in flight", [({}, single_flight.in_flight_count)])
+    yield ("model_single_flight_total", "counter", "Model calls started and calls joined to an in-flight call",
+           [({"kind": key}, value) for key, value in single_flight.stats.items()])
+
+    if service.cache is not None:
+        stats = service.cache.get_stats()
+        yield ("llm_cache_events_total", "counter", "Model response cache events",
+               [({"event": key}, stats[key]) for key in ("memory_hits", "disk_hits", "misses", "stores", "evictions")])
+        yield ("llm_cache_memory_entries", "gauge", "Model responses in the in-memory cache",
+               [({}, stats["memory_entries"])])
+
+    governor = service.qwen_client.governor
+    if governor is not None:
+        stats = governor.get_stats()
+        yield ("qwen_governor_concurrency_limit", "gauge", "Adaptive concurrency limit for model calls",
+               [({}, stats["limit"])])
+        yield ("qwen_governor_in_flight", "gauge", "Model calls holding a governor permit", [({}, stats["in_flight"])])
+        yield ("qwen_governor_waiting", "gauge", "Model calls waiting for a governor permit", [({}, stats["waiting"])])
+        yield ("qwen_governor_events_total", "counter", "Governor events",
+               [({"event": key}, stats[key]) for key in ("requests", "rate_limited", "decreases")])
+
+    resilience = service.qwen_client.resilience
+    yield ("qwen_resilience_events_total", "counter", "Retry, hedging and failure counters of model calls",
+           [({"event": key}, value) for key, value in resilience.stats.items()])
+    yield ("qwen_circuit_breaker_state", "gauge", "Circuit breaker state (0 closed, 1 half open, 2 open)",
+           [({}, BREAKER_STATES[resilience.breaker.state])])
+
+registry.register_collector(collect_runtime_metrics)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics():
+    """Prometheus 文本格式的指标"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from app.services.model_service import ModelService
+from app.services.model_service import ModelService, get_model_service
 from typing import Optional
 
 router = APIRouter(prefix="/models", tags=["models"])
@@ -9,18 +9,41 @@ class ModelRequest(BaseModel):
     prompt: str
     max_tokens: Optional[int] = 1024
     temperature: Optional[float] = 0.8
+    # 为False时跳过响应缓存
+    use_cache: Optional[bool] = True
 
 class ModelResponse(BaseModel):
     success: bool
     data: Optional[dict] = None
     error: Optional[str] = None
+    cached: bool = False
 
 @router.post("/qwen-plus", response_model=ModelResponse)
-async def call_qwen_plus(request: ModelRequest):
-    service = ModelService()
+async def call_qwen_plus(request: ModelRequest, service: ModelService = Depends(get_model_service)):
     result = await service.process_with_qwen_plus(
         prompt=request.prompt,
         max_tokens=request.max_tokens,
-        temperature=request.temperature
+        temperature=request.temperature,
+        use_cache=request.use_cache
     )
-    return ModelResponse(**result)
\ No newline at end of file
+    return ModelResponse(**result)
+
+@router.get("/cache/stats")
+def get_cache_stats(service: ModelService = Depends(get_model_service)):
+    """模型响应缓存的命中统计"""
+    if service.cache is None:
+        return {"enabled": False}
+    return dict(service.cache.get_stats(), enabled=True)
+
+@router.get("/governor/stats")
+def get_governor_stats(service: ModelService = Depends(get_model_service)):
+    """出站调度器的当前并发上限、排队数量和429统计"""
+    governor = service.qwen_client.governor
+    if governor is None:
+        return {"enabled": False}
+    return dict(governor.get_stats(), enabled=True)
+
+@router.get("/resilience/stats")
+def get_resilience_stats(service: ModelService = Depends(get_model_service)):
+    """重试、对冲请求和熔断器的统计"""
+    return service.qwen_client.resilience.get_stats()
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from typing import List
+import os
+import re
+from app.utils.profiling import list_profiles, profile_path
+
+router = APIRouter(prefix="/profiles", tags=["profiles"])
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9A-Za-z-]+$")
+
+def _existing_path(profile_id: str, suffix: str) -> str:
+    # 只接受剖析结果ID，避免路径穿越
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    path = profile_path(profile_id, suffix)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return path
+
+@router.get("/", response_model=List[str])
+def read_profiles():
+    """已保存的剖析结果ID，最新的在前"""
+    return list_profiles()
+
+@router.get("/{profile_id}")
+def read_profile(profile_id: str):
+    """剖析结果：耗时摘要、span 时间线（traceEvents 可在 chrome://tracing 或 Perfetto 中打开）和耗时最多的函数"""
+    return FileResponse(_existing_path(profile_id, ".json"), media_type="application/json")
+
+@router.get("/{profile_id}/pstats")
+def download_pstats(profile_id: str):
+    """下载 cProfile 结果（pstats 格式，可用 snakeviz 等工具查看）"""
+    return FileResponse(_existing_path(profile_id, ".prof"), media_type="application/octet-stream",
+                        filename=f"{profile_id}.prof")
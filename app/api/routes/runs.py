@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+from app import crud, schemas
+from app.core.database import AsyncReadSessionLocal, get_async_read_db
+from app.services.run_queue import run_queue
+from app.utils.streaming import format_sse
+
+router = APIRouter(prefix="/runs", tags=["runs"])
+
+def _final_event(run):
+    data = schemas.WorkflowRun.model_validate(run).model_dump(mode="json")
+    return ("run-failed" if run.status == crud.run_crud.FAILED else "run-finished"), data
+
+@router.get("/{run_id}", response_model=schemas.WorkflowRun)
+async def read_run(run_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    run = await crud.run_crud.get_run(db, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run
+
+@router.get("/{run_id}/events")
+async def subscribe_run(run_id: int):
+    """
+    以Server-Sent Events订阅运行进度
+    先返回当前状态（run-status），由当前进程执行时推送节点事件，最后返回 run-finished 或 run-failed
+    """
+    # 先订阅再读取状态，避免两者之间运行结束而错过最终事件
+    queue = run_queue.subscribe(run_id)
+    async with AsyncReadSessionLocal() as db:
+        run = await crud.run_crud.get_run(db, run_id)
+    if run is None:
+        run_queue.unsubscribe(run_id, queue)
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    async def event_stream():
+        try:
+            yield format_sse("run-status", schemas.WorkflowRun.model_validate(run).model_dump(mode="json"))
+            if run.status in crud.run_crud.FINISHED_STATUSES:
+                yield format_sse(*_final_event(run))
+                return
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), run_queue.poll_interval)
+                except asyncio.TimeoutError:
+                    # 运行可能由其他进程执行，定期从数据库确认状态
+                    async with AsyncReadSessionLocal() as db:
+                        current = await crud.run_crud.get_run(db, run_id)
+                    if current is not None and current.status in crud.run_crud.FINISHED_STATUSES:
+                        yield format_sse(*_final_event(current))
+                        return
+                    continue
+                yield format_sse(event, data)
+                if event in ("run-finished", "run-failed"):
+                    return
+        finally:
+            run_queue.unsubscribe(run_id, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
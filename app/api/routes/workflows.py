@@ -1,52 +1,299 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+import json
+import logging
 from app import crud, schemas
-from app.core.database import get_db
-from app.services.workflow_execution_service import WorkflowExecutionService
+from app.core.config import settings
+from app.core.database import AsyncReadSessionLocal, get_async_db, get_async_read_db
+from app.services.batch_service import BatchService
+from app.services.run_queue import run_queue
+from app.services.workflow_execution_service import WorkflowExecutionService, WorkflowNotFoundError
+from app.services.workflow_cache import workflow_response_cache
+from app.services.workflow_graph import WorkflowGraphError
+from app.utils.batch_input import detect_format, parse_batch_input
+from app.utils.json_patch import JsonPatchError
+from app.utils.profiling import span
+from app.utils.streaming import check_order, format_sse, ndjson_response
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/workflows", tags=["workflows"])
 
+async def _list_workflows(db: AsyncSession, response: Response, skip: int, limit: int,
+                          cursor: Optional[str], summary: bool):
+    try:
+        workflows = await crud.async_workflow_crud.get_workflows(
+            db, skip=skip, limit=limit, cursor=cursor, summary=summary
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # 满页时通过响应头返回下一页游标
+    if limit and len(workflows) == limit:
+        response.headers["X-Next-Cursor"] = crud.workflow_crud.encode_cursor(workflows[-1])
+    return workflows
+
 @router.get("/", response_model=List[schemas.Workflow])
-def read_workflows(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    workflows = crud.workflow_crud.get_workflows(db, skip=skip, limit=limit)
-    print(f"Fetched {len(workflows)} workflows")  # 添加调试日志
+async def read_workflows(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                         db: AsyncSession = Depends(get_async_read_db)):
+    workflows = await _list_workflows(db, response, skip, limit, cursor, summary=False)
+    logger.debug(f"Fetched {len(workflows)} workflows")
     return workflows
 
+@router.get("/summary", response_model=List[schemas.WorkflowSummary])
+async def read_workflow_summaries(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                                  db: AsyncSession = Depends(get_async_read_db)):
+    """轻量列表，不包含任务和描述"""
+    return await _list_workflows(db, response, skip, limit, cursor, summary=True)
+
+@router.get("/export")
+async def export_workflows():
+    """以NDJSON流式导出全部工作流，每行一个工作流，可直接用于批量导入"""
+    async def generate():
+        # 使用独立会话，保证在整个流式响应期间游标有效
+        async with AsyncReadSessionLocal() as db:
+            async for row in crud.async_workflow_crud.stream_workflows_for_export(db, settings.EXPORT_BATCH_SIZE):
+                yield json.dumps({
+                    "id": row.id,
+                    "name": row.name,
+                    "description": row.description,
+                    "created_at": row.created_at.isoformat() if row.created_at else None,
+                    "updated_at": row.updated_at.isoformat() if row.updated_at else None
+                }, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @router.get("/{workflow_id}", response_model=schemas.Workflow)
-def read_workflow(workflow_id: int, db: Session = Depends(get_db)):
-    db_workflow = crud.workflow_crud.get_workflow(db, workflow_id=workflow_id)
-    if db_workflow is None:
+async def read_workflow(workflow_id: int, if_none_match: Optional[str] = Header(None),
+                        accept_encoding: Optional[str] = Header(None), db: AsyncSession = Depends(get_async_read_db)):
+    """
+    获取工作流详情，响应带有强ETag（与 PATCH 的 If-Match 使用同一版本）
+    If-None-Match 与当前版本一致时返回304；序列化后的响应按版本缓存，
+    工作流未变化时只查询 updated_at，不加载任务也不经过 Pydantic 校验，较大的响应返回缓存的 gzip 压缩结果
+    """
+    with span("crud.get_workflow_version", workflow_id=workflow_id):
+        version = await crud.async_workflow_crud.get_workflow_version(db, workflow_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Workflow not found")
-    return db_workflow
+    headers = {"ETag": _workflow_etag(version), "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if if_none_match is not None and _etag_matches(if_none_match, headers["ETag"], weak=True):
+        workflow_response_cache.stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+
+    cached = workflow_response_cache.get(workflow_id, version.updated_at)
+    if cached is None:
+        generation = workflow_response_cache.generation
+        with span("crud.get_workflow", workflow_id=workflow_id):
+            db_workflow = await crud.async_workflow_crud.get_workflow(db, workflow_id=workflow_id)
+        if db_workflow is None:
+            raise HTTPException(status_code=404, detail="Workflow not found")
+        cached = workflow_response_cache.put(db_workflow, generation)
+        # 两次查询之间工作流可能已被修改，ETag 以实际返回的版本为准
+        headers["ETag"] = _workflow_etag(db_workflow)
+    return cached.response(accept_encoding, headers)
 
 @router.post("/", response_model=schemas.Workflow)
-def create_workflow(workflow: schemas.WorkflowCreate, db: Session = Depends(get_db)):
-    print(f"Creating workflow with data: {workflow}")  # 添加调试日志
-    return crud.workflow_crud.create_workflow(db=db, workflow=workflow)
+async def create_workflow(workflow: schemas.WorkflowCreate, db: AsyncSession = Depends(get_async_db)):
+    logger.debug(f"Creating workflow with data: {workflow}")
+    return await crud.async_workflow_crud.create_workflow(db=db, workflow=workflow)
+
+@router.post("/bulk")
+async def bulk_create_workflows(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    批量导入工作流，请求体为NDJSON（每行一个 {"name": ..., "description": ...}）
+    按 BULK_BATCH_SIZE 分批在独立事务中批量写入；某行非法时停止导入，已提交的批次保留
+    """
+    created_ids = []
+    # 尚未解析的 (行号, 行内容)，每 BULK_BATCH_SIZE 行解析并写入一次
+    pending = []
+    buffer = b""
+    line_number = 0
+
+    async def flush():
+        batch, error = [], None
+        with span("json.parse", rows=len(pending)):
+            for number, line in pending:
+                try:
+                    batch.append(schemas.WorkflowCreate.model_validate_json(line))
+                except ValueError as e:
+                    error = (number, e)
+                    break
+        pending.clear()
+        if batch:
+            with span("crud.bulk_create_workflows", rows=len(batch)):
+                created_ids.extend(await crud.async_workflow_crud.bulk_create_workflows(db, batch))
+        if error is not None:
+            # 非法行之前的行已经写入
+            raise HTTPException(status_code=422, detail={
+                "line": error[0],
+                "error": str(error[1]),
+                "created": len(created_ids),
+                "ids": created_ids
+            })
+
+    async def handle(line: bytes):
+        nonlocal line_number
+        line_number += 1
+        if not line.strip():
+            return
+        pending.append((line_number, line))
+        if len(pending) >= settings.BULK_BATCH_SIZE:
+            await flush()
+
+    # 逐块读取请求体，避免一次性加载全部内容
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            await handle(line)
+    await handle(buffer)
+    await flush()
+    return {"created": len(created_ids), "ids": created_ids}
 
 @router.put("/{workflow_id}", response_model=schemas.Workflow)
-def update_workflow_route(workflow_id: int, workflow: schemas.WorkflowUpdate, db: Session = Depends(get_db)):
+async def update_workflow_route(workflow_id: int, workflow: schemas.WorkflowUpdate,
+                                accept_encoding: Optional[str] = Header(None), db: AsyncSession = Depends(get_async_db)):
+    """
+    更新工作流，响应带有新的 ETag；序列化结果放入详情缓存，随后的 GET 直接命中
+    """
     # 修复：将参数类型从 WorkflowCreate 改为 WorkflowUpdate
-    db_workflow = crud.workflow_crud.update_workflow(db, workflow_id, workflow)
+    with span("crud.update_workflow", workflow_id=workflow_id):
+        db_workflow = await crud.async_workflow_crud.update_workflow(db, workflow_id, workflow)
+    if db_workflow is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    cached = workflow_response_cache.put(db_workflow, workflow_response_cache.generation)
+    headers = {"ETag": _workflow_etag(db_workflow), "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    return cached.response(accept_encoding, headers)
+
+def _workflow_etag(workflow) -> str:
+    """根据 updated_at 生成强ETag"""
+    version = workflow.updated_at.strftime("%Y%m%d%H%M%S%f") if workflow.updated_at else "0"
+    return f'"{workflow.id}-{version}"'
+
+def _etag_matches(header: str, etag: str, weak: bool = False) -> bool:
+    """
+    :param weak: 为True时使用弱比较（忽略 W/ 前缀），用于 If-None-Match；If-Match 使用强比较
+    """
+    candidates = [value.strip() for value in header.split(",")]
+    if weak:
+        candidates = [value[2:] if value.startswith("W/") else value for value in candidates]
+    return "*" in candidates or etag in candidates
+
+@router.patch("/{workflow_id}")
+async def patch_workflow_route(workflow_id: int, response: Response, operations: List[dict] = Body(...),
+                               if_match: Optional[str] = Header(None), db: AsyncSession = Depends(get_async_db)):
+    """
+    使用 RFC 6902 JSON Patch 局部更新工作流，文档结构为 {"name": ..., "graph": {"nodes": [...], "edges": [...]}}
+    提供 If-Match 时进行乐观并发检查，版本不一致返回412；只返回变化的片段
+    """
+    db_workflow = await crud.async_workflow_crud.get_workflow(db, workflow_id, with_tasks=False)
     if db_workflow is None:
         raise HTTPException(status_code=404, detail="Workflow not found")
-    return db_workflow
+    expected_updated_at = None
+    if if_match is not None:
+        if not _etag_matches(if_match, _workflow_etag(db_workflow)):
+            raise HTTPException(status_code=412, detail="Workflow has been modified",
+                                headers={"ETag": _workflow_etag(db_workflow)})
+        expected_updated_at = db_workflow.updated_at
+
+    try:
+        patched = await crud.async_workflow_crud.patch_workflow(db, workflow_id, operations, expected_updated_at)
+    except JsonPatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except crud.workflow_crud.WorkflowVersionConflict as e:
+        raise HTTPException(status_code=412, detail=str(e))
+    if patched is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+
+    db_workflow, changes = patched
+    etag = _workflow_etag(db_workflow)
+    response.headers["ETag"] = etag
+    return {
+        "id": db_workflow.id,
+        "updated_at": db_workflow.updated_at,
+        "etag": etag,
+        "changes": changes
+    }
 
 @router.delete("/{workflow_id}")
-def delete_workflow_route(workflow_id: int, db: Session = Depends(get_db)):
-    db_workflow = crud.workflow_crud.delete_workflow(db, workflow_id)
+async def delete_workflow_route(workflow_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_workflow = await crud.async_workflow_crud.delete_workflow(db, workflow_id)
     if db_workflow is None:
         raise HTTPException(status_code=404, detail="Workflow not found")
     return {"message": "Workflow deleted successfully"}
 
 @router.post("/{workflow_id}/execute")
-async def execute_workflow(workflow_id: int, input_data: Optional[str] = None, db: Session = Depends(get_db)):
+async def execute_workflow(workflow_id: int, input_data: Optional[str] = None, use_cache: bool = True,
+                           blobs: bool = False, db: AsyncSession = Depends(get_async_read_db)):
+    """执行工作流，每个节点只返回提取出的文本；blobs=true 时额外返回完整模型响应的下载链接"""
     service = WorkflowExecutionService(db)
     try:
-        result = await service.execute_workflow(workflow_id, input_data)
+        result = await service.execute_workflow(workflow_id, input_data, use_cache, blob_links=blobs)
         return result
+    except WorkflowGraphError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/{workflow_id}/runs", response_model=schemas.WorkflowRun, status_code=202)
+async def submit_workflow_run(workflow_id: int, input_data: Optional[str] = None, use_cache: bool = True,
+                              db: AsyncSession = Depends(get_async_db)):
+    """提交后台运行并立即返回运行记录，通过 GET /runs/{run_id} 查询结果"""
+    db_workflow = await crud.async_workflow_crud.get_workflow(db, workflow_id, with_tasks=False)
+    if db_workflow is None:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    run = await crud.run_crud.create_run(db, workflow_id, input_data, use_cache)
+    run_queue.notify()
+    return run
+
+@router.get("/{workflow_id}/runs", response_model=List[schemas.WorkflowRun])
+async def read_workflow_runs(workflow_id: int, limit: int = 100, db: AsyncSession = Depends(get_async_read_db)):
+    return await crud.run_crud.get_runs_by_workflow(db, workflow_id, limit)
+
+@router.post("/{workflow_id}/batch")
+async def execute_workflow_batch(workflow_id: int, request: Request, concurrency: Optional[int] = None,
+                                 order: str = "completion", format: Optional[str] = None, use_cache: bool = True):
+    """
+    用同一个工作流批量处理多条输入，请求体为JSONL（每行一个字符串或 {"input": ...}）或带表头的CSV（使用 input 列）
+    结果以NDJSON流式返回，order=input 时按输入顺序，否则按完成顺序；批次ID通过 X-Batch-Id 响应头返回
+    """
+    ordered = check_order(order)
+    fmt = format or detect_format(request.headers.get("content-type"))
+    content = (await request.body()).decode("utf-8-sig")
+    service = BatchService()
+    try:
+        batch = await service.create_batch(workflow_id, parse_batch_input(content, fmt), concurrency, use_cache)
+    except WorkflowGraphError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except WorkflowNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        # 输入格式错误
+        raise HTTPException(status_code=422, detail=str(e))
+    return ndjson_response(service.run_batch(batch.id, ordered), headers={"X-Batch-Id": str(batch.id)})
+
+@router.post("/{workflow_id}/execute/stream")
+async def execute_workflow_stream(workflow_id: int, input_data: Optional[str] = None, use_cache: bool = True,
+                                  blobs: bool = False, db: AsyncSession = Depends(get_async_read_db)):
+    """以Server-Sent Events流式返回节点进度和模型输出"""
+    service = WorkflowExecutionService(db)
+    # 在开始推送前完成加载，确保404/400仍以普通HTTP错误返回
+    try:
+        plan = await service.load_plan(workflow_id)
+    except WorkflowGraphError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    async def event_stream():
+        async for event, data in service.stream_workflow(plan, input_data, use_cache, blob_links=blobs):
+            yield format_sse(event, data)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,97 @@
+"""
+批量执行命令行工具
+
+用法：
+    python -m app.batch_cli run --workflow-id 1 --input inputs.jsonl --concurrency 8 --order input
+    python -m app.batch_cli resume --batch-id 3
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from app.core.migrations import upgrade_database
+from app.services.batch_service import BatchService
+from app.services.execution_history import execution_history
+from app.utils.batch_input import detect_format, parse_batch_input
+from app.utils.http_client import init_http_client, close_http_client, init_node_http_client, close_node_http_client
+from app.utils.response_cache import close_response_cache
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="用同一个工作流批量处理JSONL/CSV输入，结果以NDJSON输出")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="创建并执行新批次")
+    run_parser.add_argument("--workflow-id", type=int, required=True)
+    run_parser.add_argument("--input", required=True, help="输入文件（.jsonl 或 .csv），- 表示标准输入")
+    run_parser.add_argument("--format", choices=["jsonl", "csv"], help="输入格式，默认根据扩展名判断")
+    run_parser.add_argument("--no-cache", action="store_true", help="不使用模型响应缓存")
+
+    resume_parser = subparsers.add_parser("resume", help="继续执行中断的批次")
+    resume_parser.add_argument("--batch-id", type=int, required=True)
+
+    for sub in (run_parser, resume_parser):
+        sub.add_argument("--concurrency", type=int, help="并发数")
+        sub.add_argument("--order", choices=["completion", "input"], default="completion",
+                         help="结果按完成顺序或输入顺序输出")
+        sub.add_argument("--output", help="结果文件，默认输出到标准输出")
+    return parser
+
+
+def read_input(path: str) -> str:
+    if path == "-":
+        return sys.stdin.read()
+    with open(path, encoding="utf-8-sig") as f:
+        return f.read()
+
+
+async def run(args) -> int:
+    service = BatchService()
+    if args.command == "run":
+        fmt = args.format or detect_format(filename=args.input)
+        batch = await service.create_batch(args.workflow_id, parse_batch_input(read_input(args.input), fmt),
+                                           args.concurrency, not args.no_cache)
+        batch_id = batch.id
+    else:
+        batch_id = args.batch_id
+        if not await service.claim_batch(batch_id):
+            print(f"Batch {batch_id} not found, already running or completed", file=sys.stderr)
+            return 1
+    print(f"Batch {batch_id}", file=sys.stderr)
+
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    failed = 0
+    try:
+        async for record in service.run_batch(batch_id, ordered=args.order == "input",
+                                              concurrency=args.concurrency):
+            failed += record["status"] == "failed"
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failed else 0
+
+
+async def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    upgrade_database()
+    await init_http_client()
+    await init_node_http_client()
+    await execution_history.start()
+    try:
+        return await run(args)
+    finally:
+        await execution_history.stop()
+        await close_http_client()
+        await close_node_http_client()
+        close_response_cache()
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(asyncio.run(main()))
+    except KeyboardInterrupt:
+        # 已完成的条目已保存，可通过 resume 继续
+        sys.exit(130)
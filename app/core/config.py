@@ -10,8 +10,121 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "Dify-like Backend"
     API_V1_STR: str = "/api/v1"
     DATABASE_URL: str = "sqlite:///./dify.db"
+    # 输出全部SQL语句（调试用）
+    DB_ECHO: bool = False
+    # 应用启动时执行数据库迁移；多进程部署时关闭，改为启动前执行一次 alembic upgrade head
+    DB_MIGRATE_ON_STARTUP: bool = True
+    # 数据库连接池（读、写各一个池）：连接数、溢出连接数、连接回收时间（秒，-1为不回收）、获取连接的等待时间（秒）
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = False
+    # 只读查询（GET 路由、加载执行计划）使用的数据库，为空时使用 DATABASE_URL
+    DATABASE_READ_URL: str = ""
+    # SQLite 连接参数：日志模式、写锁等待时间（毫秒）、同步级别、内存映射大小（字节，0为关闭）
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 15000
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    # 单写者分组提交：工作流和任务的写操作由一个后台写者执行，窗口内到达的操作合并为一个事务提交
+    WRITE_QUEUE_ENABLED: bool = False
+    WRITE_QUEUE_WINDOW_MS: float = 2.0
+    WRITE_QUEUE_MAX_BATCH: int = 64
     QWEN_API_KEY: str = os.environ.get("QWEN_API_KEY", "")
     QWEN_BASE_URL: str = os.environ.get("QWEN_BASE_URL", "")
+    # 单次工作流运行中同时执行的节点数上限
+    WORKFLOW_MAX_CONCURRENCY: int = 4
+    # 执行计划缓存的最大工作流数量
+    PLAN_CACHE_SIZE: int = 256
+    # 工作流详情的序列化缓存：缓存的工作流数量，响应超过该字节数时同时缓存 gzip 压缩结果
+    WORKFLOW_RESPONSE_CACHE_SIZE: int = 512
+    WORKFLOW_GZIP_MIN_BYTES: int = 1024
+    # 共享HTTP连接池配置
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_TIMEOUT: float = 20.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP2_ENABLED: bool = False
+    # 批量导入每个事务的工作流数量，导出时每批读取的行数
+    BULK_BATCH_SIZE: int = 500
+    EXPORT_BATCH_SIZE: int = 500
+    # 开启后提供 /metrics（Prometheus 文本格式），记录HTTP路由、数据库语句和执行耗时
+    METRICS_ENABLED: bool = True
+    # 按请求开启的剖析（请求头 X-Profile 或查询参数 profile），配置 PROFILING_TOKEN 后取值必须与之相同
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: str = ""
+    PROFILING_DIR: str = "./profiles"
+    PROFILING_MAX_FILES: int = 100
+    # 后台运行队列：工作者数量即全局并发上限，每个工作流同时运行的数量上限（0为不限制）
+    RUN_QUEUE_ENABLED: bool = True
+    RUN_WORKERS: int = 4
+    RUN_PER_WORKFLOW_CONCURRENCY: int = 1
+    RUN_POLL_INTERVAL: float = 1.0
+    # 运行心跳超过该时长未刷新时视为工作者已退出，重新排队（最多尝试 RUN_MAX_ATTEMPTS 次）
+    RUN_LEASE_SECONDS: float = 60.0
+    RUN_MAX_ATTEMPTS: int = 3
+    # 模型API出站调度：RPS/TPM 令牌桶（0为不限制）和 AIMD 自适应并发上限
+    QWEN_GOVERNOR_ENABLED: bool = True
+    QWEN_RPS: float = 0
+    QWEN_TPM: float = 0
+    QWEN_INITIAL_CONCURRENCY: int = 8
+    QWEN_MIN_CONCURRENCY: int = 1
+    QWEN_MAX_CONCURRENCY: int = 32
+    # 最近 QWEN_LATENCY_WINDOW 个延迟样本的 p90 超过基线的该倍数时减少并发（0为关闭，只在429时减少）；
+    # 延迟样本为流式请求的首字节时间、非流式请求每个输出 token 的耗时
+    QWEN_LATENCY_TOLERANCE: float = 0
+    QWEN_LATENCY_WINDOW: int = 20
+    # 模型调用重试（指数退避+抖动，遵循 Retry-After）、对冲请求和熔断器
+    QWEN_MAX_RETRIES: int = 3
+    QWEN_RETRY_BASE_DELAY: float = 0.5
+    QWEN_RETRY_MAX_DELAY: float = 20.0
+    QWEN_HEDGE_ENABLED: bool = False
+    QWEN_HEDGE_PERCENTILE: float = 95
+    QWEN_HEDGE_MIN_DELAY: float = 1.0
+    # 连续失败次数达到阈值后熔断（0为关闭），经过恢复时间后放行试探请求
+    QWEN_BREAKER_FAILURE_THRESHOLD: int = 5
+    QWEN_BREAKER_RECOVERY_TIMEOUT: float = 30.0
+    # 执行历史：缓冲区中的执行达到批量大小或每隔 HISTORY_FLUSH_INTERVAL 秒批量写入
+    HISTORY_ENABLED: bool = True
+    HISTORY_BATCH_SIZE: int = 200
+    HISTORY_FLUSH_INTERVAL: float = 2.0
+    HISTORY_MAX_BUFFER: int = 10000
+    # 节点输入输出保存的最大字符数
+    HISTORY_MAX_TEXT: int = 2000
+    # 批量执行：默认/最大并发数，每完成多少条写入一次结果
+    BATCH_DEFAULT_CONCURRENCY: int = 8
+    BATCH_MAX_CONCURRENCY: int = 64
+    BATCH_FLUSH_SIZE: int = 50
+    # 运行中的批次超过该时长未刷新心跳时视为已中断，可以通过 resume 重新领取
+    BATCH_LEASE_SECONDS: float = 60.0
+    # 节点中间输出：小于阈值的保存在内存中，超过阈值写入 BLOB_DIR 并通过 mmap 读取；
+    # 磁盘上的块超过保留时间（秒）或总大小上限时清理
+    BLOB_INLINE_MAX_BYTES: int = 64 * 1024
+    BLOB_DIR: str = "./blobs"
+    BLOB_TTL: float = 86400.0
+    BLOB_MAX_BYTES: int = 1024 * 1024 * 1024
+    # 代码节点：用户代码在独立进程池中执行（默认关闭），超时（秒）、每个工作进程的内存上限（MB）、输出大小上限
+    CODE_NODE_ENABLED: bool = False
+    CODE_NODE_WORKERS: int = 2
+    CODE_NODE_TIMEOUT: float = 5.0
+    CODE_NODE_MEMORY_MB: int = 256
+    CODE_NODE_MAX_OUTPUT_BYTES: int = 1024 * 1024
+    # HTTP节点：使用独立的连接池（不保存 Cookie），最大连接数、请求超时（秒）和响应大小上限
+    HTTP_NODE_MAX_CONNECTIONS: int = 20
+    HTTP_NODE_TIMEOUT: float = 10.0
+    HTTP_NODE_MAX_RESPONSE_BYTES: int = 1024 * 1024
+    # HTTP节点可访问的地址：非空时只允许列表中的主机（逗号分隔，".example.com" 匹配子域名），
+    # 否则拒绝解析到内网、回环、链路本地等非公网地址的主机（HTTP_NODE_ALLOW_PRIVATE 为True时不限制）
+    HTTP_NODE_ALLOWED_HOSTS: str = ""
+    HTTP_NODE_ALLOW_PRIVATE: bool = False
+    # 模型响应缓存（默认关闭）
+    LLM_CACHE_ENABLED: bool = False
+    LLM_CACHE_PATH: str = "./llm_cache.db"
+    LLM_CACHE_TTL: float = 86400.0
+    LLM_CACHE_MEMORY_SIZE: int = 1024
+    LLM_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
     
     class Config:
         case_sensitive = True
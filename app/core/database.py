@@ -1,17 +1,161 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.config import settings
+from app.utils.metrics import instrument_engine
+from app.utils.profiling import instrument_engine_spans
 
-# 使用SQLite数据库
-SQLALCHEMY_DATABASE_URL = "sqlite:///./dify.db"
+# 默认使用SQLite数据库，可通过 DATABASE_URL 配置（同步驱动形式，如 postgresql://...）
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False},
-    echo=True  # 启用SQL日志以调试问题
-)
+# 异步引擎使用的驱动
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mysql": "aiomysql"}
+
+
+def to_async_url(url: str):
+    """
+    把同步数据库URL转换为对应异步驱动的URL
+    :param url: 数据库URL，如 sqlite:///./dify.db
+    :return: sqlalchemy URL，如 sqlite+aiosqlite:///./dify.db
+    """
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Unsupported database backend: {backend}")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def is_sqlite(url) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def is_memory_sqlite(url) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(url, is_async: bool = False) -> dict:
+    """
+    按数据库类型和配置生成 create_engine 的连接池参数
+    """
+    options = {"echo": settings.DB_ECHO}
+    if is_sqlite(url):
+        # 写锁等待交给 busy_timeout（连接时设置），驱动自身的等待时间与之保持一致
+        options["connect_args"] = {"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000}
+        if is_memory_sqlite(url):
+            # 内存数据库只能在单个连接内共享，使用 SQLAlchemy 默认的连接池
+            return options
+        if is_async:
+            # aiosqlite 默认不复用连接，每个会话都要重新打开文件并执行 PRAGMA
+            options["poolclass"] = AsyncAdaptedQueuePool
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    return options
+
+
+def apply_sqlite_profile(engine, read_only: bool = False):
+    """
+    每个新连接建立时设置 SQLite 参数：
+    WAL 模式下读不阻塞写、写也不阻塞读；busy_timeout 让写锁冲突时等待而不是立即报 database is locked；
+    SQLite 默认不检查外键，开启 foreign_keys 后删除工作流时由 ON DELETE CASCADE 删除运行记录和批次
+    :param engine: 同步引擎（异步引擎传入 async_engine.sync_engine）
+    :param read_only: 为True时开启 query_only，连接上的写语句直接报错
+    """
+    pragmas = [
+        f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}",
+        f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}",
+        "PRAGMA foreign_keys=ON",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def instrument(engine, name: str):
+    # 记录语句数量和耗时
+    if settings.METRICS_ENABLED:
+        instrument_engine(engine, name)
+    if settings.PROFILING_ENABLED:
+        instrument_engine_spans(engine)
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎，供执行等异步路径使用，避免数据库I/O阻塞事件循环
+ASYNC_SQLALCHEMY_DATABASE_URL = to_async_url(SQLALCHEMY_DATABASE_URL)
+
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL,
+                                   **engine_options(SQLALCHEMY_DATABASE_URL, is_async=True))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False)
+
+# 只读引擎：GET 路由和加载执行计划使用单独的连接池，读请求不占用写连接；
+# 配置 DATABASE_READ_URL 时连接只读副本，SQLite 下为同一文件上开启 query_only 的连接
+READ_DATABASE_URL = settings.DATABASE_READ_URL or SQLALCHEMY_DATABASE_URL
+
+if is_memory_sqlite(READ_DATABASE_URL):
+    async_read_engine = async_engine
+else:
+    async_read_engine = create_async_engine(to_async_url(READ_DATABASE_URL),
+                                            **engine_options(READ_DATABASE_URL, is_async=True))
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, class_=AsyncSession, autoflush=False)
+
+if is_sqlite(SQLALCHEMY_DATABASE_URL):
+    apply_sqlite_profile(engine)
+    apply_sqlite_profile(async_engine.sync_engine)
+if async_read_engine is not async_engine and is_sqlite(READ_DATABASE_URL):
+    apply_sqlite_profile(async_read_engine.sync_engine, read_only=True)
+
+instrument(engine, "sync")
+instrument(async_engine.sync_engine, "async")
+if async_read_engine is not async_engine:
+    instrument(async_read_engine.sync_engine, "async_read")
+
+
+def create_writer_engine(url: str = SQLALCHEMY_DATABASE_URL):
+    """
+    写队列专用的同步引擎，只有一个连接，在写者线程中使用
+    SQLite 下由 SQLAlchemy 发出 BEGIN IMMEDIATE（驱动默认不在 SAVEPOINT 前开启事务，
+    会导致保存点释放时提前提交），事务开始时即取得写锁
+    :param url: 同步驱动形式的数据库地址，默认 DATABASE_URL
+    """
+    if is_memory_sqlite(url):
+        return engine
+    options = engine_options(url)
+    options.update(pool_size=1, max_overflow=0)
+    writer = create_engine(url, **options)
+    if is_sqlite(url):
+        apply_sqlite_profile(writer)
+
+        @event.listens_for(writer, "connect")
+        def disable_driver_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(writer, "begin")
+        def begin_immediate(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+    instrument(writer, "writer")
+    return writer
+
+
 Base = declarative_base()
 
 def get_db():
@@ -19,4 +163,15 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    """
+    只读会话，用于不修改数据的请求
+    """
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -0,0 +1,64 @@
+import logging
+import os
+from contextlib import contextmanager
+
+from sqlalchemy import inspect
+
+from app.core.database import Base, engine
+
+logger = logging.getLogger(__name__)
+
+# 引入迁移之前由 create_all 建立的数据库对应的版本
+BASELINE_REVISION = "0001"
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _alembic_config():
+    # 延迟导入 alembic，只有执行迁移的进程才需要加载
+    from alembic.config import Config
+
+    config = Config(os.path.join(PROJECT_ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(PROJECT_ROOT, "migrations"))
+    return config
+
+
+@contextmanager
+def foreign_keys_disabled(connection):
+    """
+    迁移期间关闭 SQLite 的外键检查，结束后恢复原来的设置
+    batch 模式通过重建表修改结构，删除旧表时开启的外键会级联删除子表数据；该设置只能在事务之外切换
+    :param connection: 尚未开始事务的同步连接
+    """
+    if connection.dialect.name != "sqlite":
+        yield
+        return
+    enabled = connection.exec_driver_sql("PRAGMA foreign_keys").scalar()
+    connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+    connection.commit()
+    try:
+        yield
+    finally:
+        connection.exec_driver_sql(f"PRAGMA foreign_keys={'ON' if enabled else 'OFF'}")
+        connection.commit()
+
+
+def upgrade_database(bind=engine):
+    """
+    将数据库结构升级到最新版本（等同于 alembic upgrade head）
+    之前由 create_all 建立、没有版本记录的数据库：补建缺少的表后标记为初始版本，再执行之后的迁移
+    多进程部署时应在启动工作进程前执行一次（见 app.serve），避免多个进程同时建表
+    :param bind: 同步引擎
+    """
+    from alembic import command
+
+    config = _alembic_config()
+    with bind.connect() as connection, foreign_keys_disabled(connection), connection.begin():
+        config.attributes["connection"] = connection
+        tables = inspect(connection).get_table_names()
+        if "alembic_version" not in tables and "workflows" in tables:
+            logger.info("Stamping existing database created without migrations")
+            import app.models.workflow
+            Base.metadata.create_all(bind=connection)
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
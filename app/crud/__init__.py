@@ -1,4 +1,4 @@
 # CRUD package
-from . import workflow_crud, task_crud
+from . import workflow_crud, task_crud, async_workflow_crud, async_task_crud, run_crud, history_crud, batch_crud
 
-__all__ = ["workflow_crud", "task_crud"]
\ No newline at end of file
+__all__ = ["workflow_crud", "task_crud", "async_workflow_crud", "async_task_crud", "run_crud", "history_crud", "batch_crud"]
@@ -0,0 +1,29 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import task_crud
+from app.models.workflow import Task
+from app.schemas.task import TaskCreate, TaskUpdate
+from app.services.write_queue import run_write
+
+# 写操作通过 run_sync 复用 task_crud 中的同步逻辑，开启写队列时交给单写者分组提交
+
+async def get_task(db: AsyncSession, task_id: int):
+    result = await db.execute(select(Task).filter(Task.id == task_id))
+    return result.scalars().first()
+
+async def get_tasks(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(Task).offset(skip).limit(limit))
+    return result.scalars().all()
+
+async def get_tasks_by_workflow(db: AsyncSession, workflow_id: int):
+    result = await db.execute(select(Task).filter(Task.workflow_id == workflow_id))
+    return result.scalars().all()
+
+async def create_task(db: AsyncSession, task: TaskCreate):
+    return await run_write(db, task_crud.create_task, task)
+
+async def update_task(db: AsyncSession, task_id: int, task: TaskUpdate):
+    return await run_write(db, task_crud.update_task, task_id, task)
+
+async def delete_task(db: AsyncSession, task_id: int):
+    return await run_write(db, task_crud.delete_task, task_id)
@@ -0,0 +1,65 @@
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.crud import workflow_crud
+from app.models.workflow import Workflow
+from app.schemas.workflow import WorkflowCreate, WorkflowUpdate
+from app.services.write_queue import run_write
+
+# 读操作直接使用异步查询；写操作通过 run_sync 复用 workflow_crud 中的同步逻辑，
+# 在 greenlet 中执行，不会阻塞事件循环；开启写队列时交给单写者分组提交（见 write_queue）
+
+def _load_tasks(db, workflow):
+    # 在同步上下文中加载关联任务，避免返回后在异步上下文中触发懒加载
+    if workflow is not None:
+        db.refresh(workflow)
+        workflow.tasks
+    return workflow
+
+async def get_workflows(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                        summary: bool = False):
+    result = await db.execute(workflow_crud.workflows_query(skip, limit, cursor, summary))
+    return result.scalars().all()
+
+async def get_workflow(db: AsyncSession, workflow_id: int, with_tasks: bool = True):
+    query = select(Workflow).filter(Workflow.id == workflow_id)
+    if with_tasks:
+        query = query.options(selectinload(Workflow.tasks))
+    result = await db.execute(query)
+    return result.scalars().first()
+
+async def get_workflow_version(db: AsyncSession, workflow_id: int):
+    """
+    只查询工作流的版本（不加载任务），用于条件请求和序列化缓存
+    :return: 包含 id、updated_at 的行，工作流不存在时返回None
+    """
+    result = await db.execute(select(Workflow.id, Workflow.updated_at).filter(Workflow.id == workflow_id))
+    return result.first()
+
+async def create_workflow(db: AsyncSession, workflow: WorkflowCreate):
+    return await run_write(
+        db, lambda session: _load_tasks(session, workflow_crud.create_workflow(session, workflow))
+    )
+
+async def update_workflow(db: AsyncSession, workflow_id: int, workflow: WorkflowUpdate):
+    return await run_write(
+        db, lambda session: _load_tasks(session, workflow_crud.update_workflow(session, workflow_id, workflow))
+    )
+
+async def delete_workflow(db: AsyncSession, workflow_id: int):
+    return await run_write(db, workflow_crud.delete_workflow, workflow_id)
+
+async def patch_workflow(db: AsyncSession, workflow_id: int, operations: List[dict], expected_updated_at=None):
+    return await run_write(db, workflow_crud.patch_workflow, workflow_id, operations, expected_updated_at)
+
+async def bulk_create_workflows(db: AsyncSession, workflows: List[WorkflowCreate]) -> List[int]:
+    return await db.run_sync(workflow_crud.bulk_create_workflows, workflows)
+
+async def stream_workflows_for_export(db: AsyncSession, batch_size: int = 500):
+    """
+    使用服务端游标逐批读取工作流，内存占用与总数量无关
+    """
+    result = await db.stream(workflow_crud.export_query().execution_options(yield_per=batch_size))
+    async for row in result:
+        yield row
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.workflow import BatchItem, WorkflowBatch
+
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+async def create_batch(db: AsyncSession, workflow_id: int, inputs: Iterable[str], concurrency: int,
+                       use_cache: bool = True, chunk_size: int = 500, status: str = PENDING):
+    """
+    创建批次并批量写入全部条目，整个批次在一个事务中提交
+    :param inputs: 逐条的工作流输入
+    :param chunk_size: 每次 executemany 写入的条目数
+    :param status: 批次的初始状态，创建后立即执行时为 running（创建者直接持有该批次）
+    """
+    now = datetime.utcnow()
+    batch = WorkflowBatch(workflow_id=workflow_id, status=status, concurrency=concurrency, use_cache=use_cache,
+                          created_at=now, updated_at=now)
+    db.add(batch)
+    await db.flush()
+
+    total = 0
+    rows = []
+    for input_data in inputs:
+        rows.append({"batch_id": batch.id, "item_index": total, "input_data": input_data, "status": PENDING})
+        total += 1
+        if len(rows) >= chunk_size:
+            await db.execute(insert(BatchItem), rows)
+            rows = []
+    if rows:
+        await db.execute(insert(BatchItem), rows)
+
+    batch.total = total
+    await db.commit()
+    await db.refresh(batch)
+    return batch
+
+async def get_batch(db: AsyncSession, batch_id: int):
+    result = await db.execute(select(WorkflowBatch).filter(WorkflowBatch.id == batch_id))
+    return result.scalars().first()
+
+async def get_status_counts(db: AsyncSession, batch_id: int) -> Dict[str, int]:
+    result = await db.execute(
+        select(BatchItem.status, func.count(BatchItem.id))
+        .filter(BatchItem.batch_id == batch_id)
+        .group_by(BatchItem.status)
+    )
+    return {status: count for status, count in result}
+
+async def get_pending_items(db: AsyncSession, batch_id: int):
+    """
+    按输入顺序获取尚未完成的条目（重启后从这里继续）
+    """
+    result = await db.execute(
+        select(BatchItem.id, BatchItem.item_index, BatchItem.input_data)
+        .filter(BatchItem.batch_id == batch_id, BatchItem.status == PENDING)
+        .order_by(BatchItem.item_index)
+    )
+    return result.all()
+
+async def save_item_results(db: AsyncSession, results: List[dict]):
+    """
+    按主键批量更新条目结果
+    :param results: 包含 id/status/output/error/execution_id/finished_at 的字典列表
+    """
+    if results:
+        await db.execute(update(BatchItem), results)
+        await db.commit()
+
+async def claim_batch(db: AsyncSession, batch_id: int, lease_seconds: float) -> bool:
+    """
+    领取批次：只有待执行的批次，或心跳超时（执行者已退出）的运行中批次可以领取
+    使用带状态条件的 UPDATE，多个请求同时继续同一批次时只有一个会成功
+    :return: 是否领取成功
+    """
+    now = datetime.utcnow()
+    stale = and_(WorkflowBatch.status == RUNNING, WorkflowBatch.updated_at < now - timedelta(seconds=lease_seconds))
+    result = await db.execute(
+        update(WorkflowBatch)
+        .where(WorkflowBatch.id == batch_id, or_(WorkflowBatch.status == PENDING, stale))
+        .values(status=RUNNING, updated_at=now)
+    )
+    await db.commit()
+    return bool(result.rowcount)
+
+async def heartbeat(db: AsyncSession, batch_id: int) -> bool:
+    """
+    刷新运行中批次的心跳（updated_at），避免执行期间被其他请求当作中断的批次领取
+    """
+    result = await db.execute(
+        update(WorkflowBatch)
+        .where(WorkflowBatch.id == batch_id, WorkflowBatch.status == RUNNING)
+        .values(updated_at=datetime.utcnow())
+    )
+    await db.commit()
+    return bool(result.rowcount)
+
+async def set_batch_status(db: AsyncSession, batch_id: int, status: str):
+    """
+    结束一次执行：把运行中的批次标记为已完成，或中断时恢复为待执行
+    """
+    values = {"status": status, "updated_at": datetime.utcnow()}
+    if status == COMPLETED:
+        values["finished_at"] = datetime.utcnow()
+    await db.execute(
+        update(WorkflowBatch)
+        .where(WorkflowBatch.id == batch_id, WorkflowBatch.status == RUNNING)
+        .values(**values)
+    )
+    await db.commit()
+
+async def stream_items(db: AsyncSession, batch_id: int, batch_size: int = 500):
+    """
+    使用服务端游标按输入顺序逐批读取条目
+    """
+    result = await db.stream(
+        select(BatchItem)
+        .filter(BatchItem.batch_id == batch_id)
+        .order_by(BatchItem.item_index)
+        .execution_options(yield_per=batch_size)
+    )
+    async for item in result.scalars():
+        yield item
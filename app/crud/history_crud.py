@@ -0,0 +1,70 @@
+from typing import Optional
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.workflow import ExecutionRecord, NodeExecutionRecord
+
+# 执行历史只读查询；写入由 execution_history 缓冲后批量完成
+
+async def get_executions(db: AsyncSession, workflow_id: Optional[int] = None, limit: int = 100):
+    query = select(ExecutionRecord)
+    if workflow_id is not None:
+        query = query.filter(ExecutionRecord.workflow_id == workflow_id)
+    result = await db.execute(query.order_by(ExecutionRecord.started_at.desc()).limit(limit))
+    return result.scalars().all()
+
+async def get_execution(db: AsyncSession, execution_id: str):
+    result = await db.execute(select(ExecutionRecord).filter(ExecutionRecord.id == execution_id))
+    return result.scalars().first()
+
+async def get_node_executions(db: AsyncSession, execution_id: str):
+    result = await db.execute(
+        select(NodeExecutionRecord)
+        .filter(NodeExecutionRecord.execution_id == execution_id)
+        .order_by(NodeExecutionRecord.id)
+    )
+    return result.scalars().all()
+
+async def slowest_workflows(db: AsyncSession, limit: int = 20):
+    """
+    按平均总耗时倒序统计各工作流的执行情况
+    """
+    avg_ms = func.avg(ExecutionRecord.total_ms)
+    result = await db.execute(
+        select(
+            ExecutionRecord.workflow_id,
+            func.count(ExecutionRecord.id).label("executions"),
+            avg_ms.label("avg_total_ms"),
+            func.max(ExecutionRecord.total_ms).label("max_total_ms"),
+            func.avg(ExecutionRecord.queue_wait_ms).label("avg_queue_wait_ms"),
+            func.sum(ExecutionRecord.total_tokens).label("total_tokens"),
+            func.sum(case((ExecutionRecord.status == "failed", 1), else_=0)).label("failures"),
+        )
+        .group_by(ExecutionRecord.workflow_id)
+        .order_by(avg_ms.desc())
+        .limit(limit)
+    )
+    return [dict(row._mapping) for row in result]
+
+async def slowest_nodes(db: AsyncSession, limit: int = 20):
+    """
+    按平均模型调用耗时倒序统计各任务节点（即各提示）的执行情况，不含命中缓存的调用
+    """
+    avg_ms = func.avg(NodeExecutionRecord.network_ms)
+    result = await db.execute(
+        select(
+            NodeExecutionRecord.workflow_id,
+            NodeExecutionRecord.task_id,
+            func.max(NodeExecutionRecord.task_name).label("task_name"),
+            func.count(NodeExecutionRecord.id).label("executions"),
+            avg_ms.label("avg_network_ms"),
+            func.max(NodeExecutionRecord.network_ms).label("max_network_ms"),
+            func.avg(NodeExecutionRecord.queue_wait_ms).label("avg_queue_wait_ms"),
+            func.avg(NodeExecutionRecord.completion_tokens).label("avg_completion_tokens"),
+            func.sum(NodeExecutionRecord.total_tokens).label("total_tokens"),
+        )
+        .filter(NodeExecutionRecord.status != "skipped", NodeExecutionRecord.cached.is_(False))
+        .group_by(NodeExecutionRecord.workflow_id, NodeExecutionRecord.task_id)
+        .order_by(avg_ms.desc())
+        .limit(limit)
+    )
+    return [dict(row._mapping) for row in result]
@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+from typing import Optional
+import json
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from app.models.workflow import Workflow, WorkflowRun
+
+# 运行记录同时作为持久化队列：status='queued' 的行即待执行的运行
+# 领取时使用带状态条件的 UPDATE，多个工作者（或多个进程）同时领取同一行时只有一个会成功
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATUSES = (SUCCEEDED, FAILED)
+
+async def create_run(db: AsyncSession, workflow_id: int, input_data: Optional[str] = None,
+                     use_cache: bool = True):
+    db_run = WorkflowRun(workflow_id=workflow_id, status=QUEUED, input_data=input_data, use_cache=use_cache)
+    db.add(db_run)
+    await db.commit()
+    await db.refresh(db_run)
+    return db_run
+
+async def get_run(db: AsyncSession, run_id: int):
+    result = await db.execute(select(WorkflowRun).filter(WorkflowRun.id == run_id))
+    return result.scalars().first()
+
+async def get_runs_by_workflow(db: AsyncSession, workflow_id: int, limit: int = 100):
+    result = await db.execute(
+        select(WorkflowRun)
+        .filter(WorkflowRun.workflow_id == workflow_id)
+        .order_by(WorkflowRun.id.desc())
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+async def claim_next_run(db: AsyncSession, worker_id: str, per_workflow_limit: int = 0):
+    """
+    按提交顺序领取一个排队中的运行
+    :param worker_id: 工作者标识
+    :param per_workflow_limit: 每个工作流同时运行的数量上限，0 表示不限制
+    :return: 领取到的运行，没有可领取的运行时返回None
+    """
+    query = select(WorkflowRun.id, WorkflowRun.workflow_id).filter(WorkflowRun.status == QUEUED)
+    if per_workflow_limit > 0:
+        # 已达到并发上限的工作流暂不领取
+        saturated = (
+            select(WorkflowRun.workflow_id)
+            .filter(WorkflowRun.status == RUNNING)
+            .group_by(WorkflowRun.workflow_id)
+            .having(func.count(WorkflowRun.id) >= per_workflow_limit)
+        )
+        query = query.filter(WorkflowRun.workflow_id.not_in(saturated))
+    # 跳过已被其他工作者抢先领取的行，最多尝试几次
+    for _ in range(5):
+        result = await db.execute(query.order_by(WorkflowRun.id).limit(1))
+        row = result.first()
+        if row is None:
+            return None
+        run_id, workflow_id = row
+        conditions = [WorkflowRun.id == run_id, WorkflowRun.status == QUEUED]
+        if per_workflow_limit > 0:
+            # 查询到领取之间其他工作者可能已领取同一工作流的运行，上限在 UPDATE 中再检查一次；
+            # 锁住工作流行，使同一工作流的领取串行执行（PostgreSQL/MySQL，SQLite 的写操作本身是串行的）
+            await db.execute(select(Workflow.id).filter(Workflow.id == workflow_id).with_for_update())
+            running = aliased(WorkflowRun)
+            conditions.append(
+                select(func.count(running.id))
+                .filter(running.workflow_id == workflow_id, running.status == RUNNING)
+                .scalar_subquery() < per_workflow_limit
+            )
+        now = datetime.utcnow()
+        claimed = await db.execute(
+            update(WorkflowRun)
+            .where(*conditions)
+            .values(status=RUNNING, worker_id=worker_id, started_at=now, heartbeat_at=now,
+                    attempts=WorkflowRun.attempts + 1)
+        )
+        await db.commit()
+        if claimed.rowcount:
+            return await get_run(db, run_id)
+    return None
+
+async def heartbeat(db: AsyncSession, run_id: int, worker_id: str) -> bool:
+    """
+    刷新运行的心跳，运行已被其他工作者接管时返回False
+    """
+    result = await db.execute(
+        update(WorkflowRun)
+        .where(WorkflowRun.id == run_id, WorkflowRun.worker_id == worker_id, WorkflowRun.status == RUNNING)
+        .values(heartbeat_at=datetime.utcnow())
+    )
+    await db.commit()
+    return bool(result.rowcount)
+
+async def finish_run(db: AsyncSession, run_id: int, worker_id: str, result: Optional[dict] = None,
+                     error: Optional[str] = None) -> bool:
+    """
+    保存运行结果，error 不为空时标记为失败
+    """
+    updated = await db.execute(
+        update(WorkflowRun)
+        .where(WorkflowRun.id == run_id, WorkflowRun.worker_id == worker_id, WorkflowRun.status == RUNNING)
+        .values(
+            status=FAILED if error else SUCCEEDED,
+            result=json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+            error=error,
+            finished_at=datetime.utcnow()
+        )
+    )
+    await db.commit()
+    return bool(updated.rowcount)
+
+async def release_run(db: AsyncSession, run_id: int, worker_id: str) -> bool:
+    """
+    工作者正常退出时把未完成的运行放回队列，不计入重试次数
+    """
+    result = await db.execute(
+        update(WorkflowRun)
+        .where(WorkflowRun.id == run_id, WorkflowRun.worker_id == worker_id, WorkflowRun.status == RUNNING)
+        .values(status=QUEUED, worker_id=None, started_at=None, heartbeat_at=None,
+                attempts=WorkflowRun.attempts - 1)
+    )
+    await db.commit()
+    return bool(result.rowcount)
+
+async def recover_stale_runs(db: AsyncSession, lease_seconds: float, max_attempts: int) -> int:
+    """
+    处理心跳超时的运行（例如工作者进程崩溃或重启）：
+    未超过重试次数的重新排队，否则标记为失败
+    :return: 处理的运行数量
+    """
+    stale = and_(WorkflowRun.status == RUNNING,
+                 WorkflowRun.heartbeat_at < datetime.utcnow() - timedelta(seconds=lease_seconds))
+    failed = await db.execute(
+        update(WorkflowRun)
+        .where(stale, WorkflowRun.attempts >= max_attempts)
+        .values(status=FAILED, error="Run abandoned by worker", finished_at=datetime.utcnow())
+    )
+    requeued = await db.execute(
+        update(WorkflowRun)
+        .where(stale)
+        .values(status=QUEUED, worker_id=None, started_at=None, heartbeat_at=None)
+    )
+    await db.commit()
+    return failed.rowcount + requeued.rowcount
@@ -1,6 +1,10 @@
+from datetime import datetime
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from app.models.workflow import Task
+from app.models.workflow import Task, Workflow
 from app.schemas.task import TaskCreate, TaskUpdate
+from app.services.execution_plan import plan_cache
+from app.services.workflow_cache import workflow_response_cache
 
 def get_task(db: Session, task_id: int):
     return db.query(Task).filter(Task.id == task_id).first()
@@ -11,25 +15,46 @@ def get_tasks(db: Session, skip: int = 0, limit: int = 100):
 def get_tasks_by_workflow(db: Session, workflow_id: int):
     return db.query(Task).filter(Task.workflow_id == workflow_id).all()
 
+def touch_workflows(db: Session, *workflow_ids: int):
+    """
+    任务属于工作流的内容：修改任务时同时更新所属工作流的 updated_at，
+    使工作流的版本（ETag、执行计划缓存、乐观锁）随之变化，其他进程也能看到
+    """
+    ids = {workflow_id for workflow_id in workflow_ids if workflow_id is not None}
+    if ids:
+        db.execute(update(Workflow).where(Workflow.id.in_(ids)).values(updated_at=datetime.utcnow()))
+
 def create_task(db: Session, task: TaskCreate):
-    db_task = Task(**task.dict())
+    db_task = Task(**task.dict(exclude_unset=True))
     db.add(db_task)
+    touch_workflows(db, db_task.workflow_id)
     db.commit()
     db.refresh(db_task)
+    plan_cache.invalidate(db_task.workflow_id)
+    workflow_response_cache.invalidate(db_task.workflow_id)
     return db_task
 
 def update_task(db: Session, task_id: int, task: TaskUpdate):
     db_task = get_task(db, task_id)
     if db_task:
+        old_workflow_id = db_task.workflow_id
         for key, value in task.dict(exclude_unset=True).items():
             setattr(db_task, key, value)
+        touch_workflows(db, old_workflow_id, db_task.workflow_id)
         db.commit()
         db.refresh(db_task)
+        for workflow_id in {old_workflow_id, db_task.workflow_id}:
+            plan_cache.invalidate(workflow_id)
+            workflow_response_cache.invalidate(workflow_id)
     return db_task
 
 def delete_task(db: Session, task_id: int):
     db_task = get_task(db, task_id)
     if db_task:
+        workflow_id = db_task.workflow_id
         db.delete(db_task)
+        touch_workflows(db, workflow_id)
         db.commit()
+        plan_cache.invalidate(workflow_id)
+        workflow_response_cache.invalidate(workflow_id)
     return db_task
\ No newline at end of file
@@ -1,63 +1,213 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.orm import Session, load_only, selectinload
 from app.models.workflow import Workflow, Task
 from app.schemas.workflow import WorkflowCreate, WorkflowUpdate
+from app.services.execution_plan import plan_cache
+from app.services.workflow_cache import workflow_response_cache
+from app.utils.json_patch import JsonPatchError, apply_patch
+from datetime import datetime
+from typing import List, Optional
+import base64
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
-def get_workflows(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Workflow).offset(skip).limit(limit).all()
+def encode_cursor(workflow: Workflow) -> str:
+    """
+    根据列表最后一项生成分页游标，内容为 (updated_at, id)
+    """
+    raw = json.dumps([workflow.updated_at.isoformat() if workflow.updated_at else None, workflow.id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    """
+    解析分页游标，格式非法时抛出 ValueError
+    """
+    try:
+        updated_at, workflow_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return (datetime.fromisoformat(updated_at) if updated_at else None), int(workflow_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def workflows_query(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, summary: bool = False):
+    """
+    构建工作流列表查询，按 (updated_at, id) 倒序
+    :param cursor: 上一页返回的游标，提供时使用 keyset 分页并忽略 skip
+    :param summary: 为True时只加载列表所需的字段，不加载任务和描述
+    """
+    query = select(Workflow).order_by(Workflow.updated_at.desc(), Workflow.id.desc())
+    if summary:
+        query = query.options(load_only(Workflow.id, Workflow.name, Workflow.created_at, Workflow.updated_at))
+    else:
+        # 一次性加载所有工作流的任务，避免逐个懒加载
+        query = query.options(selectinload(Workflow.tasks))
+
+    if cursor:
+        updated_at, workflow_id = decode_cursor(cursor)
+        if updated_at is None:
+            query = query.filter(Workflow.updated_at.is_(None), Workflow.id < workflow_id)
+        else:
+            query = query.filter(or_(
+                Workflow.updated_at < updated_at,
+                and_(Workflow.updated_at == updated_at, Workflow.id < workflow_id),
+                Workflow.updated_at.is_(None)
+            ))
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+def get_workflows(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, summary: bool = False):
+    return db.execute(workflows_query(skip, limit, cursor, summary)).scalars().all()
 
 def get_workflow(db: Session, workflow_id: int):
-    return db.query(Workflow).filter(Workflow.id == workflow_id).first()
+    return db.query(Workflow).options(selectinload(Workflow.tasks)).filter(Workflow.id == workflow_id).first()
 
-def create_workflow(db: Session, workflow: WorkflowCreate):
-    # 解析描述中的节点信息
-    nodes_data = []
-    if workflow.description:
-        try:
-            metadata = json.loads(workflow.description)
-            nodes_data = metadata.get("nodes", [])
-        except json.JSONDecodeError:
-            print("Failed to parse workflow metadata")
+def _parse_graph(description: Optional[str]):
+    """
+    解析描述中的节点和连线信息
+    :return: (nodes, edges)
+    """
+    if not description:
+        return [], []
+    try:
+        metadata = json.loads(description)
+    except json.JSONDecodeError:
+        logger.warning("Failed to parse workflow metadata")
+        return [], []
+    if not isinstance(metadata, dict):
+        return [], []
+    return metadata.get("nodes") or [], metadata.get("edges") or []
+
+# 编辑器节点类型 -> 任务类型，只有这些节点会创建任务
+TASK_NODE_TYPES = {"modelNode": "llm", "codeNode": "code", "httpNode": "http"}
+
+def _task_fields(node: dict, i: int) -> dict:
+    # 构建更丰富的任务配置（不包含节点位置，拖动节点不会改动任务）
+    node_data = node.get("data", {})
+    task_config = {
+        "prompt": node_data.get("prompt", f"Process node: {node_data.get('label', '')}"),
+        "node_id": node.get("id"),
+        "node_data": node_data
+    }
+    return {
+        "name": node_data.get("label", f"Task {i+1}"),
+        "description": f"Task for node {node.get('id')}",
+        "type": TASK_NODE_TYPES[node.get("type")],
+        "order": i,
+        "config": json.dumps(task_config)
+    }
 
+def _task_node_id(task: Task) -> Optional[str]:
+    try:
+        node_id = json.loads(task.config or "{}").get("node_id")
+    except (json.JSONDecodeError, AttributeError):
+        return None
+    return str(node_id) if node_id is not None else None
+
+def _apply_diff(db: Session, model, workflow_id: int, existing: dict, incoming: dict) -> bool:
+    """
+    对比现有记录和新数据，只执行必要的 INSERT/UPDATE/DELETE
+    :param existing: key -> 现有ORM对象
+    :param incoming: key -> 新的字段值
+    :return: 是否有改动
+    """
+    changed = False
+    new_rows = []
+    for key, fields in incoming.items():
+        row = existing.get(key)
+        if row is None:
+            new_rows.append(model(workflow_id=workflow_id, **fields))
+            continue
+        for attr, value in fields.items():
+            if getattr(row, attr) != value:
+                setattr(row, attr, value)
+                changed = True
+
+    stale_ids = [row.id for key, row in existing.items() if key not in incoming]
+    if new_rows:
+        db.add_all(new_rows)
+    if stale_ids:
+        db.execute(delete(model).where(model.id.in_(stale_ids)))
+    return changed or bool(new_rows) or bool(stale_ids)
+
+def _task_rows(description: Optional[str]) -> dict:
+    """
+    根据描述生成任务的字段
+    :return: node_id -> 任务字段
+    """
+    nodes_data, _ = _parse_graph(description)
+    incoming_tasks = {}
+    for i, node in enumerate(nodes_data):
+        # 只为模型、代码和HTTP节点创建任务
+        if node.get("type") in TASK_NODE_TYPES:
+            incoming_tasks[str(node.get("id"))] = _task_fields(node, i)
+    return incoming_tasks
+
+def _sync_tasks(db: Session, workflow_id: int, description: Optional[str]) -> bool:
+    """
+    将描述中的任务节点同步到 tasks 表（描述仍是节点和连线的唯一来源，执行时据此建图）
+    按编辑器节点ID做增量对比，未变化的任务不会被改写，任务ID在多次保存之间保持不变；
+    只拖动节点时任务字段不变，保存只更新 workflows 中的一行
+    :return: 任务是否有改动
+    """
+    incoming_tasks = _task_rows(description)
+    existing_tasks = {}
+    for task in db.query(Task).filter(Task.workflow_id == workflow_id):
+        node_id = _task_node_id(task)
+        # 没有节点ID或重复的旧任务使用唯一键，保证会被删除
+        key = node_id if node_id is not None and node_id not in existing_tasks else f"#task-{task.id}"
+        existing_tasks[key] = task
+
+    return _apply_diff(db, Task, workflow_id, existing_tasks, incoming_tasks)
+
+def create_workflow(db: Session, workflow: WorkflowCreate):
     db_workflow = Workflow(
         name=workflow.name,
         description=workflow.description
     )
     db.add(db_workflow)
-    db.commit()
-    print("Committed transaction")
-    print(f"Workflow ID after commit: {getattr(db_workflow, 'id', 'No ID assigned')}")
+    # 只flush获取ID，工作流与节点、任务在同一事务中提交
+    db.flush()
     
     # 创建任务（基于节点数据）
-    for i, node in enumerate(nodes_data):
-        # 只为模型节点创建任务
-        if node.get("type") == "modelNode":
-            # 构建更丰富的任务配置
-            task_config = {
-                "prompt": node.get("data", {}).get("prompt", f"Process node: {node.get('data', {}).get('label', '')}"),
-                "node_id": node.get("id"),
-                "node_data": node.get("data", {}),
-                "position": node.get("position", {})
-            }
-            
-            task = Task(
-                name=node.get("data", {}).get("label", f"Task {i+1}"),
-                description=f"Task for node {node.get('id')}",
-                workflow_id=db_workflow.id,
-                type="llm",
-                order=i,
-                config=json.dumps(task_config)
-            )
-            db.add(task)
-    
+    _sync_tasks(db, db_workflow.id, workflow.description)
     db.commit()
     
     # 直接返回创建的工作流对象
     return db_workflow
 
+def bulk_create_workflows(db: Session, workflows: List[WorkflowCreate]) -> List[int]:
+    """
+    批量创建工作流，使用批量INSERT写入工作流及其任务，整批在一个事务中提交
+    :param workflows: 待创建的工作流
+    :return: 新工作流ID列表（与输入顺序一致）
+    """
+    if not workflows:
+        return []
+    now = datetime.utcnow()
+    workflow_ids = db.execute(
+        insert(Workflow).returning(Workflow.id, sort_by_parameter_order=True),
+        [{"name": workflow.name, "description": workflow.description, "created_at": now, "updated_at": now}
+         for workflow in workflows]
+    ).scalars().all()
+
+    task_rows = []
+    for workflow_id, workflow in zip(workflow_ids, workflows):
+        task_rows.extend(dict(fields, workflow_id=workflow_id) for fields in _task_rows(workflow.description).values())
+    if task_rows:
+        db.execute(insert(Task), task_rows)
+    db.commit()
+    return list(workflow_ids)
+
+def export_query():
+    """
+    导出查询，按ID顺序返回全部工作流的基本字段
+    """
+    return select(
+        Workflow.id, Workflow.name, Workflow.description, Workflow.created_at, Workflow.updated_at
+    ).order_by(Workflow.id)
+
 def update_workflow(db: Session, workflow_id: int, workflow: WorkflowUpdate):
     db_workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
     if db_workflow:
@@ -65,52 +215,82 @@ def update_workflow(db: Session, workflow_id: int, workflow: WorkflowUpdate):
         db_workflow.name = workflow.name
         db_workflow.description = workflow.description
         
-        # 解析描述中的节点信息
-        nodes_data = []
-        if workflow.description:
-            try:
-                metadata = json.loads(workflow.description)
-                nodes_data = metadata.get("nodes", [])
-            except json.JSONDecodeError:
-                print("Failed to parse workflow metadata")
-        
-        # 删除现有任务
-        db.query(Task).filter(Task.workflow_id == workflow_id).delete()
-        
-        # 重新创建任务（基于节点数据）
-        for i, node in enumerate(nodes_data):
-            # 只为模型节点创建任务
-            if node.get("type") == "modelNode":
-                # 构建更丰富的任务配置
-                task_config = {
-                    "prompt": node.get("data", {}).get("prompt", f"Process node: {node.get('data', {}).get('label', '')}"),
-                    "node_id": node.get("id"),
-                    "node_data": node.get("data", {}),
-                    "position": node.get("position", {})
-                }
-                
-                task = Task(
-                    name=node.get("data", {}).get("label", f"Task {i+1}"),
-                    description=f"Task for node {node.get('id')}",
-                    workflow_id=workflow_id,
-                    type="llm",
-                    order=i,
-                    config=json.dumps(task_config)
-                )
-                db.add(task)
+        # 增量同步任务，与基本信息在同一事务中提交
+        tasks_changed = _sync_tasks(db, workflow_id, workflow.description)
         
         db.commit()
-        print(f"Successfully updated workflow {workflow_id}")
+        workflow_response_cache.invalidate(workflow_id)
+        if tasks_changed:
+            # 任务有变化，旧的执行计划失效
+            plan_cache.invalidate(workflow_id)
+        logger.debug(f"Successfully updated workflow {workflow_id}")
     else:
-        print(f"Workflow with id {workflow_id} not found for update")
+        logger.debug(f"Workflow with id {workflow_id} not found for update")
     return db_workflow
 
+class WorkflowVersionConflict(Exception):
+    """工作流已被其他请求修改（乐观并发检查失败）"""
+
+def patch_workflow(db: Session, workflow_id: int, operations: List[dict], expected_updated_at=None):
+    """
+    对工作流应用 RFC 6902 JSON Patch
+    补丁作用于文档 {"name": 名称, "graph": 描述中的 nodes/edges 元数据}
+    :param operations: JSON Patch 操作列表
+    :param expected_updated_at: 客户端持有的版本（updated_at），与当前版本不一致时抛出 WorkflowVersionConflict
+    :return: (工作流, 变化的片段列表)，工作流不存在时返回 None
+    """
+    db_workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
+    if db_workflow is None:
+        return None
+    current_updated_at = db_workflow.updated_at
+    if expected_updated_at is not None and current_updated_at != expected_updated_at:
+        raise WorkflowVersionConflict(f"Workflow {workflow_id} has been modified")
+
+    metadata = {}
+    if db_workflow.description:
+        try:
+            metadata = json.loads(db_workflow.description)
+        except json.JSONDecodeError:
+            metadata = {}
+    if not isinstance(metadata, dict):
+        metadata = {}
+
+    changes = []
+    document = apply_patch({"name": db_workflow.name, "graph": metadata}, operations, changes)
+    if not isinstance(document, dict) or not isinstance(document.get("graph"), dict):
+        raise JsonPatchError("Patched document must contain a 'graph' object")
+    if not isinstance(document.get("name"), str) or not document["name"]:
+        raise JsonPatchError("Patched document must contain a non-empty 'name'")
+
+    description = json.dumps(document["graph"], ensure_ascii=False, separators=(",", ":"))
+    # 条件更新：读取之后如有其他写入则放弃本次修改
+    result = db.execute(
+        update(Workflow)
+        .where(Workflow.id == workflow_id, Workflow.updated_at == current_updated_at)
+        .values(name=document["name"], description=description, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.rollback()
+        raise WorkflowVersionConflict(f"Workflow {workflow_id} has been modified")
+
+    tasks_changed = _sync_tasks(db, workflow_id, description)
+    db.commit()
+    workflow_response_cache.invalidate(workflow_id)
+    if tasks_changed:
+        plan_cache.invalidate(workflow_id)
+    db.refresh(db_workflow)
+    return db_workflow, changes
+
 def delete_workflow(db: Session, workflow_id: int):
     db_workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
     if db_workflow:
+        # 运行记录、批次和批次条目由外键的 ON DELETE CASCADE 删除（SQLite 连接上开启了 foreign_keys）
         db.delete(db_workflow)
         db.commit()
-        print(f"Successfully deleted workflow {workflow_id}")
+        plan_cache.invalidate(workflow_id)
+        workflow_response_cache.invalidate(workflow_id)
+        logger.debug(f"Successfully deleted workflow {workflow_id}")
     else:
-        print(f"Workflow with id {workflow_id} not found for deletion")
+        logger.debug(f"Workflow with id {workflow_id} not found for deletion")
     return db_workflow
\ No newline at end of file
@@ -4,21 +4,48 @@ import os
 # Add the parent directory to the Python path so 'app' module can be imported
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import workflows, models
-from app.core.database import engine, Base
-import app.models.workflow
+from app.api.routes import workflows, models, runs, history, batches, blobs, metrics, profiles
+from app.utils.http_client import init_http_client, close_http_client, init_node_http_client, close_node_http_client
+from app.core.config import settings
+from app.services.execution_history import execution_history
+from app.services.node_executors import shutdown_executors
+from app.services.run_queue import run_queue
+from app.services.write_queue import write_queue
+from app.utils.metrics import MetricsMiddleware
+from app.utils.profiling import ProfilingMiddleware
+from app.utils.response_cache import close_response_cache
 
-# Force import of all models to ensure they are all registered before creating tables
-print("Importing models...")
-print("Creating database tables...")
-Base.metadata.create_all(bind=engine)
-print("Database tables created.")
-tables = Base.metadata.tables.keys()
-print(f"Tables that should be created: {list(tables)}")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 导入应用时不访问数据库；单进程运行时在启动阶段执行迁移，多进程部署由 app.serve 预先执行
+    if settings.DB_MIGRATE_ON_STARTUP:
+        from app.core.migrations import upgrade_database
+        upgrade_database()
+    # 启动时创建共享的HTTP连接池，关闭时释放
+    await init_http_client()
+    await init_node_http_client()
+    await execution_history.start()
+    if settings.WRITE_QUEUE_ENABLED:
+        await write_queue.start()
+    # 后台运行队列的工作者随应用启动，关闭时未完成的运行放回队列
+    if settings.RUN_QUEUE_ENABLED:
+        await run_queue.start()
+    yield
+    await run_queue.stop()
+    # 执行完已排队的写操作
+    await write_queue.stop()
+    # 写入缓冲区中剩余的执行历史
+    await execution_history.stop()
+    await close_http_client()
+    await close_node_http_client()
+    close_response_cache()
+    # 结束代码节点的工作进程
+    shutdown_executors()
 
-app = FastAPI(title="Dify-like System")
+app = FastAPI(title="Dify-like System", lifespan=lifespan)
 
 # 添加CORS中间件以允许前端访问
 app.add_middleware(
@@ -27,11 +54,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Batch-Id", "X-Profile-Id", "X-Profile-Summary"],
 )
 
+# 按路由记录请求延迟和状态码，供 /metrics 输出
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics.router)
+
+# 按请求开启的剖析，结果可通过 /api/v1/profiles 下载
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 # 确保重定向行为符合预期
 app.include_router(workflows.router, prefix="/api/v1")
 app.include_router(models.router, prefix="/api/v1")
+app.include_router(runs.router, prefix="/api/v1")
+app.include_router(history.router, prefix="/api/v1")
+app.include_router(batches.router, prefix="/api/v1")
+app.include_router(blobs.router, prefix="/api/v1")
+if settings.PROFILING_ENABLED:
+    app.include_router(profiles.router, prefix="/api/v1")
 
 @app.get("/")
 def read_root():
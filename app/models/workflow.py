@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, Float, UniqueConstraint, Boolean
 from sqlalchemy.orm import relationship
 from sqlalchemy import text
 from app.core.database import Base
@@ -16,8 +16,11 @@ class Workflow(Base):
     # 关联任务
     tasks = relationship("Task", back_populates="workflow", cascade="all, delete-orphan")
     
-    # 确保SQLite中的AUTOINCREMENT
-    __table_args__ = {'sqlite_autoincrement': True}
+    # (updated_at, id) 复合索引用于列表的 keyset 分页；确保SQLite中的AUTOINCREMENT
+    __table_args__ = (
+        Index("ix_workflows_updated_at_id", "updated_at", "id"),
+        {'sqlite_autoincrement': True},
+    )
 
 class Task(Base):
     __tablename__ = "tasks"
@@ -39,4 +42,120 @@ class Task(Base):
     workflow = relationship("Workflow", back_populates="tasks")
     
     # 确保SQLite中的AUTOINCREMENT
-    __table_args__ = {'sqlite_autoincrement': True}
\ No newline at end of file
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class WorkflowRun(Base):
+    __tablename__ = "workflow_runs"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    workflow_id = Column(Integer, ForeignKey("workflows.id", ondelete="CASCADE"), nullable=False, index=True)
+    # 运行状态：queued, running, succeeded, failed
+    status = Column(String, nullable=False, default="queued")
+    input_data = Column(Text, nullable=True)
+    use_cache = Column(Boolean, default=True)
+    # 执行结果（JSON字符串）和错误信息
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    # 领取该运行的工作者及其心跳，心跳超时的运行会被重新放回队列
+    worker_id = Column(String, nullable=True)
+    attempts = Column(Integer, default=0)
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    # (status, id) 索引用于按提交顺序领取排队中的运行
+    __table_args__ = (
+        Index("ix_workflow_runs_status_id", "status", "id"),
+        {'sqlite_autoincrement': True},
+    )
+
+class ExecutionRecord(Base):
+    __tablename__ = "execution_records"
+    
+    # 在内存中生成的ID（uuid），记录可以先缓冲再批量写入
+    id = Column(String, primary_key=True)
+    workflow_id = Column(Integer, nullable=False, index=True)
+    # 对应的后台运行（同步或流式执行时为空）
+    run_id = Column(Integer, nullable=True, index=True)
+    # 执行方式：sync, stream, queued
+    mode = Column(String, nullable=False)
+    # succeeded：全部节点成功；failed：存在失败或跳过的节点，或整个执行出错
+    status = Column(String, nullable=False)
+    error = Column(Text, nullable=True)
+    node_count = Column(Integer, default=0)
+    # 耗时（毫秒）：排队等待时间、从开始执行到结束的总时间
+    queue_wait_ms = Column(Float, default=0)
+    total_ms = Column(Float, default=0)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    total_tokens = Column(Integer, default=0)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_execution_records_workflow_started", "workflow_id", "started_at"),
+    )
+
+class NodeExecutionRecord(Base):
+    __tablename__ = "node_execution_records"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    execution_id = Column(String, ForeignKey("execution_records.id"), nullable=False, index=True)
+    workflow_id = Column(Integer, nullable=False)
+    task_id = Column(Integer, nullable=True, index=True)
+    task_name = Column(String, nullable=True)
+    node_id = Column(String, nullable=False)
+    # succeeded, failed, skipped
+    status = Column(String, nullable=False)
+    error = Column(Text, nullable=True)
+    # 输入输出只保存截断后的文本
+    input = Column(Text, nullable=True)
+    output = Column(Text, nullable=True)
+    cached = Column(Boolean, default=False)
+    # 耗时（毫秒）：等待并发名额、模型调用、从上游完成到本节点完成
+    queue_wait_ms = Column(Float, default=0)
+    network_ms = Column(Float, default=0)
+    total_ms = Column(Float, default=0)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    total_tokens = Column(Integer, default=0)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class WorkflowBatch(Base):
+    __tablename__ = "workflow_batches"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    workflow_id = Column(Integer, ForeignKey("workflows.id", ondelete="CASCADE"), nullable=False, index=True)
+    # 批次状态：pending, running, completed
+    status = Column(String, nullable=False, default="pending")
+    total = Column(Integer, default=0)
+    concurrency = Column(Integer, default=8)
+    use_cache = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class BatchItem(Base):
+    __tablename__ = "batch_items"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    batch_id = Column(Integer, ForeignKey("workflow_batches.id", ondelete="CASCADE"), nullable=False)
+    # 在输入中的序号（从0开始）
+    item_index = Column(Integer, nullable=False)
+    input_data = Column(Text, nullable=True)
+    # 条目状态：pending, succeeded, failed
+    status = Column(String, nullable=False, default="pending")
+    # 最终输出的文本内容
+    output = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    execution_id = Column(String, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        UniqueConstraint("batch_id", "item_index", name="uq_batch_items_batch_index"),
+        Index("ix_batch_items_batch_status", "batch_id", "status"),
+    )
@@ -1,5 +1,9 @@
 # Schemas package
-from .workflow import Workflow, WorkflowCreate, WorkflowUpdate
+from .workflow import Workflow, WorkflowCreate, WorkflowUpdate, WorkflowSummary
 from .task import Task, TaskCreate, TaskUpdate
+from .run import WorkflowRun
+from .batch import WorkflowBatch
+from .history import ExecutionRecord, NodeExecutionRecord, ExecutionDetail, WorkflowLatencyStats, NodeLatencyStats
 
-__all__ = ["Workflow", "WorkflowCreate", "WorkflowUpdate", "Task", "TaskCreate", "TaskUpdate"]
\ No newline at end of file
+__all__ = ["Workflow", "WorkflowCreate", "WorkflowUpdate", "WorkflowSummary", "Task", "TaskCreate", "TaskUpdate", "WorkflowRun", "WorkflowBatch",
+           "ExecutionRecord", "NodeExecutionRecord", "ExecutionDetail", "WorkflowLatencyStats", "NodeLatencyStats"]
\ No newline at end of file
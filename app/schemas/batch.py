@@ -0,0 +1,19 @@
+from typing import Dict, Optional
+from pydantic import BaseModel
+from datetime import datetime
+
+class WorkflowBatch(BaseModel):
+    id: int
+    workflow_id: int
+    status: str
+    total: int = 0
+    concurrency: int
+    use_cache: bool = True
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+    # 各状态的条目数量
+    counts: Dict[str, int] = {}
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,66 @@
+from typing import List, Optional
+from pydantic import BaseModel
+from datetime import datetime
+
+class NodeExecutionRecord(BaseModel):
+    task_id: Optional[int] = None
+    task_name: Optional[str] = None
+    node_id: str
+    status: str
+    error: Optional[str] = None
+    input: Optional[str] = None
+    output: Optional[str] = None
+    cached: bool = False
+    queue_wait_ms: float = 0
+    network_ms: float = 0
+    total_ms: float = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ExecutionRecord(BaseModel):
+    id: str
+    workflow_id: int
+    run_id: Optional[int] = None
+    mode: str
+    status: str
+    error: Optional[str] = None
+    node_count: int = 0
+    queue_wait_ms: float = 0
+    total_ms: float = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    started_at: datetime
+    finished_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ExecutionDetail(ExecutionRecord):
+    nodes: List[NodeExecutionRecord] = []
+
+class WorkflowLatencyStats(BaseModel):
+    workflow_id: int
+    executions: int
+    avg_total_ms: float
+    max_total_ms: float
+    avg_queue_wait_ms: float
+    total_tokens: int
+    failures: int
+
+class NodeLatencyStats(BaseModel):
+    workflow_id: int
+    task_id: Optional[int] = None
+    task_name: Optional[str] = None
+    executions: int
+    avg_network_ms: float
+    max_network_ms: float
+    avg_queue_wait_ms: float
+    avg_completion_tokens: float
+    total_tokens: int
@@ -0,0 +1,28 @@
+from typing import Any, Optional
+from pydantic import BaseModel, field_validator
+from datetime import datetime
+import json
+
+class WorkflowRun(BaseModel):
+    id: int
+    workflow_id: int
+    status: str
+    input_data: Optional[str] = None
+    use_cache: bool = True
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @field_validator("result", mode="before")
+    @classmethod
+    def parse_result(cls, value):
+        # 数据库中以JSON字符串保存
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+    class Config:
+        from_attributes = True
@@ -43,3 +43,12 @@ class Workflow(WorkflowBase):
     
     class Config:
         from_attributes = True
+
+class WorkflowSummary(BaseModel):
+    id: int
+    name: str
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,47 @@
+"""
+生产环境启动入口：先执行一次数据库迁移，再启动多个 uvicorn 工作进程
+
+用法：
+    python -m app.serve --host 0.0.0.0 --port 8000 --workers 4
+"""
+import argparse
+import logging
+import os
+import time
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="启动 simpleDify 后端")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "1")),
+                        help="工作进程数，默认读取 WEB_CONCURRENCY")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--skip-migrations", action="store_true", help="不执行数据库迁移（已单独执行 alembic upgrade head）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper())
+
+    if not args.skip_migrations:
+        from app.core.migrations import upgrade_database
+
+        started = time.perf_counter()
+        upgrade_database()
+        logging.getLogger(__name__).info(f"Database migrated in {(time.perf_counter() - started) * 1000:.0f}ms")
+    # 迁移只在这里执行一次：workers>1 时工作进程是子进程，通过环境变量关闭启动时迁移；
+    # workers=1 时 uvicorn 在本进程中加载应用，复用上面已经创建的配置对象，需要直接修改
+    os.environ["DB_MIGRATE_ON_STARTUP"] = "false"
+    from app.core.config import settings
+
+    settings.DB_MIGRATE_ON_STARTUP = False
+
+    import uvicorn
+
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Optional
+import asyncio
+import heapq
+import logging
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.crud import batch_crud
+from app.services.model_service import ModelService, get_model_service
+from app.services.workflow_execution_service import WorkflowExecutionService
+from app.utils.rate_limiter import PRIORITY_BATCH
+
+logger = logging.getLogger(__name__)
+
+
+def item_record(index: int, input_data: Optional[str], status: str, output: Optional[str] = None,
+                error: Optional[str] = None, execution_id: Optional[str] = None) -> dict:
+    """
+    返回给客户端的单条结果
+    """
+    return {
+        "index": index,
+        "input": input_data,
+        "status": status,
+        "output": output,
+        "error": error,
+        "execution_id": execution_id,
+    }
+
+
+class BatchService:
+    """
+    用同一个工作流批量处理多条输入
+    工作流只加载和编译一次，条目按给定并发执行；条目结果分批写入数据库，
+    中断（客户端断开或进程重启）后可以从未完成的条目继续
+    """
+
+    def __init__(self, model_service: ModelService = None, session_factory=AsyncSessionLocal):
+        self.model_service = model_service or get_model_service()
+        self.session_factory = session_factory
+
+    async def create_batch(self, workflow_id: int, inputs: Iterable[str], concurrency: int = None,
+                           use_cache: bool = True):
+        """
+        创建批次并保存全部输入，创建者直接持有该批次，随后调用 run_batch 执行
+        :raises WorkflowNotFoundError: 工作流不存在
+        :raises ValueError: 输入格式错误
+        :raises WorkflowGraphError: 工作流图非法
+        """
+        concurrency = self._clamp_concurrency(concurrency)
+        async with self.session_factory() as db:
+            # 先编译一次，工作流不存在或图非法时在写入条目前就报错
+            await WorkflowExecutionService(db, self.model_service).load_plan(workflow_id)
+            return await batch_crud.create_batch(db, workflow_id, inputs, concurrency, use_cache,
+                                                 settings.BULK_BATCH_SIZE, status=batch_crud.RUNNING)
+
+    async def claim_batch(self, batch_id: int) -> bool:
+        """
+        领取中断的批次以继续执行，批次正在执行或已完成时返回False
+        """
+        async with self.session_factory() as db:
+            return await batch_crud.claim_batch(db, batch_id, settings.BATCH_LEASE_SECONDS)
+
+    async def _heartbeat(self, batch_id: int):
+        while True:
+            await asyncio.sleep(settings.BATCH_LEASE_SECONDS / 3)
+            try:
+                async with self.session_factory() as db:
+                    await batch_crud.heartbeat(db, batch_id)
+            except Exception as e:
+                logger.warning(f"Error updating heartbeat of batch {batch_id}: {str(e)}")
+
+    @staticmethod
+    def _clamp_concurrency(concurrency: Optional[int]) -> int:
+        if not concurrency:
+            concurrency = settings.BATCH_DEFAULT_CONCURRENCY
+        return max(1, min(concurrency, settings.BATCH_MAX_CONCURRENCY))
+
+    async def run_batch(self, batch_id: int, ordered: bool = False,
+                        concurrency: int = None) -> AsyncIterator[dict]:
+        """
+        执行批次中尚未完成的条目，调用前需通过 create_batch 或 claim_batch 持有该批次
+        :param batch_id: 批次ID
+        :param ordered: True 时按输入顺序返回结果，否则按完成顺序返回
+        :param concurrency: 并发数，默认使用创建批次时的设置
+        :return: 异步生成器，逐条返回结果
+        """
+        async with self.session_factory() as db:
+            batch = await batch_crud.get_batch(db, batch_id)
+            if batch is None:
+                raise ValueError(f"Batch with id {batch_id} not found")
+            use_cache = batch.use_cache
+            concurrency = self._clamp_concurrency(concurrency or batch.concurrency)
+            items = await batch_crud.get_pending_items(db, batch_id)
+            executor = WorkflowExecutionService(db, self.model_service)
+            try:
+                plan = await executor.load_plan(batch.workflow_id)
+            except Exception:
+                # 无法开始执行时释放批次，修复工作流后可以重新继续
+                await batch_crud.set_batch_status(db, batch_id, batch_crud.PENDING)
+                raise
+        # 执行阶段只用到已编译的计划，不再访问数据库会话
+        semaphore = asyncio.Semaphore(concurrency)
+        results: asyncio.Queue = asyncio.Queue()
+        runners = []
+        unsaved = []
+
+        async def run_item(item):
+            try:
+                result = await executor.run_plan(plan, item.input_data, use_cache=use_cache, priority=PRIORITY_BATCH)
+                error = next((entry["error"] for entry in result["results"] if entry.get("error")), None)
+                if error is None:
+                    error = next((entry["result"].get("error") for entry in result["results"]
+                                  if isinstance(entry.get("result"), dict) and entry["result"].get("success") is False),
+                                 None)
+                output = result["final_output"]
+                record = item_record(
+                    item.item_index, item.input_data,
+                    batch_crud.FAILED if error else batch_crud.SUCCEEDED,
+                    executor._extract_content(output) if output is not None and not error else None,
+                    error, result["execution_id"]
+                )
+            except Exception as e:
+                logger.error(f"Error executing batch {batch_id} item {item.item_index}: {str(e)}")
+                record = item_record(item.item_index, item.input_data, batch_crud.FAILED, error=str(e))
+            await results.put((item.id, record))
+
+        async def produce():
+            for item in items:
+                await semaphore.acquire()
+                runners.append(asyncio.ensure_future(run_item(item)))
+
+        async def flush(status: str = None):
+            rows = list(unsaved)
+            unsaved.clear()
+            async with self.session_factory() as db:
+                await batch_crud.save_item_results(db, rows)
+                if status:
+                    await batch_crud.set_batch_status(db, batch_id, status)
+
+        producer = asyncio.ensure_future(produce())
+        heartbeat = asyncio.ensure_future(self._heartbeat(batch_id))
+        pending_indexes = [item.item_index for item in items]
+        next_position = 0
+        heap = []
+        completed = False
+        try:
+            for _ in range(len(items)):
+                item_id, record = await results.get()
+                # 结果被取走后才放行下一条，客户端读取变慢时执行也随之放慢
+                semaphore.release()
+                unsaved.append({
+                    "id": item_id,
+                    "status": record["status"],
+                    "output": record["output"],
+                    "error": record["error"],
+                    "execution_id": record["execution_id"],
+                    "finished_at": datetime.utcnow(),
+                })
+                if len(unsaved) >= settings.BATCH_FLUSH_SIZE:
+                    await flush()
+
+                if not ordered:
+                    yield record
+                    continue
+                # 按输入顺序返回：先到的结果暂存，等待前面的条目完成
+                heapq.heappush(heap, (record["index"], record))
+                while heap and heap[0][0] == pending_indexes[next_position]:
+                    yield heapq.heappop(heap)[1]
+                    next_position += 1
+            await flush(batch_crud.COMPLETED)
+            completed = True
+        finally:
+            producer.cancel()
+            heartbeat.cancel()
+            for runner in runners:
+                runner.cancel()
+            if not completed:
+                # 中断时保存已完成的条目并恢复为待执行，未保存的条目下次继续执行
+                await asyncio.shield(flush(batch_crud.PENDING))
@@ -0,0 +1,133 @@
+from typing import List, Optional
+import asyncio
+import logging
+import threading
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.database import async_engine
+from app.models.workflow import ExecutionRecord, NodeExecutionRecord
+
+logger = logging.getLogger(__name__)
+
+
+def truncate_text(value, limit: int) -> Optional[str]:
+    """
+    将输入输出转换为文本并截断，避免历史表随模型输出无限增长
+    """
+    if value is None:
+        return None
+    text = value if isinstance(value, str) else str(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def extract_usage(result) -> dict:
+    """
+    从模型服务的响应中提取 token 用量
+    """
+    usage = {}
+    if isinstance(result, dict):
+        if isinstance(result.get("usage"), dict):
+            # 执行过程中压缩后的结果（只保留 token 用量）
+            usage = result["usage"]
+        elif isinstance(result.get("data"), dict):
+            usage = result["data"].get("usage") or {}
+    return {
+        "prompt_tokens": usage.get("prompt_tokens") or 0,
+        "completion_tokens": usage.get("completion_tokens") or 0,
+        "total_tokens": usage.get("total_tokens") or 0,
+    }
+
+
+class ExecutionHistory:
+    """
+    执行历史的内存缓冲区
+    执行路径只把记录追加到缓冲区，达到批量大小或定时由后台任务一次性批量写入，
+    不会为每个节点增加一次提交；缓冲区超过上限时丢弃最早的记录而不是阻塞执行
+    """
+
+    def __init__(self, batch_size: int = 200, flush_interval: float = 2.0, max_buffer: int = 10000):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._runs: List[dict] = []
+        self._nodes: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Optional[asyncio.Future] = None
+        self.stats = {"recorded": 0, "flushed": 0, "dropped": 0, "errors": 0}
+
+    def record(self, run: dict, nodes: List[dict]):
+        """
+        记录一次执行及其节点记录（只写入内存）
+        """
+        with self._lock:
+            self._runs.append(run)
+            self._nodes.extend(nodes)
+            self.stats["recorded"] += 1
+            overflow = len(self._runs) - self.max_buffer
+            if overflow > 0:
+                dropped = {r["id"] for r in self._runs[:overflow]}
+                del self._runs[:overflow]
+                self._nodes = [n for n in self._nodes if n["execution_id"] not in dropped]
+                self.stats["dropped"] += overflow
+            full = len(self._runs) >= self.batch_size
+
+        # 缓冲区已满时提前触发一次后台写入
+        if full and self._task is not None and (self._pending is None or self._pending.done()):
+            self._pending = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        """
+        把缓冲区中的记录批量写入数据库
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            with self._lock:
+                runs, self._runs = self._runs, []
+                nodes, self._nodes = self._nodes, []
+            if not runs:
+                return
+            try:
+                async with async_engine.begin() as conn:
+                    await conn.execute(insert(ExecutionRecord), runs)
+                    if nodes:
+                        await conn.execute(insert(NodeExecutionRecord), nodes)
+                self.stats["flushed"] += len(runs)
+            except Exception as e:
+                # 写入失败只记录日志，历史数据不影响执行结果
+                self.stats["errors"] += 1
+                logger.error(f"Failed to write execution history ({len(runs)} runs): {str(e)}")
+
+    async def start(self):
+        if self._task is None:
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """
+        停止定时写入并写入剩余的记录
+        """
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if self._pending is not None:
+            await asyncio.gather(self._pending, return_exceptions=True)
+            self._pending = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+execution_history = ExecutionHistory(
+    batch_size=settings.HISTORY_BATCH_SIZE,
+    flush_interval=settings.HISTORY_FLUSH_INTERVAL,
+    max_buffer=settings.HISTORY_MAX_BUFFER,
+)
@@ -0,0 +1,185 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import json
+import logging
+import threading
+
+from app.core.config import settings
+from app.services.workflow_graph import WorkflowGraph
+from app.utils.prompt_loader import load_system_prompt
+
+logger = logging.getLogger(__name__)
+
+WORKFLOW_SYSTEM_PROMPT_PATH = "app/sysprompt/workflow_prompt.md"
+
+
+@dataclass(frozen=True)
+class CompiledNode:
+    """
+    编译后的任务节点，只包含纯数据，不持有ORM对象
+    提示模板预先拆分为：无输入时的提示，以及有输入时拼接在内容前后的部分
+    """
+    task_id: int
+    name: str
+    type: str
+    order: int
+    node_id: str
+    config: dict
+    prompt: str
+    input_prefix: str
+    input_suffix: str
+    max_tokens: int
+    temperature: float
+    use_cache: bool
+
+    def render_prompt(self, content: Optional[str] = None) -> str:
+        """
+        根据上游内容生成最终提示
+        """
+        if content is None:
+            return self.prompt
+        return f"{self.input_prefix}{content}{self.input_suffix}"
+
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    """
+    工作流的不可变执行计划，同一版本的工作流只需编译一次
+    """
+    workflow_id: int
+    workflow_name: str
+    updated_at: object
+    nodes: Tuple[CompiledNode, ...]
+    graph: WorkflowGraph
+    start_input: Optional[str]
+    system_prompt_path: str
+    system_prompt: Optional[str]
+
+
+def compile_task(task) -> CompiledNode:
+    """
+    解析任务配置并预先生成提示模板
+    :param task: Task ORM对象
+    """
+    config = {}
+    if task.config:
+        try:
+            config = json.loads(task.config)
+        except json.JSONDecodeError:
+            logger.warning(f"Invalid config for task {task.name}")
+    if not isinstance(config, dict):
+        config = {}
+
+    # 旧数据没有 node_id 时使用任务ID作为节点标识
+    node_id = str(config.get("node_id") or f"task-{task.id}")
+
+    # 获取节点数据中的自定义提示或使用默认提示
+    node_data = config.get("node_data", {})
+    custom_prompt = node_data.get("prompt", "")
+    if custom_prompt:
+        prompt = custom_prompt
+        input_prefix = f"{custom_prompt}\n\nInput data: "
+        input_suffix = ""
+    else:
+        node_label = node_data.get("label", "")
+        prompt = f"Process node: {node_label}" if node_label else "Process the following input:"
+        input_prefix = f"{prompt}\n\nInput data: "
+        input_suffix = "\n\nPlease process this input according to your instructions."
+
+    return CompiledNode(
+        task_id=task.id,
+        name=task.name,
+        type=task.type,
+        order=task.order,
+        node_id=node_id,
+        config=config,
+        prompt=prompt,
+        input_prefix=input_prefix,
+        input_suffix=input_suffix,
+        max_tokens=config.get("max_tokens", 1024),
+        temperature=config.get("temperature", 0.8),
+        # 任务配置中 "cache": false 时该节点不使用响应缓存
+        use_cache=config.get("cache", True),
+    )
+
+
+def compile_workflow(workflow) -> ExecutionPlan:
+    """
+    将工作流编译为执行计划
+    :param workflow: Workflow ORM对象
+    :return: ExecutionPlan
+    """
+    nodes = tuple(sorted((compile_task(task) for task in workflow.tasks), key=lambda x: x.order))
+    graph = WorkflowGraph(list(nodes), workflow.description)
+    return ExecutionPlan(
+        workflow_id=workflow.id,
+        workflow_name=workflow.name,
+        updated_at=workflow.updated_at,
+        nodes=nodes,
+        graph=graph,
+        start_input=graph.start_input,
+        system_prompt_path=WORKFLOW_SYSTEM_PROMPT_PATH,
+        system_prompt=load_system_prompt(WORKFLOW_SYSTEM_PROMPT_PATH),
+    )
+
+
+class PlanCache:
+    """
+    按 (workflow_id, updated_at) 缓存执行计划的有界LRU
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._plans: "OrderedDict[int, ExecutionPlan]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._plans)
+
+    def get(self, workflow) -> ExecutionPlan:
+        """
+        获取工作流的执行计划，缓存未命中或已过期时重新编译
+        """
+        plan = self.lookup(workflow.id, workflow.updated_at)
+        if plan is None:
+            plan = self.put(workflow)
+        return plan
+
+    def lookup(self, workflow_id: int, updated_at) -> Optional[ExecutionPlan]:
+        """
+        只按版本查找已编译的执行计划，不访问工作流的任务（便于调用方在命中时跳过任务加载）
+        """
+        with self._lock:
+            plan = self._plans.get(workflow_id)
+            if plan is None or plan.updated_at != updated_at:
+                return None
+            self._plans.move_to_end(workflow_id)
+
+        # 系统提示文件被修改后同样需要重新编译
+        if load_system_prompt(plan.system_prompt_path) != plan.system_prompt:
+            return None
+        return plan
+
+    def put(self, workflow) -> ExecutionPlan:
+        """
+        编译工作流并放入缓存
+        """
+        plan = compile_workflow(workflow)
+        with self._lock:
+            self._plans[workflow.id] = plan
+            self._plans.move_to_end(workflow.id)
+            while len(self._plans) > self.max_size:
+                self._plans.popitem(last=False)
+        return plan
+
+    def invalidate(self, workflow_id: int):
+        with self._lock:
+            self._plans.pop(workflow_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+
+plan_cache = PlanCache(settings.PLAN_CACHE_SIZE)
@@ -1,23 +1,94 @@
+from typing import Awaitable, Callable, Optional
 from app.utils.qwen_client import QwenClient
+from app.utils.rate_limiter import PRIORITY_INTERACTIVE
+from app.utils.response_cache import ResponseCache, get_response_cache, make_cache_key
+from app.utils.single_flight import SingleFlight
 
 class ModelService:
-    def __init__(self):
-        self.qwen_client = QwenClient()
+    def __init__(self, qwen_client: Optional[QwenClient] = None, cache: Optional[ResponseCache] = None):
+        self.qwen_client = qwen_client or QwenClient()
+        # 响应缓存需通过 LLM_CACHE_ENABLED 开启
+        self.cache = cache or get_response_cache()
+        # 合并进行中的相同请求（按完整请求体和排队优先级），与是否开启响应缓存无关
+        self.single_flight = SingleFlight()
     
     async def process_with_qwen_plus(self, prompt: str, **kwargs):
         """
         使用Qwen-Plus处理任务
         :param prompt: 输入提示
-        :param kwargs: 其他参数
-        :return: 模型响应
+        :param kwargs: 其他参数，use_cache=False 时跳过响应缓存和请求合并，priority 为出站排队优先级
+        :return: 模型响应，cached 表示是否来自响应缓存
         """
         try:
             # 为工作流任务提供适当的系统提示
             system_prompt_path = kwargs.pop("system_prompt_path", "app/sysprompt/prompt.md")
-            response = await self.qwen_client.call_qwen_plus(prompt, system_prompt_path, **kwargs)
+            use_cache = kwargs.pop("use_cache", True)
+            priority = kwargs.pop("priority", PRIORITY_INTERACTIVE)
+            payload = self.qwen_client.build_payload(prompt, system_prompt_path, **kwargs)
+
+            key = make_cache_key(payload) if use_cache else None
+            cache_key = key if self.cache else None
+            response = await self.cache.get(cache_key) if cache_key else None
+            cached = response is not None
+            if response is None:
+                fetch = lambda: self._fetch(payload, priority, cache_key)
+                if key:
+                    # 相同请求正在进行时直接等待其结果，不再重复调用
+                    response, _ = await self.single_flight.do(self._flight_key(key, priority), fetch)
+                else:
+                    response = await fetch()
+            return {
+                "success": True,
+                "data": response,
+                "cached": cached
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e)
+            }
+
+    async def stream_with_qwen_plus(self, prompt: str, on_token: Callable[[str], Awaitable[None]], **kwargs):
+        """
+        以流式方式使用Qwen-Plus处理任务，每收到一段内容调用一次 on_token
+        :param prompt: 输入提示
+        :param on_token: 异步回调，参数为增量文本
+        :param kwargs: 其他参数，use_cache=False 时跳过响应缓存和请求合并
+        :return: 与 process_with_qwen_plus 相同结构的响应，data 为拼接后的完整结果
+        """
+        try:
+            system_prompt_path = kwargs.pop("system_prompt_path", "app/sysprompt/prompt.md")
+            use_cache = kwargs.pop("use_cache", True)
+            priority = kwargs.pop("priority", PRIORITY_INTERACTIVE)
+            payload = self.qwen_client.build_payload(prompt, system_prompt_path, **kwargs)
+
+            # 命中缓存时一次性推送完整内容
+            key = make_cache_key(payload) if use_cache else None
+            cache_key = key if self.cache else None
+            cached = await self.cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                content = self._content(cached)
+                if content:
+                    await on_token(content)
+                return {
+                    "success": True,
+                    "data": cached,
+                    "cached": True
+                }
+
+            fetch = lambda: self._fetch_stream(payload, priority, cache_key, on_token)
+            if key:
+                response, shared = await self.single_flight.do(self._flight_key(key, priority), fetch)
+                content = self._content(response)
+                if shared and content:
+                    # 复用了其他请求发起的调用，结束后一次性推送完整内容
+                    await on_token(content)
+            else:
+                response = await fetch()
             return {
                 "success": True,
-                "data": response
+                "data": response,
+                "cached": False
             }
         except Exception as e:
             return {
@@ -25,6 +96,58 @@ class ModelService:
                 "error": str(e)
             }
 
+    async def _fetch(self, payload: dict, priority: int, cache_key: Optional[str]):
+        response = await self.qwen_client.send(payload, priority)
+        if cache_key:
+            await self.cache.set(cache_key, response)
+        return response
+
+    async def _fetch_stream(self, payload: dict, priority: int, cache_key: Optional[str],
+                            on_token: Callable[[str], Awaitable[None]]):
+        parts = []
+        response = {}
+        finish_reason = None
+        async for chunk in self.qwen_client.send_stream(payload, priority):
+            # 保留最后一个数据块的 id/model/usage 等元信息
+            response.update({k: v for k, v in chunk.items() if k != "choices" and v is not None})
+            for choice in chunk.get("choices") or []:
+                delta = choice.get("delta", {}).get("content")
+                if delta:
+                    parts.append(delta)
+                    await on_token(delta)
+                finish_reason = choice.get("finish_reason") or finish_reason
+
+        # 组装为非流式接口的响应格式，便于下游节点统一处理
+        response["object"] = "chat.completion"
+        response["choices"] = [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "".join(parts)},
+            "finish_reason": finish_reason
+        }]
+        if cache_key:
+            await self.cache.set(cache_key, response)
+        return response
+
+    @staticmethod
+    def _flight_key(key: str, priority: int) -> str:
+        # 合并时区分优先级：交互式请求不会等待以批量优先级排队的相同调用
+        return f"{key}:{priority}"
+
+    @staticmethod
+    def _content(response: dict) -> str:
+        return (response.get("choices") or [{}])[0].get("message", {}).get("content") or ""
+
+_model_service: Optional[ModelService] = None
+
+def get_model_service() -> ModelService:
+    """
+    获取进程内共享的ModelService实例（可用作FastAPI依赖）
+    """
+    global _model_service
+    if _model_service is None:
+        _model_service = ModelService()
+    return _model_service
+
 # For debugging purposes
 if __name__ == "__main__":
     import asyncio
@@ -0,0 +1,195 @@
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
+from urllib.parse import quote
+import json
+import logging
+
+import httpx
+
+from app.core.config import settings
+from app.services.execution_plan import CompiledNode, WORKFLOW_SYSTEM_PROMPT_PATH
+from app.utils.code_runner import CodeError, CodeRunner
+from app.utils.http_client import get_node_http_client
+from app.utils.profiling import span
+from app.utils.rate_limiter import PRIORITY_INTERACTIVE
+from app.utils.url_guard import BlockedURLError, check_url, parse_hosts
+
+logger = logging.getLogger(__name__)
+
+# 模板中的该占位符替换为上游节点的输出
+INPUT_PLACEHOLDER = "{{input}}"
+
+
+@dataclass
+class NodeContext:
+    """
+    一次节点执行的上下文（与节点本身无关的运行参数）
+    """
+    model_service: object
+    system_prompt: Optional[str] = None
+    emit: Optional[Callable[[str, dict], Awaitable[None]]] = None
+    use_cache: bool = True
+    priority: int = PRIORITY_INTERACTIVE
+
+
+class NodeExecutor:
+    """
+    节点执行器：按任务类型注册，返回与模型服务相同结构的结果
+    {"success": True, "data": 输出} 或 {"success": False, "error": 错误信息}
+    """
+    type: str = ""
+
+    async def execute(self, node: CompiledNode, content: Optional[str], context: NodeContext) -> dict:
+        """
+        :param node: 编译后的节点
+        :param content: 上游输出的文本内容，没有上游输入时为None
+        :param context: 执行上下文
+        """
+        raise NotImplementedError
+
+
+class LLMExecutor(NodeExecutor):
+    type = "llm"
+
+    async def execute(self, node: CompiledNode, content: Optional[str], context: NodeContext) -> dict:
+        # 有输入数据时将其内容拼接到预先生成的提示模板中
+        prompt = node.render_prompt(content) if content else node.prompt
+        params = {
+            "system_prompt": context.system_prompt,
+            "system_prompt_path": WORKFLOW_SYSTEM_PROMPT_PATH,
+            "max_tokens": node.max_tokens,
+            "temperature": node.temperature,
+            "use_cache": context.use_cache and node.use_cache,
+            "priority": context.priority
+        }
+
+        if context.emit:
+            emit = context.emit
+
+            async def on_token(text: str):
+                await emit("token", {"node_id": node.node_id, "content": text})
+
+            return await context.model_service.stream_with_qwen_plus(prompt, on_token, **params)
+
+        # 调用大模型，使用专门的工作流系统提示
+        return await context.model_service.process_with_qwen_plus(prompt=prompt, **params)
+
+
+class CodeExecutor(NodeExecutor):
+    """
+    代码节点：节点数据中的 code 定义 main(input)，在进程池中执行，输入为上游输出的文本
+    """
+    type = "code"
+
+    def __init__(self):
+        self.runner = CodeRunner(workers=settings.CODE_NODE_WORKERS, memory_mb=settings.CODE_NODE_MEMORY_MB)
+
+    async def execute(self, node: CompiledNode, content: Optional[str], context: NodeContext) -> dict:
+        if not settings.CODE_NODE_ENABLED:
+            return {"success": False, "error": "Code nodes are disabled (set CODE_NODE_ENABLED=true)"}
+        node_data = node.config.get("node_data", {})
+        source = node_data.get("code") or ""
+        # 节点可以设置更短的超时，不能超过全局上限
+        timeout = min(float(node_data.get("timeout") or settings.CODE_NODE_TIMEOUT), settings.CODE_NODE_TIMEOUT)
+        try:
+            with span("code.run", node=node.node_id):
+                output = await self.runner.run(source, content or "", timeout, settings.CODE_NODE_MAX_OUTPUT_BYTES)
+        except CodeError as e:
+            return {"success": False, "error": str(e)}
+        return {"success": True, "data": output}
+
+
+class HTTPExecutor(NodeExecutor):
+    """
+    HTTP节点：使用节点专用的连接池发送请求（不保存 Cookie），响应正文作为输出
+    节点数据：method（默认GET）、url、headers、body（字符串或JSON），url 和 body 中的 {{input}} 替换为上游输出；
+    POST/PUT/PATCH 没有配置 body 时直接发送上游输出
+    只允许 http/https，默认拒绝解析到非公网地址的主机（见 HTTP_NODE_ALLOWED_HOSTS / HTTP_NODE_ALLOW_PRIVATE），不跟随重定向
+    """
+    type = "http"
+
+    def __init__(self):
+        self.allowed_hosts = parse_hosts(settings.HTTP_NODE_ALLOWED_HOSTS)
+
+    async def execute(self, node: CompiledNode, content: Optional[str], context: NodeContext) -> dict:
+        node_data = node.config.get("node_data", {})
+        method = str(node_data.get("method") or "GET").upper()
+        content = content or ""
+        url = str(node_data.get("url") or "").replace(INPUT_PLACEHOLDER, quote(content, safe=""))
+        if not url:
+            return {"success": False, "error": "HTTP node has no url"}
+        headers = {str(key): str(value) for key, value in (node_data.get("headers") or {}).items()}
+        body = node_data.get("body")
+        if isinstance(body, (dict, list)):
+            # JSON 正文中的占位符替换为转义后的字符串内容
+            body = json.dumps(body, ensure_ascii=False).replace(INPUT_PLACEHOLDER, json.dumps(content)[1:-1])
+            headers.setdefault("Content-Type", "application/json")
+        elif body:
+            body = str(body).replace(INPUT_PLACEHOLDER, content)
+        elif method in ("POST", "PUT", "PATCH"):
+            body = content
+        timeout = min(float(node_data.get("timeout") or settings.HTTP_NODE_TIMEOUT), settings.HTTP_NODE_TIMEOUT)
+        limit = settings.HTTP_NODE_MAX_RESPONSE_BYTES
+
+        try:
+            target, options = await check_url(httpx.URL(url), self.allowed_hosts, settings.HTTP_NODE_ALLOW_PRIVATE)
+        except httpx.InvalidURL as e:
+            return {"success": False, "error": f"Invalid HTTP node url: {e}"}
+        except BlockedURLError as e:
+            return {"success": False, "error": f"HTTP node url is not allowed: {e}"}
+        headers.update(options.get("headers", {}))
+
+        try:
+            with span("http.request", node=node.node_id, method=method):
+                client = get_node_http_client()
+                request = client.build_request(method, target, headers=headers,
+                                               content=body.encode("utf-8") if body else None,
+                                               timeout=timeout, extensions=options.get("extensions"))
+                # 重定向的目标没有经过地址检查，不跟随
+                response = await client.send(request, stream=True, follow_redirects=False)
+                try:
+                    chunks, size = [], 0
+                    # 超过上限时停止读取，不把整个响应读入内存
+                    async for chunk in response.aiter_bytes():
+                        size += len(chunk)
+                        if size > limit:
+                            return {"success": False, "error": f"HTTP response exceeds {limit} bytes"}
+                        chunks.append(chunk)
+                finally:
+                    await response.aclose()
+        except httpx.HTTPError as e:
+            return {"success": False, "error": f"HTTP request failed: {type(e).__name__}: {e}"}
+
+        text = b"".join(chunks).decode(response.encoding or "utf-8", errors="replace")
+        if response.status_code >= 400:
+            return {"success": False, "error": f"HTTP {response.status_code}: {text[:200]}"}
+        return {"success": True, "data": text}
+
+
+_executors: Dict[str, NodeExecutor] = {}
+
+
+def register_executor(executor: NodeExecutor):
+    """
+    注册节点执行器，同一类型后注册的覆盖先注册的
+    """
+    _executors[executor.type] = executor
+
+
+def get_executor(node_type: str) -> Optional[NodeExecutor]:
+    return _executors.get(node_type)
+
+
+def shutdown_executors():
+    """
+    释放执行器持有的资源（代码节点的进程池），应用关闭时调用
+    """
+    for executor in _executors.values():
+        runner = getattr(executor, "runner", None)
+        if runner is not None:
+            runner.shutdown()
+
+
+register_executor(LLMExecutor())
+register_executor(CodeExecutor())
+register_executor(HTTPExecutor())
@@ -0,0 +1,171 @@
+from typing import Dict, Set
+import asyncio
+import logging
+import os
+import socket
+
+from app.core.config import settings
+from app.core.database import AsyncReadSessionLocal, AsyncSessionLocal
+from app.crud import run_crud
+from app.services.workflow_execution_service import WorkflowExecutionService
+from app.utils.rate_limiter import PRIORITY_BATCH
+
+logger = logging.getLogger(__name__)
+
+
+class RunQueue:
+    """
+    后台运行队列：以 workflow_runs 表作为持久化队列，由固定数量的异步工作者领取并执行
+    提交运行后立即返回，客户端通过运行ID轮询或订阅进度；
+    进程重启后，排队中的运行会继续执行，心跳超时的运行会被重新排队
+    """
+
+    def __init__(self, workers: int = 4, per_workflow_concurrency: int = 1, poll_interval: float = 1.0,
+                 lease_seconds: float = 60.0, max_attempts: int = 3):
+        self.workers = max(1, workers)
+        self.per_workflow_concurrency = per_workflow_concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._prefix = f"{socket.gethostname()}:{os.getpid()}"
+        # 当前进程正在执行的运行数量
+        self.active_runs = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        await self._recover()
+        self._tasks = [asyncio.ensure_future(self._worker(f"{self._prefix}:{i}")) for i in range(self.workers)]
+        self._tasks.append(asyncio.ensure_future(self._maintain()))
+        logger.info(f"Run queue started with {self.workers} workers")
+
+    async def stop(self):
+        """
+        停止所有工作者，执行中的运行会被放回队列
+        """
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def notify(self):
+        """
+        有新运行提交时唤醒空闲的工作者
+        """
+        self._wakeup.set()
+
+    def subscribe(self, run_id: int) -> asyncio.Queue:
+        """
+        订阅运行事件，返回接收 (事件名, 数据) 的队列
+        只能收到由当前进程执行的运行的事件
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(run_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, run_id: int, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(run_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[run_id]
+
+    def _publish(self, run_id: int, event: str, data: dict):
+        for queue in self._subscribers.get(run_id, ()):
+            queue.put_nowait((event, data))
+
+    async def _recover(self):
+        try:
+            async with AsyncSessionLocal() as db:
+                count = await run_crud.recover_stale_runs(db, self.lease_seconds, self.max_attempts)
+            if count:
+                logger.warning(f"Recovered {count} stale workflow runs")
+        except Exception as e:
+            logger.error(f"Error recovering stale workflow runs: {str(e)}")
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 2)
+            await self._recover()
+
+    async def _worker(self, worker_id: str):
+        while True:
+            # 先清除再领取，避免领取期间提交的运行错过唤醒
+            self._wakeup.clear()
+            try:
+                async with AsyncSessionLocal() as db:
+                    run = await run_crud.claim_next_run(db, worker_id, self.per_workflow_concurrency)
+            except Exception as e:
+                logger.error(f"Error claiming workflow run: {str(e)}")
+                run = None
+
+            if run is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(run, worker_id)
+
+    async def _heartbeat(self, run_id: int, worker_id: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await run_crud.heartbeat(db, run_id, worker_id)
+            except Exception as e:
+                logger.warning(f"Error updating heartbeat of run {run_id}: {str(e)}")
+
+    async def _execute(self, run, worker_id: str):
+        run_id = run.id
+
+        async def emit(event: str, data: dict):
+            self._publish(run_id, event, dict(data, run_id=run_id))
+
+        heartbeat = asyncio.ensure_future(self._heartbeat(run_id, worker_id))
+        result, error = None, None
+        self.active_runs += 1
+        try:
+            async with AsyncReadSessionLocal() as db:
+                service = WorkflowExecutionService(db)
+                plan = await service.load_plan(run.workflow_id)
+                queue_wait_ms = (run.started_at - run.created_at).total_seconds() * 1000
+                result = await service.run_plan(plan, run.input_data, emit, run.use_cache,
+                                                run_id=run_id, queue_wait_ms=queue_wait_ms,
+                                                priority=PRIORITY_BATCH)
+        except asyncio.CancelledError:
+            # 进程关闭时放回队列，由下次启动的工作者继续执行
+            heartbeat.cancel()
+            async with AsyncSessionLocal() as db:
+                await run_crud.release_run(db, run_id, worker_id)
+            raise
+        except Exception as e:
+            logger.error(f"Error executing workflow run {run_id}: {str(e)}")
+            error = str(e)
+        finally:
+            heartbeat.cancel()
+            self.active_runs -= 1
+
+        async with AsyncSessionLocal() as db:
+            await run_crud.finish_run(db, run_id, worker_id, result, error)
+        if error:
+            self._publish(run_id, "run-failed", {"run_id": run_id, "workflow_id": run.workflow_id, "error": error})
+        else:
+            self._publish(run_id, "run-finished", dict(result, run_id=run_id))
+
+
+run_queue = RunQueue(
+    workers=settings.RUN_WORKERS,
+    per_workflow_concurrency=settings.RUN_PER_WORKFLOW_CONCURRENCY,
+    poll_interval=settings.RUN_POLL_INTERVAL,
+    lease_seconds=settings.RUN_LEASE_SECONDS,
+    max_attempts=settings.RUN_MAX_ATTEMPTS,
+)
@@ -0,0 +1,125 @@
+from collections import OrderedDict
+from typing import Optional
+import gzip
+import json
+import threading
+
+from fastapi.responses import Response
+
+from app.core.config import settings
+from app.schemas.workflow import Workflow as WorkflowSchema
+from app.utils.profiling import span
+
+try:
+    import orjson
+except ImportError:
+    # orjson 在 requirements.txt 中，缺少时退回标准库，输出相同
+    orjson = None
+
+
+def dumps(value) -> bytes:
+    """
+    序列化为紧凑的 UTF-8 JSON（与 FastAPI 默认的 JSONResponse 输出一致）
+    :param value: 只包含JSON基本类型的值
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    if not accept_encoding:
+        return False
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            # gzip;q=0 表示不接受
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class SerializedWorkflow:
+    """
+    一个版本的工作流详情：序列化后的JSON，超过 gzip_min_bytes 时同时保存压缩结果
+    """
+
+    __slots__ = ("updated_at", "body", "gzipped")
+
+    def __init__(self, updated_at, body: bytes, gzip_min_bytes: int):
+        self.updated_at = updated_at
+        self.body = body
+        # 压缩一次，之后的请求直接返回
+        self.gzipped = None
+        if len(body) >= gzip_min_bytes:
+            with span("serialize.gzip", bytes=len(body)):
+                self.gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+
+    def response(self, accept_encoding: Optional[str], headers: dict) -> Response:
+        headers = dict(headers)
+        body = self.body
+        if self.gzipped is not None and accepts_gzip(accept_encoding):
+            body = self.gzipped
+            headers["Content-Encoding"] = "gzip"
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+class WorkflowResponseCache:
+    """
+    按 (workflow_id, updated_at) 缓存工作流详情的序列化结果的有界LRU
+    工作流或任务被修改、删除时失效；并发读取在失效之前开始时，读到的旧版本不会放入缓存
+    """
+
+    def __init__(self, max_size: int = 512, gzip_min_bytes: int = 1024):
+        self.max_size = max_size
+        self.gzip_min_bytes = gzip_min_bytes
+        self._entries: "OrderedDict[int, SerializedWorkflow]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 每次失效加一，读取数据库前记录，放入缓存时与当前值比较
+        self.generation = 0
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, workflow_id: int, updated_at) -> Optional[SerializedWorkflow]:
+        with self._lock:
+            entry = self._entries.get(workflow_id)
+            if entry is None or entry.updated_at != updated_at:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(workflow_id)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, workflow, generation: int) -> SerializedWorkflow:
+        """
+        序列化工作流（含任务）并放入缓存
+        :param workflow: Workflow ORM对象
+        :param generation: 读取数据库之前的 generation，期间有失效时只返回结果不缓存
+        """
+        with span("serialize.model_validate", workflow_id=workflow.id):
+            data = WorkflowSchema.model_validate(workflow).model_dump(mode="json")
+        with span("serialize.dumps", workflow_id=workflow.id):
+            body = dumps(data)
+        entry = SerializedWorkflow(workflow.updated_at, body, self.gzip_min_bytes)
+        with self._lock:
+            if generation == self.generation:
+                self._entries[workflow.id] = entry
+                self._entries.move_to_end(workflow.id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, workflow_id: int):
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(workflow_id, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+workflow_response_cache = WorkflowResponseCache(settings.WORKFLOW_RESPONSE_CACHE_SIZE,
+                                                settings.WORKFLOW_GZIP_MIN_BYTES)
@@ -1,80 +1,384 @@
-from sqlalchemy.orm import Session
-from app.models.workflow import Workflow, Task
-from app.services.model_service import ModelService
-import json
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud import async_workflow_crud
+from app.models.workflow import Task
+from app.core.config import settings
+from app.services.model_service import ModelService, get_model_service
+from app.services.execution_plan import CompiledNode, ExecutionPlan, compile_task, plan_cache
+from app.services.execution_history import execution_history, extract_usage, truncate_text
+from app.services.node_executors import NodeContext, get_executor
+from app.services.workflow_graph import WorkflowGraph
+from app.utils.blob_store import BlobRef, blob_store
+from app.utils.metrics import WORKFLOW_EXECUTIONS_IN_PROGRESS, observe_execution
+from app.utils.profiling import span
+from app.utils.rate_limiter import PRIORITY_INTERACTIVE
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+import asyncio
 import logging
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# 执行事件回调，参数为 (事件名, 数据)
+EventCallback = Optional[Callable[[str, dict], Awaitable[None]]]
+
+class WorkflowNotFoundError(ValueError):
+    """要执行的工作流不存在"""
+
 class WorkflowExecutionService:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession, model_service: ModelService = None):
         self.db = db
-        self.model_service = ModelService()
+        self.model_service = model_service or get_model_service()
     
-    async def execute_workflow(self, workflow_id: int, input_data: str = None):
+    async def execute_workflow(self, workflow_id: int, input_data: str = None, use_cache: bool = True,
+                               blob_links: bool = False):
         """
         执行工作流
         :param workflow_id: 工作流ID
         :param input_data: 用户输入数据（可选）
+        :param use_cache: 为False时本次运行跳过模型响应缓存
+        :param blob_links: 为True时保存各节点的完整模型响应，并在结果中返回下载链接
         :return: 执行结果
         """
-        workflow = self.db.query(Workflow).filter(Workflow.id == workflow_id).first()
+        plan = await self.load_plan(workflow_id)
+        return await self.run_plan(plan, input_data, use_cache=use_cache, blob_links=blob_links)
+
+    async def load_plan(self, workflow_id: int) -> ExecutionPlan:
+        """
+        加载工作流并获取其执行计划
+        :param workflow_id: 工作流ID
+        :return: ExecutionPlan
+        """
+        with span("crud.get_workflow", workflow_id=workflow_id):
+            workflow = await async_workflow_crud.get_workflow(self.db, workflow_id, with_tasks=False)
         if not workflow:
-            raise ValueError(f"Workflow with id {workflow_id} not found")
-        
-        # 解析工作流描述中的节点信息，查找Start节点的输入
-        start_node_input = input_data  # 默认使用传入的input_data
-        if not input_data and workflow.description:
-            try:
-                metadata = json.loads(workflow.description)
-                nodes = metadata.get("nodes", [])
-                # 查找Start节点并获取其输入值
-                for node in nodes:
-                    if node.get("type") == "startNode":
-                        start_node_input = node.get("data", {}).get("inputValue")
-                        break
-            except json.JSONDecodeError:
-                logger.warning(f"Failed to parse workflow metadata for workflow {workflow_id}")
-        
-        results = []
-        # 按顺序执行任务
-        tasks = sorted(workflow.tasks, key=lambda x: x.order)
-        
-        # 存储上一个任务的输出，用于传递给下一个任务
-        # 如果Start节点有输入，则将其作为初始输入
-        previous_output = start_node_input
-        
-        for task in tasks:
-            try:
-                result = await self.execute_task(task, previous_output)
-                results.append({
-                    "task_id": task.id,
-                    "task_name": task.name,
-                    "result": result
-                })
-                # 将当前任务的结果作为下一个任务的输入
-                # 只有成功的结果才传递给下一个任务
-                if isinstance(result, dict) and result.get("success"):
-                    previous_output = result.get("data")
-                elif result is not None:
-                    previous_output = result
-            except Exception as e:
-                logger.error(f"Error executing task {task.name}: {str(e)}")
-                results.append({
-                    "task_id": task.id,
-                    "task_name": task.name,
-                    "error": str(e)
-                })
-                # 根据需求决定是否继续执行后续任务
-                break
+            raise WorkflowNotFoundError(f"Workflow with id {workflow_id} not found")
         
+        # 同一版本的工作流只编译一次，命中缓存时无需加载任务和解析配置
+        plan = plan_cache.lookup(workflow.id, workflow.updated_at)
+        if plan is None:
+            with span("crud.get_workflow_with_tasks", workflow_id=workflow_id):
+                workflow = await async_workflow_crud.get_workflow(self.db, workflow_id)
+            if not workflow:
+                raise WorkflowNotFoundError(f"Workflow with id {workflow_id} not found")
+            with span("execution.compile", workflow_id=workflow_id):
+                plan = plan_cache.put(workflow)
+        # 执行阶段不再访问数据库，归还连接，避免长时间运行的工作流占满连接池
+        await self.db.close()
+        return plan
+
+    async def run_plan(self, plan: ExecutionPlan, input_data: str = None, emit: EventCallback = None,
+                       use_cache: bool = True, run_id: int = None, queue_wait_ms: float = 0.0,
+                       priority: int = PRIORITY_INTERACTIVE, blob_links: bool = False):
+        """
+        执行已编译的工作流
+        节点之间只传递提取出的文本内容（BlobRef，超过 BLOB_INLINE_MAX_BYTES 时保存在磁盘上），
+        完整的模型响应不在内存中保留；结果中每个节点只返回文本内容和 token 用量
+        :param plan: 执行计划
+        :param input_data: 用户输入数据（可选）
+        :param emit: 事件回调（可选），提供时以流式方式调用模型并上报节点事件
+        :param use_cache: 为False时本次运行跳过模型响应缓存
+        :param run_id: 后台运行ID（可选），用于关联执行历史
+        :param queue_wait_ms: 后台运行在队列中等待的时间
+        :param priority: 模型调用的出站排队优先级，后台运行使用 PRIORITY_BATCH
+        :param blob_links: 为True时保存各节点的完整模型响应，在节点结果的 blob 字段返回下载链接
+        :return: 执行结果
+        """
+        graph = plan.graph
+        # 默认使用传入的input_data，否则使用Start节点的输入值
+        start_node_input = input_data if input_data else plan.start_input
+
+        execution_id = uuid.uuid4().hex
+        mode = "queued" if run_id else ("stream" if emit else "sync")
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        outputs = {}
+        error = None
+        in_progress = WORKFLOW_EXECUTIONS_IN_PROGRESS.labels(mode)
+        in_progress.inc()
+        try:
+            with span("execution.run_graph", workflow_id=plan.workflow_id, mode=mode):
+                await self._run_graph(plan, start_node_input, emit, use_cache, outputs, priority, blob_links)
+        except BaseException as e:
+            error = str(e) or type(e).__name__
+            raise
+        finally:
+            in_progress.dec()
+            if settings.HISTORY_ENABLED or settings.METRICS_ENABLED:
+                try:
+                    self._record_history(plan, execution_id, mode, run_id, outputs, started_at,
+                                         (time.perf_counter() - started) * 1000, queue_wait_ms, error)
+                except Exception as e:
+                    logger.error(f"Error recording execution history: {str(e)}")
+
+        # 结果按任务顺序返回，与前端按顺序映射模型节点的逻辑保持一致
+        results = [self._public_entry(outputs[node_id]["entry"]) for node_id in graph.node_ids if node_id in outputs]
+
+        final_nodes = [node_id for node_id in graph.final_nodes if outputs.get(node_id, {}).get("ok")]
+        if not graph.node_ids:
+            final_output = start_node_input
+        elif not final_nodes:
+            final_output = None
+        else:
+            final_output = self._merge_inputs(graph, final_nodes, outputs)
+            if isinstance(final_output, BlobRef):
+                final_output = final_output.text()
+
         return {
-            "workflow_id": workflow_id,
-            "workflow_name": workflow.name,
+            "execution_id": execution_id,
+            "workflow_id": plan.workflow_id,
+            "workflow_name": plan.workflow_name,
             "results": results,
-            "final_output": previous_output
+            "final_output": final_output
         }
-    
+
+    async def stream_workflow(self, plan: ExecutionPlan, input_data: str = None, use_cache: bool = True,
+                              blob_links: bool = False):
+        """
+        执行工作流并以事件流的形式返回进度
+        事件依次为 node-started、token、node-finished，最后是 run-finished 或 run-failed
+        :param plan: 执行计划
+        :param input_data: 用户输入数据（可选）
+        :param use_cache: 为False时本次运行跳过模型响应缓存
+        :param blob_links: 为True时在节点结果中返回完整模型响应的下载链接
+        :return: 异步生成器，返回 (事件名, 数据)
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def emit(event: str, data: dict):
+            await queue.put((event, data))
+
+        async def run():
+            try:
+                result = await self.run_plan(plan, input_data, emit, use_cache, blob_links=blob_links)
+                await queue.put(("run-finished", result))
+            except Exception as e:
+                logger.error(f"Error executing workflow {plan.workflow_id}: {str(e)}")
+                await queue.put(("run-failed", {"workflow_id": plan.workflow_id, "error": str(e)}))
+
+        runner = asyncio.ensure_future(run())
+        try:
+            while True:
+                event, data = await queue.get()
+                yield event, data
+                if event in ("run-finished", "run-failed"):
+                    break
+        finally:
+            # 客户端断开时取消仍在执行的节点
+            runner.cancel()
+
+    async def _run_graph(self, plan: ExecutionPlan, start_node_input, emit: EventCallback = None,
+                         use_cache: bool = True, outputs: dict = None, priority: int = PRIORITY_INTERACTIVE,
+                         blob_links: bool = False):
+        """
+        按依赖关系并发执行所有任务节点
+        每个节点等待其上游全部完成后才开始，单次运行中同时执行的节点数受 WORKFLOW_MAX_CONCURRENCY 限制
+        :param outputs: 可选，用于收集节点结果的字典（执行中途失败时调用方仍可拿到已完成的节点）
+        :return: node_id -> {"ok": 是否成功, "output": 传给下游的输出, "entry": 结果记录, "metrics": 耗时等指标}
+        """
+        graph = plan.graph
+        semaphore = asyncio.Semaphore(max(1, settings.WORKFLOW_MAX_CONCURRENCY))
+        outputs = {} if outputs is None else outputs
+        runners = {}
+
+        async def run_node(node_id):
+            outputs[node_id] = await execute_node(node_id)
+            if emit:
+                await emit("node-finished", self._public_entry(outputs[node_id]["entry"]))
+
+        async def execute_node(node_id):
+            task = graph.tasks_by_node[node_id]
+            entry = {"task_id": task.task_id, "task_name": task.name, "node_id": node_id}
+            predecessors = graph.predecessors[node_id]
+            if predecessors:
+                await asyncio.gather(*(runners[p] for p in predecessors))
+                failed = [p for p in predecessors if not outputs[p]["ok"]]
+                if failed:
+                    # 上游失败时跳过当前节点，其他独立分支继续执行
+                    entry["skipped"] = True
+                    entry["error"] = f"Skipped because upstream node failed: {', '.join(failed)}"
+                    return {"ok": False, "output": None, "entry": entry, "metrics": {}}
+                node_input = self._merge_inputs(graph, predecessors, outputs)
+            else:
+                node_input = start_node_input
+
+            # 从上游全部完成开始计时：等待并发名额的时间 + 执行时间
+            ready = time.perf_counter()
+            metrics = {"input": node_input}
+            async with semaphore:
+                started = time.perf_counter()
+                metrics["queue_wait_ms"] = (started - ready) * 1000
+                metrics["started_at"] = datetime.utcnow()
+                if emit:
+                    await emit("node-started", dict(entry))
+                try:
+                    with span(f"node.{node_id}", task=task.name, queue_wait_ms=metrics["queue_wait_ms"]):
+                        result = await self.execute_node(task, node_input, plan.system_prompt, emit, use_cache,
+                                                         priority)
+                except Exception as e:
+                    logger.error(f"Error executing task {task.name}: {str(e)}")
+                    entry["error"] = str(e)
+                    result = None
+                now = time.perf_counter()
+                metrics.update(network_ms=(now - started) * 1000, total_ms=(now - ready) * 1000,
+                               finished_at=datetime.utcnow())
+            if "error" in entry:
+                return {"ok": False, "output": None, "entry": entry, "metrics": metrics}
+
+            # 只有成功的结果才把提取出的内容传给下游，否则传递整个结果
+            if isinstance(result, dict) and result.get("success"):
+                result = await self._compact_result(result, entry, blob_links)
+                output = result["data"]
+            else:
+                output = result
+            entry["result"] = result
+            return {"ok": True, "output": output, "entry": entry, "metrics": metrics}
+
+        # 按拓扑序创建协程任务，保证上游的任务对象在下游等待前已存在
+        for node_id in graph.order:
+            runners[node_id] = asyncio.ensure_future(run_node(node_id))
+        try:
+            await asyncio.gather(*runners.values())
+        finally:
+            for runner in runners.values():
+                runner.cancel()
+        return outputs
+
+    def _record_history(self, plan: ExecutionPlan, execution_id: str, mode: str, run_id: Optional[int],
+                        outputs: dict, started_at: datetime, total_ms: float, queue_wait_ms: float,
+                        error: Optional[str]):
+        """
+        生成本次执行及各节点的汇总记录，写入执行历史缓冲区并记录耗时指标
+        """
+        limit = settings.HISTORY_MAX_TEXT
+        graph = plan.graph
+        run = {
+            "id": execution_id,
+            "workflow_id": plan.workflow_id,
+            "run_id": run_id,
+            "mode": mode,
+            "error": error,
+            "node_count": len(graph.node_ids),
+            "queue_wait_ms": queue_wait_ms or 0.0,
+            "total_ms": total_ms,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+            "started_at": started_at,
+            "finished_at": datetime.utcnow(),
+        }
+        nodes = []
+        all_succeeded = error is None and len(outputs) == len(graph.node_ids)
+        for node_id in graph.node_ids:
+            if node_id not in outputs:
+                continue
+            task = graph.tasks_by_node[node_id]
+            entry = outputs[node_id]["entry"]
+            metrics = outputs[node_id].get("metrics") or {}
+            result = entry.get("result")
+            if entry.get("skipped"):
+                status = "skipped"
+            elif "error" in entry or (isinstance(result, dict) and result.get("success") is False):
+                status = "failed"
+            else:
+                status = "succeeded"
+            all_succeeded = all_succeeded and status == "succeeded"
+            usage = extract_usage(result)
+            cached = bool(isinstance(result, dict) and result.get("cached"))
+            if not cached:
+                # 命中缓存的调用不消耗 token，不计入本次执行的用量
+                for key, value in usage.items():
+                    run[key] += value
+            nodes.append(dict(
+                usage,
+                execution_id=execution_id,
+                workflow_id=plan.workflow_id,
+                task_id=task.task_id,
+                task_name=task.name,
+                node_id=node_id,
+                status=status,
+                error=entry.get("error") or (result.get("error") if isinstance(result, dict) else None),
+                input=truncate_text(self._history_text(metrics.get("input")), limit),
+                output=truncate_text(self._history_text(result), limit),
+                cached=cached,
+                queue_wait_ms=metrics.get("queue_wait_ms", 0.0),
+                network_ms=metrics.get("network_ms", 0.0),
+                total_ms=metrics.get("total_ms", 0.0),
+                started_at=metrics.get("started_at"),
+                finished_at=metrics.get("finished_at"),
+            ))
+        run["status"] = "succeeded" if all_succeeded else "failed"
+        if settings.METRICS_ENABLED:
+            observe_execution(run, nodes, {node_id: task.type for node_id, task in graph.tasks_by_node.items()})
+        if settings.HISTORY_ENABLED:
+            execution_history.record(run, nodes)
+
+    def _history_text(self, value) -> Optional[str]:
+        if isinstance(value, dict) and "success" in value:
+            # 模型服务的响应：失败时没有输出，成功时取模型返回的文本
+            if not value["success"]:
+                return None
+            value = value.get("data")
+        if value is None:
+            return None
+        if isinstance(value, BlobRef):
+            # 历史只保存开头部分，不读取整个块
+            return value.preview(settings.HISTORY_MAX_TEXT + 1)
+        return self._extract_content(value)
+
+    async def _compact_result(self, result: dict, entry: dict, blob_links: bool) -> dict:
+        """
+        把模型服务的成功响应压缩为 {success, data, cached, usage}，data 为提取出的文本内容的 BlobRef
+        :param entry: 节点结果记录，blob_links 为True时写入完整响应的下载链接
+        """
+        response = result.get("data")
+        content = await blob_store.put_text_async(self._extract_content(response))
+        compact = {"success": True, "data": content, "cached": result.get("cached", False)}
+        if isinstance(response, dict) and response.get("usage"):
+            compact["usage"] = response["usage"]
+        if blob_links:
+            entry["blob"] = (await blob_store.put_json_async(response, persist=True)).link()
+        return compact
+
+    @staticmethod
+    def _public_entry(entry: dict) -> dict:
+        """
+        返回给调用方的节点结果，读取 BlobRef 中的文本内容
+        """
+        result = entry.get("result")
+        if isinstance(result, dict) and isinstance(result.get("data"), BlobRef):
+            return dict(entry, result=dict(result, data=result["data"].text()))
+        return entry
+
+    def _merge_inputs(self, graph: WorkflowGraph, node_ids, outputs):
+        """
+        合并多个上游节点的输出（fan-in），单个上游时原样传递
+        """
+        if len(node_ids) == 1:
+            return outputs[node_ids[0]]["output"]
+        parts = []
+        for node_id in node_ids:
+            task = graph.tasks_by_node[node_id]
+            parts.append(f"[{task.name}]\n{self._extract_content(outputs[node_id]['output'])}")
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def _extract_content(input_data):
+        """
+        从上游输出中提取文本内容
+        """
+        if isinstance(input_data, BlobRef):
+            return input_data.text()
+        if isinstance(input_data, dict):
+            if "choices" in input_data and input_data["choices"]:
+                # OpenAI风格的响应
+                return input_data["choices"][0].get("message", {}).get("content", str(input_data))
+            elif "data" in input_data:
+                # 我们的模型服务响应
+                return input_data["data"]
+        return str(input_data)
+
     async def execute_task(self, task: Task, input_data=None):
         """
         执行单个任务
@@ -82,71 +386,23 @@ class WorkflowExecutionService:
         :param input_data: 上一个任务的输出作为输入
         :return: 任务执行结果
         """
-        if task.type == "llm":
-            # 解析任务配置
-            config = {}
-            if task.config:
-                try:
-                    config = json.loads(task.config)
-                except json.JSONDecodeError:
-                    logger.warning(f"Invalid config for task {task.name}")
-            
-            # 获取节点数据中的自定义提示或使用默认提示
-            node_data = config.get("node_data", {})
-            custom_prompt = node_data.get("prompt", "")
-            
-            # 如果有自定义提示，则使用它，否则构建默认提示
-            if custom_prompt:
-                # 如果有输入数据，将其附加到自定义提示中
-                if input_data:
-                    # 如果输入数据是字典且包含特定字段，则提取内容
-                    if isinstance(input_data, dict):
-                        if "choices" in input_data and input_data["choices"]:
-                            # OpenAI风格的响应
-                            content = input_data["choices"][0].get("message", {}).get("content", str(input_data))
-                        elif "data" in input_data:
-                            # 我们的模型服务响应
-                            content = input_data["data"]
-                        else:
-                            content = str(input_data)
-                    else:
-                        content = str(input_data)
-                        
-                    prompt = f"{custom_prompt}\n\nInput data: {content}"
-                else:
-                    prompt = custom_prompt
-            else:
-                # 没有自定义提示时使用默认行为
-                node_label = node_data.get("label", "")
-                base_prompt = f"Process node: {node_label}" if node_label else "Process the following input:"
-                
-                # 如果有输入数据，则构建更丰富的提示
-                if input_data:
-                    # 如果输入数据是字典且包含特定字段，则提取内容
-                    if isinstance(input_data, dict):
-                        if "choices" in input_data and input_data["choices"]:
-                            # OpenAI风格的响应
-                            content = input_data["choices"][0].get("message", {}).get("content", str(input_data))
-                        elif "data" in input_data:
-                            # 我们的模型服务响应
-                            content = input_data["data"]
-                        else:
-                            content = str(input_data)
-                    else:
-                        content = str(input_data)
-                        
-                    prompt = f"{base_prompt}\n\nInput data: {content}\n\nPlease process this input according to your instructions."
-                else:
-                    prompt = base_prompt
-            
-            # 调用大模型，使用专门的工作流系统提示
-            result = await self.model_service.process_with_qwen_plus(
-                prompt=prompt,
-                system_prompt_path="app/sysprompt/workflow_prompt.md",
-                max_tokens=config.get("max_tokens", 1024),
-                temperature=config.get("temperature", 0.8)
-            )
-            return result
-        else:
-            # 其他类型的任务可以在这里添加
-            return {"message": f"Task type {task.type} not implemented yet"}
\ No newline at end of file
+        return await self.execute_node(compile_task(task), input_data)
+
+    async def execute_node(self, node: CompiledNode, input_data=None, system_prompt: str = None,
+                           emit: EventCallback = None, use_cache: bool = True, priority: int = PRIORITY_INTERACTIVE):
+        """
+        执行编译后的任务节点，按任务类型交给注册的节点执行器
+        :param node: 编译后的节点
+        :param input_data: 上游节点的输出
+        :param system_prompt: 系统提示内容，为空时读取工作流系统提示文件
+        :param emit: 事件回调（可选），提供时流式调用模型并逐段上报 token 事件
+        :param use_cache: 为False时跳过模型响应缓存
+        :param priority: 模型调用的出站排队优先级
+        :return: 任务执行结果
+        """
+        executor = get_executor(node.type)
+        if executor is None:
+            return {"success": False, "error": f"Task type {node.type} is not supported"}
+        context = NodeContext(model_service=self.model_service, system_prompt=system_prompt, emit=emit,
+                              use_cache=use_cache, priority=priority)
+        return await executor.execute(node, self._extract_content(input_data) if input_data else None, context)
@@ -0,0 +1,90 @@
+from collections import deque
+from typing import Dict, List, Optional
+import json
+
+
+class WorkflowGraphError(Exception):
+    """工作流图结构非法（例如存在环）"""
+
+
+class WorkflowGraph:
+    """
+    根据编辑器保存的 nodes/edges 构建的任务依赖图
+    节点以编辑器中的 node_id 标识，只有对应 Task 的节点才会被执行；
+    start/end 等非任务节点只用于确定输入来源和最终输出
+    :param tasks: 任务节点列表，需要提供 node_id 和 order 属性
+    """
+
+    def __init__(self, tasks: List, description: Optional[str] = None):
+        # 按 order 排序，保证结果输出顺序与原先的顺序执行一致
+        self.tasks = sorted(tasks, key=lambda x: x.order)
+        self.node_ids: List[str] = [task.node_id for task in self.tasks]
+        self.tasks_by_node: Dict[str, object] = {task.node_id: task for task in self.tasks}
+
+        self.metadata = self._parse_description(description)
+        self.start_input = None
+        for node in self.metadata.get("nodes", []):
+            if node.get("type") == "startNode":
+                self.start_input = node.get("data", {}).get("inputValue")
+                break
+
+        self.predecessors: Dict[str, List[str]] = {node_id: [] for node_id in self.node_ids}
+        self.successors: Dict[str, List[str]] = {node_id: [] for node_id in self.node_ids}
+        self.final_nodes: List[str] = []
+        self._build_edges(self.metadata.get("edges", []))
+        self.order = self._topological_order()
+
+    @staticmethod
+    def _parse_description(description: Optional[str]) -> dict:
+        if not description:
+            return {}
+        try:
+            metadata = json.loads(description)
+        except json.JSONDecodeError:
+            return {}
+        return metadata if isinstance(metadata, dict) else {}
+
+    def _build_edges(self, edges: List[dict]):
+        task_edges = []
+        end_sources = []
+        for edge in edges:
+            source = str(edge.get("source"))
+            target = str(edge.get("target"))
+            if source in self.tasks_by_node and target in self.tasks_by_node:
+                task_edges.append((source, target))
+            elif source in self.tasks_by_node:
+                # 任务连向 end 等非任务节点，视为最终输出
+                end_sources.append(source)
+            # 来自 start 等非任务节点的边只表示使用初始输入，无需记录
+
+        if not edges:
+            # 没有连线信息（旧数据），退化为按 order 串行的链
+            task_edges = list(zip(self.node_ids, self.node_ids[1:]))
+
+        for source, target in task_edges:
+            if source not in self.predecessors[target]:
+                self.predecessors[target].append(source)
+                self.successors[source].append(target)
+
+        sinks = [node_id for node_id in self.node_ids if not self.successors[node_id]]
+        self.final_nodes = [node_id for node_id in self.node_ids if node_id in end_sources] or sinks
+
+    def _topological_order(self) -> List[str]:
+        """
+        Kahn 算法求拓扑序，存在环时抛出 WorkflowGraphError
+        """
+        indegree = {node_id: len(preds) for node_id, preds in self.predecessors.items()}
+        queue = deque(node_id for node_id in self.node_ids if indegree[node_id] == 0)
+        order = []
+        while queue:
+            node_id = queue.popleft()
+            order.append(node_id)
+            for successor in self.successors[node_id]:
+                indegree[successor] -= 1
+                if indegree[successor] == 0:
+                    queue.append(successor)
+
+        if len(order) != len(self.node_ids):
+            cyclic = [node_id for node_id in self.node_ids if indegree[node_id] > 0]
+            raise WorkflowGraphError(f"Workflow contains a cycle involving nodes: {', '.join(cyclic)}")
+        return order
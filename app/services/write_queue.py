@@ -0,0 +1,198 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.core.database import create_writer_engine
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitSession(Session):
+    """
+    写队列中的会话：每个操作在自己的保存点中执行，
+    操作内部调用的 commit 只把修改刷新到数据库，rollback 只回滚该操作的保存点，整组由写队列统一提交
+    """
+
+    def commit(self):
+        self.flush()
+
+    def rollback(self):
+        savepoint = self.info.get("savepoint")
+        if savepoint is not None and self.get_nested_transaction() is savepoint:
+            savepoint.rollback()
+        else:
+            super().rollback()
+
+
+class _Operation:
+    __slots__ = ("fn", "args", "future", "result", "error")
+
+    def __init__(self, fn: Callable, args: tuple, future: asyncio.Future):
+        self.fn = fn
+        self.args = args
+        self.future = future
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class WriteQueue:
+    """
+    单写者的分组提交队列
+    写操作在一个专用线程中用同一个连接串行执行，同一时间窗口内到达的操作合并为一个事务提交（group commit），
+    SQLite 每个事务只需一次 fsync，也不会有多个连接争抢写锁，语句也不需要经过 aiosqlite 的线程切换；
+    每个操作在独立的保存点中执行，失败时只回滚自己，调用方在整组提交之后才得到各自的结果或错误
+    """
+
+    def __init__(self, window: float = 0.002, max_batch: int = 64):
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._session_factory = None
+        self.stats = {"operations": 0, "failed": 0, "commits": 0, "commit_errors": 0, "max_group": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        if self._task is None:
+            if self._session_factory is None:
+                # 提交后返回的对象仍要在请求中序列化，提交时不过期
+                self._session_factory = sessionmaker(
+                    bind=create_writer_engine(), class_=GroupCommitSession, autoflush=False, expire_on_commit=False
+                )
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+            self._queue = asyncio.Queue()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """
+        停止接收新操作，执行完已排队的操作后退出
+        """
+        task, self._task = self._task, None
+        if task is not None:
+            self._queue.put_nowait(None)
+            await asyncio.gather(task, return_exceptions=True)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def submit(self, fn: Callable[..., Any], *args):
+        """
+        提交一个写操作并等待所在的组提交完成
+        :param fn: 同步函数 fn(session, *args)，与 crud 模块中的写函数签名相同
+        :return: fn 的返回值；fn 抛出的异常或提交失败的异常会在这里重新抛出
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Operation(fn, args, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            operation = await self._queue.get()
+            if operation is None:
+                break
+            group = [operation]
+            deadline = loop.time() + self.window
+            # 提交期间到达的操作在队列中积累，下一组直接取走；空闲时最多再等待一个时间窗口
+            while len(group) < self.max_batch:
+                try:
+                    operation = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        operation = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if operation is None:
+                    stopping = True
+                    break
+                group.append(operation)
+            # 提交过程中不响应取消，避免调用方收到结果前事务被中断
+            await asyncio.shield(self._commit(group))
+
+    async def _commit(self, group: List[_Operation]):
+        # 排队期间已被取消的调用（如客户端断开）不再执行
+        group = [operation for operation in group if not operation.future.done()]
+        if not group:
+            return
+        error = None
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._commit_group, group)
+        except Exception as e:
+            logger.error(f"Group commit of {len(group)} writes failed: {str(e)}")
+            self.stats["commit_errors"] += 1
+            error = e
+        else:
+            self.stats["commits"] += 1
+            self.stats["max_group"] = max(self.stats["max_group"], len(group))
+
+        for operation in group:
+            self.stats["operations"] += 1
+            if operation.future.done():
+                continue
+            failure = operation.error or error
+            if failure is not None:
+                self.stats["failed"] += 1
+                operation.future.set_exception(failure)
+            else:
+                operation.future.set_result(operation.result)
+
+    def _commit_group(self, group: List[_Operation]):
+        # 在写者线程中执行
+        with self._session_factory() as session:
+            self._apply(session, group)
+            Session.commit(session)
+
+    @staticmethod
+    def _apply(session: Session, group: List[_Operation]):
+        for operation in group:
+            savepoint = session.begin_nested()
+            session.info["savepoint"] = savepoint
+            try:
+                operation.result = operation.fn(session, *operation.args)
+                if savepoint.is_active:
+                    savepoint.commit()
+            except Exception as e:
+                # 刷新失败后保存点处于失效状态，同样需要回滚才能继续执行后面的操作
+                if session.get_nested_transaction() is savepoint:
+                    savepoint.rollback()
+                operation.error = e
+            finally:
+                session.info.pop("savepoint", None)
+            # 返回的对象与后续操作互不影响（同一工作流在一组中被多次修改时各自返回自己的结果）
+            session.expunge_all()
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, running=self.running, pending=self.pending)
+
+
+write_queue = WriteQueue(
+    window=settings.WRITE_QUEUE_WINDOW_MS / 1000,
+    max_batch=settings.WRITE_QUEUE_MAX_BATCH,
+)
+
+
+async def run_write(db: AsyncSession, fn: Callable[..., Any], *args):
+    """
+    执行 crud 写函数：写队列运行时交给单写者分组提交，否则在请求自己的会话中执行并提交
+    :param db: 请求的异步会话
+    :param fn: 同步函数 fn(session, *args)
+    """
+    if write_queue.running:
+        return await write_queue.submit(fn, *args)
+    return await db.run_sync(fn, *args)
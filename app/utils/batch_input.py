@@ -0,0 +1,59 @@
+from typing import Iterator, Optional
+import csv
+import io
+import json
+
+
+def detect_format(content_type: Optional[str] = None, filename: Optional[str] = None) -> str:
+    """
+    根据 Content-Type 或文件扩展名判断批量输入的格式
+    :return: "csv" 或 "jsonl"
+    """
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    if content_type and "csv" in content_type.lower():
+        return "csv"
+    return "jsonl"
+
+
+def _to_input(value) -> str:
+    # 对象中有 input 字段时使用该字段，否则整个对象作为输入
+    if isinstance(value, dict) and isinstance(value.get("input"), str):
+        return value["input"]
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def parse_jsonl(content: str) -> Iterator[str]:
+    """
+    解析JSONL，每行一个JSON字符串或对象
+    """
+    for line_number, line in enumerate(content.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield _to_input(json.loads(line))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_number}: {e}")
+
+
+def parse_csv(content: str) -> Iterator[str]:
+    """
+    解析带表头的CSV，有 input 列时使用该列，否则整行（JSON对象）作为输入
+    """
+    for row in csv.DictReader(io.StringIO(content)):
+        yield _to_input(row)
+
+
+def parse_batch_input(content: str, fmt: str = "jsonl") -> Iterator[str]:
+    """
+    将批量输入解析为逐条的工作流输入
+    :param content: 输入内容
+    :param fmt: "csv" 或 "jsonl"
+    """
+    if fmt == "csv":
+        return parse_csv(content)
+    if fmt == "jsonl":
+        return parse_jsonl(content)
+    raise ValueError(f"Unsupported batch input format: {fmt}")
@@ -0,0 +1,226 @@
+from typing import Optional
+import asyncio
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+import time
+import weakref
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+# 块文件的扩展名，决定下载时的媒体类型
+TEXT = ".txt"
+JSON = ".json"
+MEDIA_TYPES = {TEXT: "text/plain; charset=utf-8", JSON: "application/json"}
+
+# 最近写入或复用过的块不参与清理：本进程仍持有引用的块另有引用集合保护，该时间窗口保护共享同一目录的其他进程中正在执行的工作流
+RECENT_SECONDS = 600
+
+
+class BlobRef:
+    """
+    按内容寻址的数据块引用
+    小块直接持有字节，大块只记录文件路径，读取时通过 mmap 映射，不常驻进程内存
+    """
+
+    __slots__ = ("digest", "size", "suffix", "_data", "_path", "__weakref__")
+
+    def __init__(self, digest: str, size: int, suffix: str, data: Optional[bytes] = None,
+                 path: Optional[str] = None):
+        self.digest = digest
+        self.size = size
+        self.suffix = suffix
+        self._data = data
+        self._path = path
+
+    @property
+    def spilled(self) -> bool:
+        return self._data is None
+
+    def _read(self, limit: Optional[int] = None) -> str:
+        if self._data is not None:
+            data = self._data if limit is None else self._data[:limit]
+            return data.decode("utf-8", errors="ignore" if limit is not None else "strict")
+        if self.size == 0:
+            return ""
+        with open(self._path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if limit is None:
+                return str(mapped, "utf-8")
+            # 截断处可能落在多字节字符中间
+            return str(mapped[:limit], "utf-8", errors="ignore")
+
+    def text(self) -> str:
+        """
+        读取全部内容（每次调用都重新读取，不缓存解码结果）
+        """
+        return self._read()
+
+    def preview(self, chars: int) -> str:
+        """
+        只读取开头部分，用于日志和执行历史
+        """
+        return self._read(chars * 4)[:chars]
+
+    def link(self) -> dict:
+        return {"digest": self.digest, "size": self.size, "url": f"{settings.API_V1_STR}/blobs/{self.digest}"}
+
+    def __str__(self):
+        return self.text()
+
+    def __repr__(self):
+        return f"BlobRef({self.digest[:12]}, {self.size} bytes{', spilled' if self.spilled else ''})"
+
+
+class BlobStore:
+    """
+    节点中间输出的存储：
+    内容按 SHA-256 寻址，小于 inline_max_bytes 的块保存在引用对象中，超过的写入 path 下的文件（相同内容只写一次）；
+    磁盘上的块按保留时间和总大小清理，本进程中仍有 BlobRef 引用的块（正在执行的工作流的中间输出）不会被清理；
+    持久化的运行结果、执行历史和批次条目只保存文本，不引用块文件
+    """
+
+    def __init__(self, path: str, inline_max_bytes: int, ttl: float, max_bytes: int):
+        self.path = path
+        self.inline_max_bytes = inline_max_bytes
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        # 指向磁盘文件的引用，对象被回收后自动移除
+        self._live_refs: "weakref.WeakSet[BlobRef]" = weakref.WeakSet()
+        self.stats = {"inline": 0, "spilled": 0, "spilled_bytes": 0, "deduplicated": 0, "pruned": 0}
+
+    def file_path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.path, digest[:2], digest + suffix)
+
+    def find(self, digest: str) -> Optional[str]:
+        """
+        查找磁盘上的块文件
+        :return: 文件路径，不存在或摘要非法时返回None
+        """
+        if not DIGEST_PATTERN.match(digest):
+            return None
+        for suffix in MEDIA_TYPES:
+            path = self.file_path(digest, suffix)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, data: bytes, suffix: str = TEXT, persist: bool = False) -> BlobRef:
+        """
+        保存一个块
+        :param data: 内容
+        :param suffix: 块类型（TEXT 或 JSON）
+        :param persist: 为True时无论大小都写入磁盘（需要通过链接下载时）
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if not persist and len(data) < self.inline_max_bytes:
+            self.stats["inline"] += 1
+            return BlobRef(digest, len(data), suffix, data=data)
+        path = self.file_path(digest, suffix)
+        if os.path.exists(path):
+            # 相同内容已存在，刷新修改时间以免被清理
+            self.stats["deduplicated"] += 1
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再原子替换，读取方不会看到写了一半的块
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.stats["spilled"] += 1
+            self.stats["spilled_bytes"] += len(data)
+            self._maybe_prune()
+        ref = BlobRef(digest, len(data), suffix, path=path)
+        with self._lock:
+            self._live_refs.add(ref)
+        return ref
+
+    def put_text(self, text: str, persist: bool = False) -> BlobRef:
+        return self.put(text.encode("utf-8"), TEXT, persist)
+
+    def put_json(self, value, persist: bool = False) -> BlobRef:
+        return self.put(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"), JSON, persist)
+
+    async def put_text_async(self, text: str, persist: bool = False) -> BlobRef:
+        """
+        大块在线程中写入，避免阻塞事件循环
+        """
+        if not persist and len(text) * 4 < self.inline_max_bytes:
+            return self.put_text(text)
+        return await asyncio.to_thread(self.put_text, text, persist)
+
+    async def put_json_async(self, value, persist: bool = False) -> BlobRef:
+        return await asyncio.to_thread(self.put_json, value, persist)
+
+    def _maybe_prune(self):
+        with self._lock:
+            self._writes_since_prune += 1
+            if self._writes_since_prune < 100:
+                return
+            self._writes_since_prune = 0
+        try:
+            self.prune()
+        except OSError as e:
+            logger.warning(f"Failed to prune blob store: {e}")
+
+    def referenced_paths(self) -> set:
+        """
+        本进程中仍被 BlobRef 引用的块文件
+        """
+        with self._lock:
+            return {ref._path for ref in list(self._live_refs)}
+
+    def prune(self, now: float = None) -> int:
+        """
+        删除超过保留时间的块，总大小超过上限时从最旧的开始删除，仍被引用的块跳过
+        :return: 删除的文件数
+        """
+        now = now or time.time()
+        referenced = self.referenced_paths()
+        files = []
+        for root, _, names in os.walk(self.path):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if now - mtime < RECENT_SECONDS:
+                break
+            if now - mtime <= self.ttl and total <= self.max_bytes:
+                break
+            if path in referenced:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self.stats["pruned"] += removed
+        return removed
+
+    def get_stats(self) -> dict:
+        return dict(self.stats)
+
+
+blob_store = BlobStore(
+    path=settings.BLOB_DIR,
+    inline_max_bytes=settings.BLOB_INLINE_MAX_BYTES,
+    ttl=settings.BLOB_TTL,
+    max_bytes=settings.BLOB_MAX_BYTES,
+)
@@ -0,0 +1,156 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+import asyncio
+import json
+import logging
+import multiprocessing
+import signal
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 本模块只依赖标准库：工作进程以 spawn 方式启动，导入它不会连带加载数据库、模型客户端等模块
+
+# 工作进程超出硬性时限（代码卡在不响应信号的 C 调用中）后才强制结束，在此之前先由进程内的定时器中断
+KILL_GRACE_SECONDS = 1.0
+
+
+class CodeTimeout(Exception):
+    pass
+
+
+class CodeError(Exception):
+    """用户代码执行失败（异常、超时、内存不足或工作进程退出）"""
+
+
+def _limit_memory(memory_mb: int):
+    # 工作进程初始化：限制地址空间大小，超过时分配内存抛出 MemoryError
+    if memory_mb <= 0:
+        return
+    try:
+        import resource
+    except ImportError:
+        # Windows 没有 resource 模块，不限制内存
+        return
+    limit = memory_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError) as e:
+        logger.warning(f"Failed to limit code worker memory: {e}")
+
+
+def _on_alarm(signum, frame):
+    raise CodeTimeout()
+
+
+def run_code(source: str, input_text: str, timeout: float, max_output_bytes: int) -> dict:
+    """
+    在工作进程中执行用户代码：代码需定义 main(input)，返回值为字符串或可序列化为JSON的值
+    :return: {"output": 输出文本} 或 {"error": 错误信息}
+    """
+    use_alarm = hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        namespace = {"__name__": "__code_node__"}
+        exec(compile(source, "<code node>", "exec"), namespace)
+        main = namespace.get("main")
+        if not callable(main):
+            return {"error": "Code must define a function main(input)"}
+        value = main(input_text)
+        output = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    except CodeTimeout:
+        return {"error": f"Code timed out after {timeout:g}s"}
+    except MemoryError:
+        return {"error": "Code exceeded the memory limit"}
+    except BaseException as e:
+        # 包括用户代码调用 sys.exit，不让工作进程退出
+        return {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    if len(output.encode("utf-8")) > max_output_bytes:
+        return {"error": f"Code output exceeds {max_output_bytes} bytes"}
+    return {"output": output}
+
+
+class CodeRunner:
+    """
+    在进程池中执行代码节点，CPU 密集的代码不占用事件循环，崩溃或耗尽内存也只影响工作进程
+    同时提交的任务数不超过工作进程数，保证超时只计算执行时间；
+    超时先由工作进程内的定时器中断，仍未返回时结束全部工作进程并重建进程池
+    """
+
+    def __init__(self, workers: int = 2, memory_mb: int = 256):
+        self.workers = max(1, workers)
+        self.memory_mb = memory_mb
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.stats = {"runs": 0, "errors": 0, "timeouts": 0, "restarts": 0}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_limit_memory,
+                    initargs=(self.memory_mb,),
+                )
+            return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor, kill: bool = False):
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+            self.stats["restarts"] += 1
+        if kill:
+            terminate = getattr(pool, "terminate_workers", None)
+            if terminate is not None:
+                terminate()
+            else:
+                for process in list((getattr(pool, "_processes", None) or {}).values()):
+                    process.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, source: str, input_text: str, timeout: float, max_output_bytes: int) -> str:
+        """
+        执行代码节点
+        :return: 输出文本
+        :raises CodeError: 代码出错或超时
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+        async with self._semaphore:
+            self.stats["runs"] += 1
+            pool = self._get_pool()
+            try:
+                future = asyncio.wrap_future(pool.submit(run_code, source, input_text, timeout, max_output_bytes))
+                result = await asyncio.wait_for(future, timeout + KILL_GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                self._reset_pool(pool, kill=True)
+                raise CodeError(f"Code timed out after {timeout:g}s")
+            except BrokenProcessPool:
+                self.stats["errors"] += 1
+                self._reset_pool(pool)
+                raise CodeError("Code worker exited unexpectedly")
+        if "error" in result:
+            self.stats["errors"] += 1
+            if result["error"].startswith("Code timed out"):
+                self.stats["timeouts"] += 1
+            raise CodeError(result["error"])
+        return result["output"]
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, workers=self.workers)
@@ -0,0 +1,97 @@
+import importlib.util
+import logging
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 进程内共享的连接池客户端，在应用启动时创建、关闭时释放
+_client: Optional[httpx.AsyncClient] = None
+# HTTP节点专用的连接池客户端：与模型调用分开限流，不保存任何 Cookie
+_node_client: Optional[httpx.AsyncClient] = None
+
+
+def _build_client(max_connections: Optional[int] = None, cookies: Optional[CookieJar] = None) -> httpx.AsyncClient:
+    http2 = settings.HTTP2_ENABLED
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed, falling back to HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=max_connections or settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=min(settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                                      max_connections or settings.HTTP_MAX_CONNECTIONS),
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2, cookies=cookies)
+
+
+def _build_node_client() -> httpx.AsyncClient:
+    # allowed_domains 为空时拒绝保存和发送所有 Cookie，一个节点收到的 Cookie 不会带到其他工作流的请求中
+    jar = CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+    return _build_client(settings.HTTP_NODE_MAX_CONNECTIONS, cookies=jar)
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """
+    创建共享的HTTP客户端（应用启动时调用）
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_http_client():
+    """
+    关闭共享的HTTP客户端并释放连接池（应用关闭时调用）
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    获取共享的HTTP客户端，未初始化时（例如脚本中直接调用）按需创建
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def init_node_http_client() -> httpx.AsyncClient:
+    """
+    创建HTTP节点使用的客户端（应用启动时调用）
+    """
+    global _node_client
+    if _node_client is None or _node_client.is_closed:
+        _node_client = _build_node_client()
+    return _node_client
+
+
+async def close_node_http_client():
+    """
+    关闭HTTP节点使用的客户端（应用关闭时调用）
+    """
+    global _node_client
+    if _node_client is not None:
+        await _node_client.aclose()
+        _node_client = None
+
+
+def get_node_http_client() -> httpx.AsyncClient:
+    """
+    获取HTTP节点使用的客户端，未初始化时按需创建
+    """
+    global _node_client
+    if _node_client is None or _node_client.is_closed:
+        _node_client = _build_node_client()
+    return _node_client
@@ -0,0 +1,171 @@
+import copy
+from typing import Any, List, Optional, Tuple
+
+
+class JsonPatchError(ValueError):
+    """JSON Patch 操作非法或无法应用"""
+
+
+_MISSING = object()
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    """
+    解析 RFC 6901 JSON Pointer
+    :param pointer: 例如 "/nodes/0/position"
+    :return: 路径片段列表
+    """
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer}")
+    return [part.replace("~1", "/").replace("~0", "~") for part in pointer[1:].split("/")]
+
+
+def _index(container: list, token: str, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise JsonPatchError(f"Invalid array index: {token}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"Array index out of range: {token}")
+    return index
+
+
+def _parent(doc: Any, parts: List[str]) -> Tuple[Any, str]:
+    target = doc
+    for token in parts[:-1]:
+        if isinstance(target, dict):
+            if token not in target:
+                raise JsonPatchError(f"Path not found: /{'/'.join(parts)}")
+            target = target[token]
+        elif isinstance(target, list):
+            target = target[_index(target, token)]
+        else:
+            raise JsonPatchError(f"Path not found: /{'/'.join(parts)}")
+    return target, parts[-1]
+
+
+def resolve(doc: Any, pointer: str, default: Any = _MISSING) -> Any:
+    """
+    获取 JSON Pointer 指向的值
+    """
+    target = doc
+    try:
+        for token in parse_pointer(pointer):
+            if isinstance(target, dict):
+                target = target[token]
+            elif isinstance(target, list):
+                target = target[_index(target, token)]
+            else:
+                raise KeyError(token)
+    except (KeyError, JsonPatchError):
+        if default is _MISSING:
+            raise JsonPatchError(f"Path not found: {pointer}")
+        return default
+    return target
+
+
+def _add(doc: Any, pointer: str, value: Any) -> Tuple[Any, str]:
+    """
+    :return: (文档, 实际写入的路径)，末尾追加 "-" 会被替换为具体下标
+    """
+    parts = parse_pointer(pointer)
+    if not parts:
+        return value, pointer
+    parent, token = _parent(doc, parts)
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        index = _index(parent, token, allow_end=True)
+        parent.insert(index, value)
+        pointer = pointer[:pointer.rfind("/") + 1] + str(index)
+    else:
+        raise JsonPatchError(f"Cannot add to path: {pointer}")
+    return doc, pointer
+
+
+def _remove(doc: Any, pointer: str) -> Any:
+    parts = parse_pointer(pointer)
+    if not parts:
+        raise JsonPatchError("Cannot remove the whole document")
+    parent, token = _parent(doc, parts)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Path not found: {pointer}")
+        return parent.pop(token)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, token))
+    raise JsonPatchError(f"Path not found: {pointer}")
+
+
+def json_equal(a: Any, b: Any) -> bool:
+    """
+    按 JSON 类型比较两个值（test 操作使用）：布尔值与数字不相等（Python 中 True == 1）；
+    整数和浮点数同为 number，按 RFC 6902 4.6 节比较数值；对象和数组逐项递归比较
+    """
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool) and a == b
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(json_equal(a[key], b[key]) for key in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(json_equal(x, y) for x, y in zip(a, b))
+    return type(a) is type(b) and a == b
+
+
+def apply_patch(doc: Any, operations: List[dict], changes: Optional[List[dict]] = None) -> Any:
+    """
+    按 RFC 6902 依次应用 add/remove/replace/move/copy/test 操作
+    直接修改传入的文档，任一操作失败时抛出 JsonPatchError
+    :param doc: 目标文档
+    :param operations: 操作列表
+    :param changes: 可选，按应用顺序收集每个操作的实际效果：
+                    {"op", "path", "value"（写入的值）, "old_value"（被删除或替换的值）, "from"（move/copy 的来源）}，
+                    数组末尾追加的 "-" 记录为具体下标
+    :return: 修改后的文档
+    """
+    if changes is None:
+        changes = []
+    for operation in operations:
+        if not isinstance(operation, dict) or "op" not in operation or "path" not in operation:
+            raise JsonPatchError(f"Invalid patch operation: {operation}")
+        op, path = operation["op"], operation["path"]
+
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise JsonPatchError(f"Operation '{op}' requires a value")
+        if op in ("move", "copy") and "from" not in operation:
+            raise JsonPatchError(f"Operation '{op}' requires 'from'")
+
+        # 记录的值是应用时的副本，不受后续操作影响
+        if op == "add":
+            doc, path = _add(doc, path, operation["value"])
+            changes.append({"op": op, "path": path, "value": copy.deepcopy(operation["value"])})
+        elif op == "remove":
+            old_value = _remove(doc, path)
+            changes.append({"op": op, "path": path, "old_value": old_value})
+        elif op == "replace":
+            # 等价于先 remove 再 add，目标路径必须存在
+            old_value = _remove(doc, path) if parse_pointer(path) else doc
+            doc, path = _add(doc, path, operation["value"])
+            changes.append({"op": op, "path": path, "value": copy.deepcopy(operation["value"]),
+                            "old_value": old_value})
+        elif op == "move":
+            source = operation["from"]
+            if path.startswith(source + "/"):
+                raise JsonPatchError(f"Cannot move {source} into its own child {path}")
+            value = _remove(doc, source)
+            doc, path = _add(doc, path, value)
+            changes.append({"op": op, "from": source, "path": path, "value": copy.deepcopy(value)})
+        elif op == "copy":
+            value = copy.deepcopy(resolve(doc, operation["from"]))
+            doc, path = _add(doc, path, value)
+            changes.append({"op": op, "from": operation["from"], "path": path, "value": copy.deepcopy(value)})
+        elif op == "test":
+            if not json_equal(resolve(doc, path), operation["value"]):
+                raise JsonPatchError(f"Test failed at {path}")
+        else:
+            raise JsonPatchError(f"Unsupported patch operation: {op}")
+    return doc
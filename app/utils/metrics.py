@@ -0,0 +1,326 @@
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import threading
+import time
+
+# 默认的延迟分桶（秒），覆盖毫秒级的数据库查询到数十秒的模型调用
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 工作流、节点和模型调用的延迟分桶
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+
+# 采集时返回的样本：(指标名, 类型, 说明, [(标签, 值), ...])
+Sample = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    指标基类，按标签值缓存子指标，记录时只需一次字典查找
+    """
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _label_sets(self):
+        if not self.labelnames:
+            return [({}, self._default)]
+        return [(dict(zip(self.labelnames, key)), child) for key, child in list(self._children.items())]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for labels, child in self._label_sets():
+            lines.extend(child.render(self.name, labels))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def render(self, name: str, labels: Dict[str, str]) -> List[str]:
+        return [f"{name}{_format_labels(labels)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default.dec(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # 每个桶单独计数，输出时再累加，记录时只需找到一个桶
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def render(self, name: str, labels: Dict[str, str]) -> List[str]:
+        with self._lock:
+            counts = list(self.counts)
+            total_sum = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            bucket_labels = dict(labels, le=_format_value(bound))
+            lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total_sum)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+
+class MetricsRegistry:
+    """
+    进程内的指标注册表，输出 Prometheus 文本格式
+    除了直接记录的指标外，还可以注册采集函数，在抓取时读取各组件的当前状态
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, metric_type, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    if value is not None:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# HTTP
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template (until the response body is sent)",
+    ("method", "route", "status"))
+HTTP_REQUESTS_IN_PROGRESS = registry.gauge("http_requests_in_progress", "HTTP requests currently being served")
+
+# 工作流执行：标签只使用取值有限的执行方式、状态和节点类型；
+# 工作流和节点ID由用户创建、数量不受限，按工作流/节点的统计见执行历史（/api/v1/history）
+WORKFLOW_EXECUTION_SECONDS = registry.histogram(
+    "workflow_execution_duration_seconds", "Workflow execution time", ("mode", "status"), SLOW_BUCKETS)
+WORKFLOW_EXECUTIONS_IN_PROGRESS = registry.gauge(
+    "workflow_executions_in_progress", "Workflow executions currently running", ("mode",))
+NODE_EXECUTION_SECONDS = registry.histogram(
+    "workflow_node_duration_seconds", "Node execution time including the model call",
+    ("node_type", "status"), SLOW_BUCKETS)
+NODE_QUEUE_WAIT_SECONDS = registry.histogram(
+    "workflow_node_queue_wait_seconds", "Time a ready node waited for a concurrency slot", ("node_type",))
+
+# 模型调用
+QWEN_REQUEST_SECONDS = registry.histogram(
+    "qwen_request_duration_seconds", "Qwen API call latency per attempt (streams: until the last chunk)",
+    ("mode", "status"), SLOW_BUCKETS)
+QWEN_FIRST_TOKEN_SECONDS = registry.histogram(
+    "qwen_time_to_first_chunk_seconds", "Time until the first chunk of a streamed Qwen API call", (),
+    SLOW_BUCKETS)
+QWEN_TOKENS = registry.counter("qwen_tokens_total", "Tokens reported by the Qwen API", ("type",))
+
+# 数据库
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_duration_seconds", "Database statement execution time", ("engine", "operation"))
+DB_QUERY_ERRORS = registry.counter("db_query_errors_total", "Database statements that raised", ("engine",))
+
+
+def observe_qwen_usage(usage: Optional[dict]):
+    """
+    累计模型返回的 token 用量
+    """
+    if not usage:
+        return
+    for key, label in (("prompt_tokens", "prompt"), ("completion_tokens", "completion")):
+        if usage.get(key):
+            QWEN_TOKENS.labels(label).inc(usage[key])
+
+
+def observe_execution(run: dict, nodes: List[dict], node_types: Dict[str, str]):
+    """
+    根据一次执行的汇总记录（与执行历史相同的结构）记录工作流和节点耗时
+    :param node_types: node_id -> 任务类型（llm、code、http）
+    """
+    WORKFLOW_EXECUTION_SECONDS.labels(run["mode"], run["status"]).observe(run["total_ms"] / 1000)
+    for node in nodes:
+        if node["status"] == "skipped":
+            continue
+        node_type = node_types.get(node["node_id"], "unknown")
+        NODE_EXECUTION_SECONDS.labels(node_type, node["status"]).observe(node["total_ms"] / 1000)
+        NODE_QUEUE_WAIT_SECONDS.labels(node_type).observe(node["queue_wait_ms"] / 1000)
+
+
+def _statement_operation(statement: str) -> str:
+    operation = statement.lstrip()[:8].split(None, 1)
+    return operation[0].upper() if operation else "OTHER"
+
+
+def instrument_engine(engine, name: str):
+    """
+    通过 SQLAlchemy 事件记录语句数量和耗时
+    :param engine: 同步引擎（异步引擎传入 async_engine.sync_engine）
+    :param name: 引擎名称，作为 engine 标签
+    """
+    from sqlalchemy import event
+
+    errors = DB_QUERY_ERRORS.labels(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.labels(name, _statement_operation(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        stack = context.connection.info.get("query_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+        errors.inc()
+
+
+class MetricsMiddleware:
+    """
+    ASGI 中间件：按路由模板（而不是实际路径）记录请求延迟和状态码，避免标签数量随ID增长
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], path, status).observe(time.perf_counter() - started)
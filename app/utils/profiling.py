@@ -0,0 +1,306 @@
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+import asyncio
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY_PARAM = "profile"
+
+# 当前请求的剖析数据，未开启剖析的请求为None，span() 据此直接返回
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+_parent: ContextVar[Optional[int]] = ContextVar("profile_span_parent", default=None)
+
+# cProfile 按线程生效，同一时刻只允许一个请求使用
+_profiler_lock = threading.Lock()
+
+
+class RequestProfile:
+    """
+    一次请求的剖析数据：span 时间线和（可选的）cProfile 结果
+    """
+
+    def __init__(self, name: str):
+        self.id = f"{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.name = name
+        self.started = time.perf_counter()
+        self.created_at = datetime.utcnow()
+        self.spans: List[dict] = []
+        # cProfile.Profile，只在实际剖析时导入
+        self.profiler = None
+        self._tasks: Dict[int, int] = {}
+
+    def _task_index(self) -> int:
+        # 同一个 asyncio 任务中的 span 画在时间线的同一行，并行节点分行显示
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task is not None else threading.get_ident()
+        return self._tasks.setdefault(key, len(self._tasks))
+
+    def add_span(self, name: str, start: float, parent: Optional[int], args: dict) -> dict:
+        """
+        添加一个 span，结束时由调用方填写 duration_ms
+        """
+        record = {
+            "id": len(self.spans),
+            "parent": parent,
+            "name": name,
+            "start_ms": (start - self.started) * 1000,
+            "duration_ms": None,
+            "task": self._task_index(),
+            "args": args,
+        }
+        self.spans.append(record)
+        return record
+
+    def finished_spans(self) -> List[dict]:
+        return [span for span in self.spans if span["duration_ms"] is not None]
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        按类别（span 名称中 "." 之前的部分）汇总耗时和次数
+        """
+        totals: Dict[str, dict] = {}
+        for span in self.finished_spans():
+            category = span["name"].split(".", 1)[0].split(" ", 1)[0]
+            total = totals.setdefault(category, {"ms": 0.0, "count": 0})
+            total["ms"] += span["duration_ms"]
+            total["count"] += 1
+        return totals
+
+    def summary_header(self) -> str:
+        elapsed = (time.perf_counter() - self.started) * 1000
+        parts = [f"total={elapsed:.1f}ms"]
+        for category, total in sorted(self.summary().items(), key=lambda item: -item[1]["ms"]):
+            if category != "route":
+                parts.append(f"{category}={total['ms']:.1f}ms/{total['count']}")
+        return "; ".join(parts)
+
+
+class _Span:
+    __slots__ = ("profile", "name", "args", "start", "record", "token")
+
+    def __init__(self, profile: RequestProfile, name: str, args: dict):
+        self.profile = profile
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.record = self.profile.add_span(self.name, self.start, _parent.get(), self.args)
+        # 期间（包括本任务中的 await）开始的 span 以本 span 为父节点
+        self.token = _parent.set(self.record["id"])
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record["duration_ms"] = (time.perf_counter() - self.start) * 1000
+        _parent.reset(self.token)
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **args):
+    """
+    记录一段耗时，用法：with span("qwen.chat"): ...
+    当前请求未开启剖析时返回空操作对象，开销只有一次 ContextVar 读取
+    :param name: 名称，"." 之前的部分作为汇总类别（crud、execution、node、qwen、db 等）
+    """
+    profile = _current.get()
+    if profile is None:
+        return _NULL_SPAN
+    return _Span(profile, name, args)
+
+
+def record_span(name: str, start: float, end: float, **args):
+    """
+    记录已经结束的一段耗时（用于无法包裹成 with 语句的场景，如数据库事件）
+    """
+    profile = _current.get()
+    if profile is not None:
+        profile.add_span(name, start, _parent.get(), args)["duration_ms"] = (end - start) * 1000
+
+
+def instrument_engine_spans(engine):
+    """
+    剖析模式下把每条数据库语句记录为 db.<操作> span
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("profile_started")
+        if _current.get() is not None and stack:
+            operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            record_span(f"db.{operation}", stack.pop(), time.perf_counter(), statement=statement[:200])
+
+
+def _requested(scope) -> bool:
+    """
+    请求头 X-Profile 或查询参数 profile 开启剖析；配置了 PROFILING_TOKEN 时取值必须与之相同
+    """
+    value = None
+    for key, header_value in scope.get("headers", ()):
+        if key == PROFILE_HEADER.encode():
+            value = header_value.decode("latin-1")
+            break
+    if value is None and scope.get("query_string"):
+        values = parse_qs(scope["query_string"].decode("latin-1")).get(PROFILE_QUERY_PARAM)
+        value = values[0] if values else None
+    if not value:
+        return False
+    if settings.PROFILING_TOKEN:
+        return value == settings.PROFILING_TOKEN
+    return value.lower() not in ("0", "false", "no")
+
+
+def profile_path(profile_id: str, suffix: str) -> str:
+    return os.path.join(settings.PROFILING_DIR, f"{profile_id}{suffix}")
+
+
+def _top_functions(stats, limit: int = 30) -> List[dict]:
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({"function": f"{function} ({os.path.basename(filename)}:{line})", "calls": calls,
+                     "tottime_ms": tottime * 1000, "cumtime_ms": cumtime * 1000})
+    rows.sort(key=lambda row: -row["tottime_ms"])
+    return rows[:limit]
+
+
+def save_profile(profile: RequestProfile, status: int):
+    """
+    保存剖析结果：<id>.json（摘要、span 和 Chrome trace 格式的时间线）和 <id>.prof（pstats）
+    """
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    top = []
+    if profile.profiler is not None:
+        import pstats
+
+        stats = pstats.Stats(profile.profiler, stream=io.StringIO())
+        stats.dump_stats(profile_path(profile.id, ".prof"))
+        top = _top_functions(stats)
+
+    spans = profile.finished_spans()
+    document = {
+        "id": profile.id,
+        "name": profile.name,
+        "status": status,
+        "created_at": profile.created_at.isoformat(),
+        "total_ms": max((span["start_ms"] + span["duration_ms"] for span in spans), default=0.0),
+        "summary": profile.summary(),
+        "cprofile": profile.profiler is not None,
+        "top_functions": top,
+        "spans": spans,
+        # chrome://tracing 或 Perfetto 可直接打开
+        "traceEvents": [
+            {"name": span["name"], "cat": span["name"].split(".", 1)[0], "ph": "X", "pid": 1,
+             "tid": span["task"], "ts": span["start_ms"] * 1000, "dur": span["duration_ms"] * 1000,
+             "args": span["args"]}
+            for span in spans
+        ],
+    }
+    with open(profile_path(profile.id, ".json"), "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, default=str)
+    _prune()
+
+
+def _prune():
+    # 只保留最近的 PROFILING_MAX_FILES 份结果
+    try:
+        names = sorted(name for name in os.listdir(settings.PROFILING_DIR) if name.endswith(".json"))
+    except OSError:
+        return
+    for name in names[:max(0, len(names) - settings.PROFILING_MAX_FILES)]:
+        for suffix in (".json", ".prof"):
+            try:
+                os.remove(profile_path(name[:-len(".json")], suffix))
+            except OSError:
+                pass
+
+
+def list_profiles() -> List[str]:
+    try:
+        names = os.listdir(settings.PROFILING_DIR)
+    except OSError:
+        return []
+    return sorted((name[:-len(".json")] for name in names if name.endswith(".json")), reverse=True)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI 中间件：请求带 X-Profile 头或 profile 查询参数时记录 span 时间线和 cProfile，
+    在响应头 X-Profile-Id / X-Profile-Summary 中返回摘要（流式响应为首字节前的耗时），
+    响应结束后把完整结果写入 PROFILING_DIR
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(f"{scope['method']} {scope['path']}")
+        token = _current.set(profile)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile.id.encode()))
+                headers.append((b"x-profile-summary", profile.summary_header().encode("latin-1", "replace")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        # cProfile 记录的是整个事件循环线程，期间并发执行的其他请求也会计入
+        use_cprofile = _profiler_lock.acquire(blocking=False)
+        if use_cprofile:
+            import cProfile
+
+            profile.profiler = cProfile.Profile()
+            profile.profiler.enable()
+        try:
+            with span(f"route {scope['method']} {scope['path']}"):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            if use_cprofile:
+                profile.profiler.disable()
+                _profiler_lock.release()
+            _current.reset(token)
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, save_profile, profile, status)
+            except Exception as e:
+                logger.error(f"Error saving profile {profile.id}: {str(e)}")
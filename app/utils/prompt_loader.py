@@ -0,0 +1,31 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+# path -> (mtime_ns, 内容)，文件修改后自动重新读取
+_cache: Dict[str, Tuple[int, str]] = {}
+_lock = threading.Lock()
+
+
+def load_system_prompt(path: Optional[str]) -> Optional[str]:
+    """
+    读取系统提示文件，按修改时间缓存内容
+    :param path: 提示文件路径
+    :return: 文件内容，文件不存在时返回None
+    """
+    if not path:
+        return None
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    cached = _cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    with _lock:
+        _cache[path] = (mtime, content)
+    return content
@@ -1,36 +1,74 @@
+import asyncio
 import httpx
 import json
+import time
+from typing import Optional
 from app.core.config import settings
-import os
+from app.utils.http_client import get_http_client
+from app.utils.metrics import QWEN_FIRST_TOKEN_SECONDS, QWEN_REQUEST_SECONDS, observe_qwen_usage
+from app.utils.profiling import record_span, span
+from app.utils.prompt_loader import load_system_prompt
+from app.utils.rate_limiter import PRIORITY_INTERACTIVE, ModelGovernor, estimate_tokens, get_governor
+from app.utils.resilience import ResiliencePolicy, get_resilience_policy, parse_retry_after
+
+class QwenAPIError(Exception):
+    """Qwen API 返回非200状态码"""
+
+    def __init__(self, status_code: int, body: str, retry_after: Optional[float] = None):
+        super().__init__(f"Qwen API error: {status_code} - {body}")
+        self.status_code = status_code
+        self.body = body
+        # 响应头 Retry-After 指定的等待秒数
+        self.retry_after = retry_after
+
+class QwenRateLimitError(QwenAPIError):
+    """Qwen API 返回429（超出配额或限流）"""
+
+def _raise_for_status(response: httpx.Response, body: str):
+    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+    if response.status_code == 429:
+        raise QwenRateLimitError(response.status_code, body, retry_after)
+    raise QwenAPIError(response.status_code, body, retry_after)
 
 class QwenClient:
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, governor: Optional[ModelGovernor] = None,
+                 resilience: Optional[ResiliencePolicy] = None):
         self.api_key = settings.QWEN_API_KEY
         self.base_url = settings.QWEN_BASE_URL
-        
-    async def call_qwen_plus(self, prompt: str, system_prompt_path: str = None, **kwargs):
+        # 未指定时使用进程内共享的连接池客户端、出站调度器和容错策略
+        self._client = client
+        self._governor = governor
+        self._resilience = resilience
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_http_client()
+
+    @property
+    def governor(self) -> Optional[ModelGovernor]:
+        return self._governor or get_governor()
+
+    @property
+    def resilience(self) -> ResiliencePolicy:
+        return self._resilience or get_resilience_policy()
+
+    def build_payload(self, prompt: str, system_prompt_path: str = None, system_prompt: str = None, **kwargs):
         """
-        调用Qwen-Plus模型
+        构建请求体
         :param prompt: 输入提示
+        :param system_prompt_path: 系统提示文件路径
+        :param system_prompt: 系统提示内容，提供时不再读取文件
         :param kwargs: 其他参数
-        :return: 模型响应
+        :return: OpenAI兼容格式的请求体
         """
-        if not self.api_key:
-            raise ValueError("QWEN_API_KEY is not set")
-            
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-
         # Prepare messages
         messages = []
         
-        # Add system prompt if provided
-        if system_prompt_path and os.path.exists(system_prompt_path):
-            with open(system_prompt_path, 'r', encoding='utf-8') as f:
-                system_content = f.read()
-                messages.append({"role": "system", "content": system_content})
+        # Add system prompt if provided (file contents are cached by mtime)
+        if system_prompt is None:
+            system_prompt = load_system_prompt(system_prompt_path)
+        if system_prompt is not None:
+            messages.append({"role": "system", "content": system_prompt})
 
         # Add user prompt
         messages.append({"role": "user", "content": prompt})
@@ -46,24 +84,176 @@ class QwenClient:
         # Add any additional parameters
         if "parameters" in kwargs:
             data.update(kwargs["parameters"])
-        
+        return data
+
+    def _headers(self):
+        if not self.api_key:
+            raise ValueError("QWEN_API_KEY is not set")
+            
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    async def call_qwen_plus(self, prompt: str, system_prompt_path: str = None, system_prompt: str = None, **kwargs):
+        """
+        调用Qwen-Plus模型
+        :param prompt: 输入提示
+        :param system_prompt_path: 系统提示文件路径
+        :param system_prompt: 系统提示内容，提供时不再读取文件
+        :param kwargs: 其他参数
+        :return: 模型响应
+        """
+        return await self.send(self.build_payload(prompt, system_prompt_path, system_prompt, **kwargs))
+
+    async def send(self, data: dict, priority: int = PRIORITY_INTERACTIVE):
+        """
+        发送已构建好的请求体，失败时按容错策略重试（可选对冲），每次尝试都经过出站调度器限流和排队
+        :param data: 请求体
+        :param priority: 排队优先级，数值越小越先发送
+        :return: 模型响应
+        """
+        return await self.resilience.call(lambda: self._send_once(data, priority))
+
+    async def _send_once(self, data: dict, priority: int):
+        governor = self.governor
+        if governor is None:
+            return await self.resilience.request(lambda: self._post(data))
+        with span("governor.wait", priority=priority):
+            permit = await governor.acquire(priority, estimate_tokens(data))
+        async with permit:
+            # 获得许可后才开始计时和对冲；有请求在排队时不对冲，不挤占它们的名额
+            response = await self.resilience.request(lambda: self._post(data),
+                                                     can_hedge=lambda: not governor.has_waiters)
+            permit.set_usage(response.get("usage"))
+            return response
+
+    async def _post(self, data: dict):
+        headers = self._headers()
         # Construct the full URL for the Qwen Plus model
         url = f"{self.base_url}/chat/completions"
         
-        # Set timeout to 10 seconds
-        timeout = httpx.Timeout(20.0)
-        
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                url,
-                headers=headers,
-                json=data
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"Qwen API error: {response.status_code} - {response.text}")
-                
-            return response.json()
+        # 复用共享连接池，超时时间由 HTTP_TIMEOUT 配置
+        started = time.perf_counter()
+        status = "error"
+        try:
+            with span("qwen.chat", model=data.get("model")):
+                response = await self.client.post(
+                    url,
+                    headers=headers,
+                    json=data
+                )
+            status = str(response.status_code)
+        finally:
+            QWEN_REQUEST_SECONDS.labels("sync", status).observe(time.perf_counter() - started)
+
+        if response.status_code != 200:
+            _raise_for_status(response, response.text)
+
+        with span("json.qwen_response", bytes=len(response.content)):
+            result = response.json()
+        observe_qwen_usage(result.get("usage"))
+        return result
+
+    async def stream_qwen_plus(self, prompt: str, system_prompt_path: str = None, system_prompt: str = None, **kwargs):
+        """
+        以流式方式调用Qwen-Plus模型（stream: true）
+        :param prompt: 输入提示
+        :param system_prompt_path: 系统提示文件路径
+        :param system_prompt: 系统提示内容，提供时不再读取文件
+        :param kwargs: 其他参数
+        :return: 异步生成器，逐个返回解析后的 chat.completion.chunk
+        """
+        async for chunk in self.send_stream(self.build_payload(prompt, system_prompt_path, system_prompt, **kwargs)):
+            yield chunk
+
+    async def send_stream(self, data: dict, priority: int = PRIORITY_INTERACTIVE):
+        """
+        以流式方式发送已构建好的请求体
+        超时时间作用于每个数据块之间，长文本生成不会因总耗时超时
+        经过出站调度器时，整个流式响应期间占用一个并发名额，以首个数据块的到达时间作为延迟
+        :param data: 请求体
+        :param priority: 排队优先级，数值越小越先发送
+        :return: 异步生成器，逐个返回解析后的 chat.completion.chunk
+        """
+        # 只有在收到第一个数据块之前失败才重试，已输出的内容无法撤回
+        policy = self.resilience
+        policy.stats["calls"] += 1
+        attempt = 0
+        while True:
+            policy.breaker.before_call()
+            policy.stats["attempts"] += 1
+            received = False
+            try:
+                async for chunk in self._send_stream_once(data, priority):
+                    received = True
+                    yield chunk
+            except Exception as e:
+                delay = None if received else policy.after_failure(attempt, e)
+                if delay is None:
+                    if received:
+                        policy.breaker.record_failure()
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                policy.breaker.release_trial()
+                raise
+            policy.breaker.record_success()
+            return
+
+    async def _send_stream_once(self, data: dict, priority: int):
+        governor = self.governor
+        if governor is None:
+            async for chunk in self._post_stream(data):
+                yield chunk
+            return
+        with span("governor.wait", priority=priority):
+            permit = await governor.acquire(priority, estimate_tokens(data))
+        async with permit:
+            async for chunk in self._post_stream(data):
+                permit.mark_first_byte()
+                permit.set_usage(chunk.get("usage"))
+                yield chunk
+
+    async def _post_stream(self, data: dict):
+        headers = self._headers()
+        url = f"{self.base_url}/chat/completions"
+        data = dict(data, stream=True)
+        data.setdefault("stream_options", {"include_usage": True})
+
+        started = time.perf_counter()
+        status = "error"
+        first_chunk = True
+        first_chunk_at = None
+        try:
+            async with self.client.stream("POST", url, headers=headers, json=data) as response:
+                status = str(response.status_code)
+                if response.status_code != 200:
+                    body = await response.aread()
+                    _raise_for_status(response, body.decode('utf-8', 'replace'))
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:"):].strip()
+                    if payload == "[DONE]":
+                        break
+                    if payload:
+                        chunk = json.loads(payload)
+                        if first_chunk:
+                            first_chunk_at = time.perf_counter()
+                            QWEN_FIRST_TOKEN_SECONDS.observe(first_chunk_at - started)
+                            first_chunk = False
+                        observe_qwen_usage(chunk.get("usage"))
+                        yield chunk
+        finally:
+            finished = time.perf_counter()
+            QWEN_REQUEST_SECONDS.labels("stream", status).observe(finished - started)
+            # 生成器在调用方的上下文中恢复执行，不能用 with span 包裹 yield
+            record_span("qwen.chat_stream", started, finished, model=data.get("model"),
+                        first_chunk_ms=(first_chunk_at - started) * 1000 if first_chunk_at else None)
 
 # For debugging purposes
 if __name__ == "__main__":
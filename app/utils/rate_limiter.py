@@ -0,0 +1,285 @@
+from collections import deque
+from typing import Dict, List, Optional
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 延迟信号：流式请求取首字节时间，非流式请求取每个输出 token 的平均耗时（整体耗时与输出长度成正比，不能直接比较）
+LATENCY_FIRST_BYTE = "first_byte"
+LATENCY_PER_TOKEN = "per_token"
+
+# 请求优先级，数值越小越先执行：交互式请求（同步/流式执行、直接调用模型）优先于后台批量运行
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+
+class TokenBucket:
+    """
+    令牌桶：以 rate 每秒的速度补充，最多积累 capacity 个令牌
+    rate 为0时不限制
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0) if rate > 0 else 0.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        距离可以取出 amount 个令牌还需等待的秒数
+        """
+        if not self.enabled:
+            return 0.0
+        self._refill(time.monotonic())
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        if self.enabled:
+            self._refill(time.monotonic())
+            self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        """
+        按实际用量修正预估值，amount 为负时补扣
+        """
+        if self.enabled:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class Permit:
+    """
+    调度器发放的执行许可，调用方在请求完成后通过它反馈实际用量和首字节时间
+    """
+
+    def __init__(self, governor: "ModelGovernor", estimated_tokens: int):
+        self.governor = governor
+        self.estimated_tokens = estimated_tokens
+        self.started = time.monotonic()
+        self.latency: Optional[float] = None
+        self.used_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+
+    def mark_first_byte(self):
+        """
+        流式请求收到第一个数据块时调用，以首字节时间作为延迟样本
+        """
+        if self.latency is None:
+            self.latency = time.monotonic() - self.started
+
+    def set_usage(self, usage: Optional[dict]):
+        if usage and usage.get("total_tokens"):
+            self.used_tokens = usage["total_tokens"]
+        if usage and usage.get("completion_tokens"):
+            self.completion_tokens = usage["completion_tokens"]
+
+    def latency_sample(self):
+        """
+        :return: (信号类型, 延迟)，非流式请求没有返回用量时为 (None, None)
+        """
+        if self.latency is not None:
+            return LATENCY_FIRST_BYTE, self.latency
+        if self.completion_tokens:
+            return LATENCY_PER_TOKEN, (time.monotonic() - self.started) / self.completion_tokens
+        return None, None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if getattr(exc, "status_code", None) == 429:
+            self.governor._on_rate_limited()
+        elif exc_type is None:
+            self.governor._on_success(*self.latency_sample())
+        if self.used_tokens is not None:
+            self.governor.tpm_bucket.refund(self.estimated_tokens - self.used_tokens)
+        self.governor._release()
+        return False
+
+
+class ModelGovernor:
+    """
+    模型API出站调度器
+    - 每秒请求数（RPS）和每分钟 token 数（TPM）两个令牌桶
+    - AIMD 自适应并发上限：请求成功时缓慢增加，遇到429时成倍减少；
+      开启 latency_tolerance 时，最近 latency_window 个样本的 p90 持续超过基线的该倍数也会减少（默认关闭）
+    - 按优先级排队，交互式请求优先于批量请求，同优先级先到先得
+    """
+
+    def __init__(self, rps: float = 0, tpm: float = 0, initial_concurrency: int = 8, min_concurrency: int = 1,
+                 max_concurrency: int = 32, latency_tolerance: float = 0, latency_window: int = 20,
+                 decrease_factor: float = 0.5, cooldown: float = 1.0):
+        self.rps_bucket = TokenBucket(rps, rps)
+        self.tpm_bucket = TokenBucket(tpm / 60.0, tpm)
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.limit = float(min(max(initial_concurrency, self.min_concurrency), self.max_concurrency))
+        self.latency_tolerance = latency_tolerance
+        self.latency_window = max(1, latency_window)
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        # 按信号类型分别记录基线和最近的样本
+        self.baseline_latency: Dict[str, float] = {}
+        self._latency_samples: Dict[str, deque] = {}
+        self._last_decrease = 0.0
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {"requests": 0, "rate_limited": 0, "decreases": 0, "queued": 0}
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, estimated_tokens: int = 0) -> Permit:
+        """
+        等待执行许可，用法：async with await governor.acquire(priority, tokens) as permit: ...
+        :param priority: 优先级，数值越小越先执行
+        :param estimated_tokens: 预估的 token 数（提示 + max_tokens），用于 TPM 限流
+        :return: Permit，退出 async with 时归还并发名额
+        """
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), estimated_tokens, future))
+        self.stats["queued"] += 1
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已获得许可但调用方被取消，归还并发名额
+                self._release()
+            raise
+        self.stats["requests"] += 1
+        return Permit(self, estimated_tokens)
+
+    @property
+    def has_waiters(self) -> bool:
+        """
+        是否有请求在等待许可
+        """
+        return any(not waiter[3].done() for waiter in self._waiters)
+
+    def _dispatch(self):
+        """
+        按优先级依次放行等待中的请求，直到并发上限已满或令牌不足
+        """
+        while self._waiters:
+            priority, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= int(self.limit):
+                return
+            wait = max(self.rps_bucket.wait_time(1), self.tpm_bucket.wait_time(tokens))
+            if wait > 0:
+                # 令牌不足时稍后再试，队首请求继续保持优先
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(wait, self._on_timer)
+                return
+            heapq.heappop(self._waiters)
+            self.rps_bucket.consume(1)
+            self.tpm_bucket.consume(tokens)
+            self.in_flight += 1
+            future.set_result(None)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _release(self):
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _on_success(self, kind: Optional[str] = None, latency: Optional[float] = None):
+        if latency is not None and self._latency_breached(kind, latency):
+            # 延迟持续高于基线，说明服务端开始排队，减少并发
+            self._decrease()
+        else:
+            # 加性增长：每个并发窗口约增加1
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+
+    def _latency_breached(self, kind: str, latency: float) -> bool:
+        """
+        记录延迟样本，最近一个窗口的 p90 超过基线的 latency_tolerance 倍时返回True
+        单个慢请求不会触发，latency_tolerance 为0时只统计不判断
+        """
+        baseline = self.baseline_latency.setdefault(kind, latency)
+        samples = self._latency_samples.setdefault(kind, deque(maxlen=self.latency_window))
+        samples.append(latency)
+        # 基线取较长窗口的平均延迟
+        self.baseline_latency[kind] = 0.95 * baseline + 0.05 * latency
+        if self.latency_tolerance <= 0 or len(samples) < self.latency_window:
+            return False
+        p90 = sorted(samples)[int(0.9 * (len(samples) - 1))]
+        if p90 <= baseline * self.latency_tolerance:
+            return False
+        # 减少之后重新积累一个窗口再判断
+        samples.clear()
+        return True
+
+    def _on_rate_limited(self):
+        self.stats["rate_limited"] += 1
+        self._decrease()
+
+    def _decrease(self):
+        # 同一冷却期内只减少一次，避免一批同时失败的请求把上限压到最低
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+        self.stats["decreases"] += 1
+        logger.info(f"Model concurrency limit decreased to {self.limit:.1f}")
+
+    def get_stats(self) -> dict:
+        return dict(
+            self.stats,
+            limit=round(self.limit, 2),
+            in_flight=self.in_flight,
+            waiting=sum(1 for waiter in self._waiters if not waiter[3].done()),
+            baseline_latency=dict(self.baseline_latency),
+        )
+
+
+def estimate_tokens(payload: dict) -> int:
+    """
+    粗略估算一次请求消耗的 token 数：消息字符数 / 2（中英文混合）加上 max_tokens
+    """
+    chars = sum(len(str(message.get("content", ""))) for message in payload.get("messages", []))
+    return chars // 2 + int(payload.get("max_tokens") or 0)
+
+
+_governor: Optional[ModelGovernor] = None
+
+
+def get_governor() -> Optional[ModelGovernor]:
+    """
+    获取进程内共享的调度器，QWEN_GOVERNOR_ENABLED 关闭时返回None
+    """
+    global _governor
+    if not settings.QWEN_GOVERNOR_ENABLED:
+        return None
+    if _governor is None:
+        _governor = ModelGovernor(
+            rps=settings.QWEN_RPS,
+            tpm=settings.QWEN_TPM,
+            initial_concurrency=settings.QWEN_INITIAL_CONCURRENCY,
+            min_concurrency=settings.QWEN_MIN_CONCURRENCY,
+            max_concurrency=settings.QWEN_MAX_CONCURRENCY,
+            latency_tolerance=settings.QWEN_LATENCY_TOLERANCE,
+            latency_window=settings.QWEN_LATENCY_WINDOW,
+        )
+    return _governor
@@ -0,0 +1,299 @@
+from collections import deque
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 可重试的HTTP状态码：限流和服务端临时错误
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头（秒数或HTTP日期）
+    :return: 需要等待的秒数，无法解析时返回None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    超时、连接错误以及429/5xx响应可以重试，其他错误（如4xx、缺少API Key）直接失败
+    """
+    if isinstance(exc, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+    return getattr(exc, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+class CircuitBreaker:
+    """
+    连续失败达到阈值后打开，打开期间直接拒绝请求；
+    经过 recovery_timeout 后进入半开状态，只放行一个试探请求，成功则关闭，失败则重新打开
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self.stats = {"opened": 0, "rejected": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    def before_call(self):
+        if not self.enabled or self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == self.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+        self.stats["rejected"] += 1
+        raise CircuitOpenError("Qwen API circuit breaker is open, failing fast")
+
+    def record_success(self):
+        self.failures = 0
+        self._trial_in_flight = False
+        if self.state != self.CLOSED:
+            logger.info("Qwen API circuit breaker closed")
+        self.state = self.CLOSED
+
+    def release_trial(self):
+        """
+        试探请求因与服务端状态无关的原因失败时，允许下一个请求继续试探
+        """
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.enabled and (self.state == self.HALF_OPEN or self.failures >= self.failure_threshold):
+            if self.state != self.OPEN:
+                self.stats["opened"] += 1
+                logger.warning(f"Qwen API circuit breaker opened after {self.failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """
+    最近若干次成功调用的延迟，用于计算对冲请求的等待时间
+    """
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def record(self, latency: float):
+        self._samples.append(latency)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        return ordered[index]
+
+
+class ResiliencePolicy:
+    """
+    模型调用的容错策略：
+    - 对可重试的错误按带抖动的指数退避重试，响应带 Retry-After 时按其等待
+    - 可选的对冲请求：上游请求超过近期延迟的 p95 仍未返回时再发送一份相同请求，取先成功的结果
+    - 熔断器：服务端持续出错时直接失败，避免请求堆积
+    """
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 20.0,
+                 hedge_enabled: bool = False, hedge_percentile: float = 95, hedge_min_delay: float = 1.0,
+                 failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        self.latency = LatencyTracker()
+        self.stats = {
+            "calls": 0, "attempts": 0, "retries": 0, "retries_exhausted": 0, "failures": 0,
+            "hedges_sent": 0, "hedges_won": 0, "hedges_skipped": 0,
+        }
+
+    def backoff(self, attempt: int, exc: BaseException) -> Optional[float]:
+        """
+        计算第 attempt 次重试前的等待时间（full jitter）
+        :return: 等待秒数；Retry-After 超过 max_delay 时返回None，表示不再重试
+        """
+        retry_after = getattr(exc, "retry_after", None)
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def hedge_delay(self) -> float:
+        # 样本太少时使用最小等待时间
+        if len(self.latency) < 20:
+            return self.hedge_min_delay
+        return max(self.hedge_min_delay, self.latency.percentile(self.hedge_percentile))
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]):
+        """
+        按策略执行一次模型调用（重试和熔断）
+        :param fn: 发起单次尝试的协程函数，每次尝试都会重新调用；其中的上游请求通过 request 发送
+        """
+        self.stats["calls"] += 1
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            self.stats["attempts"] += 1
+            try:
+                result = await fn()
+            except Exception as e:
+                delay = self.after_failure(attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # 调用方取消时不影响熔断状态
+                self.breaker.release_trial()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def after_failure(self, attempt: int, exc: BaseException) -> Optional[float]:
+        """
+        记录一次失败的尝试
+        :return: 重试前需要等待的秒数，不应重试时返回None
+        """
+        if isinstance(exc, CircuitOpenError):
+            return None
+        retryable = is_retryable(exc)
+        # 只有服务端错误和超时计入熔断；429 由出站调度器处理
+        if retryable and getattr(exc, "status_code", None) != 429:
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_trial()
+        delay = self.backoff(attempt, exc) if retryable else None
+        # 熔断器已打开时不再重试
+        if delay is None or attempt >= self.max_retries or self.breaker.state == CircuitBreaker.OPEN:
+            self.stats["failures"] += 1
+            if retryable:
+                self.stats["retries_exhausted"] += 1
+            return None
+        self.stats["retries"] += 1
+        logger.warning(f"Model call failed ({exc}), retrying in {delay:.2f}s")
+        return delay
+
+    async def request(self, fn: Callable[[], Awaitable[Any]], can_hedge: Optional[Callable[[], bool]] = None):
+        """
+        发送一次上游请求，记录其延迟，开启对冲时按需发送对冲请求
+        应在获得出站调度器的许可之后调用，排队时间不计入延迟样本和对冲等待时间
+        :param fn: 发送上游请求的协程函数
+        :param can_hedge: 到达对冲时间时调用，返回False时不发送对冲请求（例如调度器中有请求在排队）
+        """
+        if self.hedge_enabled:
+            return await self._hedged(fn, can_hedge)
+        return await self._timed(fn)
+
+    async def _timed(self, fn):
+        started = time.monotonic()
+        result = await fn()
+        self.latency.record(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, fn, can_hedge: Optional[Callable[[], bool]] = None):
+        primary = asyncio.ensure_future(self._timed(fn))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay())
+            if not done:
+                if can_hedge is None or can_hedge():
+                    # 主请求超过延迟阈值仍未返回，发送对冲请求
+                    self.stats["hedges_sent"] += 1
+                    tasks.add(asyncio.ensure_future(self._timed(fn)))
+                else:
+                    self.stats["hedges_skipped"] += 1
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats["hedges_won"] += 1
+                        return task.result()
+            # 全部失败时抛出主请求的错误
+            raise primary.exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def get_stats(self) -> dict:
+        return dict(
+            self.stats,
+            breaker_state=self.breaker.state,
+            breaker_opened=self.breaker.stats["opened"],
+            breaker_rejected=self.breaker.stats["rejected"],
+            latency_p50=self.latency.percentile(50),
+            latency_p95=self.latency.percentile(95),
+            hedge_delay=self.hedge_delay() if self.hedge_enabled else None,
+        )
+
+
+_policy: Optional[ResiliencePolicy] = None
+
+
+def get_resilience_policy() -> ResiliencePolicy:
+    """
+    获取进程内共享的模型调用容错策略
+    """
+    global _policy
+    if _policy is None:
+        _policy = ResiliencePolicy(
+            max_retries=settings.QWEN_MAX_RETRIES,
+            base_delay=settings.QWEN_RETRY_BASE_DELAY,
+            max_delay=settings.QWEN_RETRY_MAX_DELAY,
+            hedge_enabled=settings.QWEN_HEDGE_ENABLED,
+            hedge_percentile=settings.QWEN_HEDGE_PERCENTILE,
+            hedge_min_delay=settings.QWEN_HEDGE_MIN_DELAY,
+            failure_threshold=settings.QWEN_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=settings.QWEN_BREAKER_RECOVERY_TIMEOUT,
+        )
+    return _policy
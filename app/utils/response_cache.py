@@ -0,0 +1,172 @@
+from collections import OrderedDict
+from typing import Optional
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(payload: dict) -> str:
+    """
+    根据完整请求体（模型、消息含系统提示、max_tokens、temperature及额外参数）计算缓存键
+    """
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    两级模型响应缓存：进程内LRU + SQLite持久化存储
+    两级都按TTL过期，磁盘层超过容量上限时按最近访问时间淘汰
+    """
+
+    def __init__(self, path: str, ttl: float, memory_size: int, max_bytes: int):
+        self.path = path
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at)")
+            self._conn.commit()
+        return self._conn
+
+    async def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+        row = await asyncio.to_thread(self._disk_get, key, now)
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        created_at, value = row
+        self._remember(key, created_at, value)
+        self.stats["disk_hits"] += 1
+        return value
+
+    async def set(self, key: str, value: dict):
+        created_at = time.time()
+        self._remember(key, created_at, value)
+        self.stats["stores"] += 1
+        try:
+            await asyncio.to_thread(self._disk_set, key, value, created_at)
+        except sqlite3.Error as e:
+            # 持久化失败不影响本次调用结果
+            logger.warning(f"Failed to persist LLM response cache entry: {e}")
+
+    def _remember(self, key: str, created_at: float, value: dict):
+        with self._memory_lock:
+            self._memory[key] = (created_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str, now: float):
+        with self._db_lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+        return created_at, json.loads(value)
+
+    def _disk_set(self, key: str, value: dict, created_at: float):
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        with self._db_lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, size, created_at, created_at),
+            )
+            self._evict(conn, created_at)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """
+        删除过期条目，超过容量上限时按最近访问时间淘汰
+        """
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        to_delete = []
+        for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM llm_cache WHERE key = ?", to_delete)
+        self.stats["evictions"] += len(to_delete)
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        return dict(self.stats, memory_entries=len(self._memory), hit_rate=hits / lookups if lookups else 0.0)
+
+    def close(self):
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    获取共享的响应缓存，未启用 LLM_CACHE_ENABLED 时返回None
+    """
+    global _cache
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = ResponseCache(
+            path=settings.LLM_CACHE_PATH,
+            ttl=settings.LLM_CACHE_TTL,
+            memory_size=settings.LLM_CACHE_MEMORY_SIZE,
+            max_bytes=settings.LLM_CACHE_MAX_BYTES,
+        )
+    return _cache
+
+
+def close_response_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
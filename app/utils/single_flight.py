@@ -0,0 +1,57 @@
+from typing import Any, Awaitable, Callable, Dict, Tuple
+import asyncio
+
+
+class SingleFlight:
+    """
+    合并相同键的并发调用：同一时刻只执行一次，结果（或异常）由所有等待者共享
+    共享调用运行在独立的任务中，单个等待者取消不会影响其他等待者；
+    所有等待者都取消后才取消共享调用
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Tuple[asyncio.Task, list]] = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    @property
+    def in_flight_count(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        执行或加入相同键的调用
+        :param key: 调用键
+        :param fn: 没有进行中的调用时用于发起调用的协程函数
+        :return: (结果, 是否复用了其他请求发起的调用)
+        """
+        entry = self._calls.get(key)
+        shared = entry is not None
+        if entry is None:
+            task = asyncio.ensure_future(fn())
+            entry = (task, [0])
+            self._calls[key] = entry
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.stats["calls"] += 1
+        else:
+            self.stats["shared"] += 1
+
+        task, waiters = entry
+        waiters[0] += 1
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            if waiters[0] == 1 and not task.done():
+                # 最后一个等待者离开，不再需要这次调用
+                task.cancel()
+                self._forget(key, task)
+            raise
+        finally:
+            waiters[0] -= 1
+
+    def _forget(self, key: str, task: asyncio.Task):
+        entry = self._calls.get(key)
+        if entry is not None and entry[0] is task:
+            del self._calls[key]
@@ -0,0 +1,39 @@
+from typing import AsyncIterator, Dict, Optional
+import json
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+# 批量执行结果的输出顺序：按完成顺序或按输入顺序
+BATCH_ORDERS = ("completion", "input")
+
+
+def check_order(order: str) -> bool:
+    """
+    校验批量结果的 order 参数
+    :return: 是否按输入顺序输出；取值不合法时返回400
+    """
+    if order not in BATCH_ORDERS:
+        raise HTTPException(status_code=400, detail=f"order must be one of: {', '.join(BATCH_ORDERS)}")
+    return order == "input"
+
+
+def format_sse(event: str, data: dict) -> str:
+    """
+    格式化一条 Server-Sent Events 消息
+    """
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def ndjson_response(records: AsyncIterator[dict], headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """
+    以NDJSON流式返回记录，每行一条
+    :param records: 异步产生记录的迭代器
+    :param headers: 额外的响应头
+    """
+    async def generate():
+        async for record in records:
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson", headers=headers)
@@ -0,0 +1,83 @@
+from typing import Iterable, List, Tuple
+import asyncio
+import ipaddress
+import socket
+
+import httpx
+
+# 出站请求的地址检查（HTTP节点），防止工作流被用来访问内网服务或云平台元数据接口（SSRF）
+
+ALLOWED_SCHEMES = ("http", "https")
+
+
+class BlockedURLError(Exception):
+    """请求的地址不允许访问"""
+
+
+def parse_hosts(value: str) -> List[str]:
+    """
+    解析逗号分隔的主机列表，以 "." 开头的项匹配该域名及其子域名
+    """
+    return [item.strip().lower().rstrip(".") for item in value.split(",") if item.strip()]
+
+
+def host_matches(host: str, patterns: Iterable[str]) -> bool:
+    host = host.lower().rstrip(".")
+    for pattern in patterns:
+        if pattern.startswith("."):
+            if host == pattern[1:] or host.endswith(pattern):
+                return True
+        elif host == pattern:
+            return True
+    return False
+
+
+def is_public_address(address: str) -> bool:
+    """
+    是否为公网地址：内网、回环、链路本地、保留、组播等地址返回False
+    """
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        # ::ffff:127.0.0.1 这类映射地址按其中的IPv4地址判断
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def resolve(host: str, port: int) -> List[str]:
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return list(dict.fromkeys(info[4][0] for info in infos))
+
+
+async def check_url(url: httpx.URL, allowed_hosts: List[str], allow_private: bool) -> Tuple[httpx.URL, dict]:
+    """
+    检查出站请求的地址，返回实际连接使用的URL和需要附加的请求头、扩展
+    只允许 http/https；allowed_hosts 非空时只允许其中的主机（视为可信，不检查解析结果），
+    否则主机解析出的全部地址都必须是公网地址（allow_private 为True时不限制）
+    通过检查后直接连接解析出的地址，避免发送请求时重新解析得到不同的地址（DNS rebinding）
+    :return: (连接用的URL, {"headers": ..., "extensions": ...})
+    :raises BlockedURLError: 地址不允许访问或无法解析
+    """
+    if url.scheme not in ALLOWED_SCHEMES:
+        raise BlockedURLError(f"scheme '{url.scheme}' is not allowed")
+    host = url.host
+    if not host:
+        raise BlockedURLError("URL has no host")
+    if allowed_hosts:
+        if not host_matches(host, allowed_hosts):
+            raise BlockedURLError(f"host '{host}' is not in HTTP_NODE_ALLOWED_HOSTS")
+        return url, {}
+    if allow_private:
+        return url, {}
+    try:
+        addresses = await resolve(host, url.port or (443 if url.scheme == "https" else 80))
+    except (socket.gaierror, UnicodeError) as e:
+        raise BlockedURLError(f"cannot resolve host '{host}': {e}")
+    blocked = [address for address in addresses if not is_public_address(address)]
+    if not addresses or blocked:
+        raise BlockedURLError(f"host '{host}' resolves to a non-public address {', '.join(blocked)}")
+    pinned = url.copy_with(host=addresses[0].split("%", 1)[0])
+    options = {"headers": {"Host": url.netloc.decode("ascii")}}
+    if url.scheme == "https":
+        # 连接IP地址时仍按原主机名发送SNI并校验证书
+        options["extensions"] = {"sni_hostname": host}
+    return pinned, options
@@ -0,0 +1,237 @@
+"""
+本地模拟的 OpenAI 兼容 Qwen 服务，用于压测时替代 DashScope（QWEN_BASE_URL 指向本服务）
+
+用法：
+    python -m bench.mock_qwen --port 9000 --latency-dist lognormal --latency-mean 0.8 --error-rate 0.01
+    QWEN_BASE_URL=http://127.0.0.1:9000/v1 QWEN_API_KEY=mock uvicorn app.main:app
+
+支持非流式和流式（stream: true，可选 stream_options.include_usage）响应，
+可配置延迟分布、逐 token 输出间隔、5xx 错误率、429 比例以及每秒请求数上限
+"""
+from dataclasses import dataclass, asdict
+from typing import Optional
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+
+@dataclass
+class MockConfig:
+    # 非流式响应的总延迟、流式响应的首 token 延迟（秒）
+    latency_dist: str = "lognormal"
+    latency_mean: float = 0.5
+    latency_std: float = 0.2
+    # 流式响应每个 token 之间的间隔（秒）
+    token_interval: float = 0.02
+    # 每次回复的 token 数，不超过请求中的 max_tokens
+    completion_tokens: int = 64
+    # 返回500和429的概率
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    # 每秒请求数上限，超过时返回429（0为不限制）
+    rps_limit: float = 0.0
+    # 429响应中的 Retry-After 秒数
+    retry_after: float = 1.0
+    seed: Optional[int] = None
+
+
+class MockQwenServer:
+    """
+    模拟服务的状态：配置、随机数生成器、限流令牌桶和请求计数
+    """
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.tokens = config.rps_limit
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.stats = {}
+        self.reset()
+
+    def reset(self):
+        self.stats = {"requests": 0, "streamed": 0, "errors": 0, "rate_limited": 0, "max_in_flight": 0,
+                      "prompt_tokens": 0, "completion_tokens": 0}
+
+    def sample_latency(self) -> float:
+        config = self.config
+        mean, std = config.latency_mean, config.latency_std
+        if config.latency_dist == "fixed" or mean <= 0:
+            return max(0.0, mean)
+        if config.latency_dist == "uniform":
+            return self.random.uniform(max(0.0, mean - std), mean + std)
+        if config.latency_dist == "normal":
+            return max(0.0, self.random.gauss(mean, std))
+        if config.latency_dist == "exponential":
+            return self.random.expovariate(1.0 / mean)
+        # 对数正态分布：按给定的均值和标准差换算参数，长尾更接近真实模型服务
+        sigma2 = math.log(1 + (std / mean) ** 2)
+        return self.random.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+
+    def _over_rps_limit(self) -> bool:
+        rate = self.config.rps_limit
+        if rate <= 0:
+            return False
+        now = time.monotonic()
+        self.tokens = min(rate, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens < 1:
+            return True
+        self.tokens -= 1
+        return False
+
+    def check_failure(self) -> Optional[JSONResponse]:
+        """
+        按配置决定本次请求是否失败
+        :return: 失败时的响应，否则返回None
+        """
+        if self._over_rps_limit() or self.random.random() < self.config.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"code": "Throttling.RateQuota", "message": "Requests rate limit exceeded"}},
+                status_code=429, headers={"Retry-After": str(self.config.retry_after)}
+            )
+        if self.random.random() < self.config.error_rate:
+            self.stats["errors"] += 1
+            return JSONResponse({"error": {"code": "InternalError", "message": "Mock internal error"}},
+                                status_code=500)
+        return None
+
+    def usage(self, body: dict) -> dict:
+        # 与调度器的估算方式一致：字符数 / 2
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 2
+        completion_tokens = min(self.config.completion_tokens, int(body.get("max_tokens") or 1024))
+        self.stats["prompt_tokens"] += prompt_tokens
+        self.stats["completion_tokens"] += completion_tokens
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    @staticmethod
+    def reply_tokens(body: dict, count: int):
+        # 回复内容与提示相关，便于检查输出是否对应正确的请求
+        prompt = str(body.get("messages", [{}])[-1].get("content", ""))[:40]
+        words = [f"Echo({prompt})"] + [f" tok{i}" for i in range(1, count)]
+        return words[:max(1, count)]
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    server = MockQwenServer(config)
+    app = FastAPI(title="Mock Qwen API")
+    app.state.server = server
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        server.stats["requests"] += 1
+        failure = server.check_failure()
+        if failure is not None:
+            return failure
+
+        model = body.get("model", "qwen-plus")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        usage = server.usage(body)
+        tokens = server.reply_tokens(body, usage["completion_tokens"])
+        latency = server.sample_latency()
+
+        if not body.get("stream"):
+            server.in_flight += 1
+            server.stats["max_in_flight"] = max(server.stats["max_in_flight"], server.in_flight)
+            try:
+                await asyncio.sleep(latency)
+            finally:
+                server.in_flight -= 1
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        server.stats["streamed"] += 1
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def chunk(delta: dict, finish_reason=None, chunk_usage=None) -> str:
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None
+                    else []}
+            if chunk_usage is not None:
+                data["usage"] = chunk_usage
+            return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+        async def generate():
+            server.in_flight += 1
+            server.stats["max_in_flight"] = max(server.stats["max_in_flight"], server.in_flight)
+            try:
+                await asyncio.sleep(latency)
+                yield chunk({"role": "assistant", "content": ""})
+                for token in tokens:
+                    yield chunk({"content": token})
+                    if config.token_interval > 0:
+                        await asyncio.sleep(config.token_interval)
+                yield chunk({}, "stop")
+                if include_usage:
+                    yield chunk(None, chunk_usage=usage)
+                yield "data: [DONE]\n\n"
+            finally:
+                server.in_flight -= 1
+
+        return StreamingResponse(generate(), media_type="text/event-stream")
+
+    # QWEN_BASE_URL 带或不带 /v1 前缀都可以
+    app.add_api_route("/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/compatible-mode/v1/chat/completions", chat_completions, methods=["POST"])
+
+    @app.get("/stats")
+    async def read_stats():
+        return dict(server.stats, in_flight=server.in_flight, config=asdict(server.config))
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        server.reset()
+        return {"ok": True}
+
+    return app
+
+
+def build_parser() -> argparse.ArgumentParser:
+    defaults = MockConfig()
+    parser = argparse.ArgumentParser(description="本地模拟的 OpenAI 兼容 Qwen 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default=defaults.latency_dist)
+    parser.add_argument("--latency-mean", type=float, default=defaults.latency_mean, help="平均延迟（秒）")
+    parser.add_argument("--latency-std", type=float, default=defaults.latency_std, help="延迟标准差（秒）")
+    parser.add_argument("--token-interval", type=float, default=defaults.token_interval,
+                        help="流式输出每个 token 的间隔（秒）")
+    parser.add_argument("--completion-tokens", type=int, default=defaults.completion_tokens)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="返回500的概率")
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate, help="返回429的概率")
+    parser.add_argument("--rps-limit", type=float, default=defaults.rps_limit, help="每秒请求数上限，超过返回429")
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after)
+    parser.add_argument("--seed", type=int, default=defaults.seed, help="随机种子，用于复现结果")
+    return parser
+
+
+def main(argv=None):
+    import uvicorn
+
+    args = build_parser().parse_args(argv)
+    config = MockConfig(**{key: value for key, value in vars(args).items() if key not in ("host", "port")})
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+压测工具：对 CRUD 接口和各执行模式（同步、流式、后台运行、批量）发起并发请求，
+统计吞吐量和 p50/p95/p99 延迟
+
+用法（先启动 bench.mock_qwen 和指向它的后端服务）：
+    python -m bench.run_bench --target http://127.0.0.1:8000 --scenarios list,get,execute,stream \\
+        --requests 500 --concurrency 32 --mock-url http://127.0.0.1:9000 --json results.json
+"""
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+
+import httpx
+
+API = "/api/v1"
+
+# 执行类场景使用的工作流：菱形依赖，四次模型调用分三层执行
+BENCH_GRAPH = {
+    "nodes": [
+        {"id": "a", "type": "modelNode", "data": {"label": "Summarize", "prompt": "Summarize the input"}},
+        {"id": "b", "type": "modelNode", "data": {"label": "Keywords", "prompt": "List keywords"}},
+        {"id": "c", "type": "modelNode", "data": {"label": "Sentiment", "prompt": "Classify sentiment"}},
+        {"id": "d", "type": "modelNode", "data": {"label": "Report", "prompt": "Write a short report"}},
+    ],
+    "edges": [
+        {"id": "e1", "source": "a", "target": "b"},
+        {"id": "e2", "source": "a", "target": "c"},
+        {"id": "e3", "source": "b", "target": "d"},
+        {"id": "e4", "source": "c", "target": "d"},
+    ],
+}
+
+
+def percentile(samples: List[float], p: float) -> Optional[float]:
+    """
+    最近秩法计算百分位数
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    latencies: List[float] = field(default_factory=list)
+    first_byte: List[float] = field(default_factory=list)
+    errors: Dict[str, int] = field(default_factory=dict)
+    items: int = 0
+    elapsed: float = 0.0
+    mock_stats: Optional[dict] = None
+
+    def add_error(self, reason: str):
+        self.errors[reason] = self.errors.get(reason, 0) + 1
+
+    def summary(self) -> dict:
+        ms = [latency * 1000 for latency in self.latencies]
+        result = {
+            "scenario": self.name,
+            "requests": len(self.latencies) + sum(self.errors.values()),
+            "ok": len(self.latencies),
+            "errors": self.errors,
+            "seconds": round(self.elapsed, 3),
+            "throughput": round(len(self.latencies) / self.elapsed, 2) if self.elapsed else None,
+            "p50_ms": percentile(ms, 50),
+            "p95_ms": percentile(ms, 95),
+            "p99_ms": percentile(ms, 99),
+            "max_ms": max(ms) if ms else None,
+        }
+        if self.first_byte:
+            result["ttfb_p50_ms"] = percentile([t * 1000 for t in self.first_byte], 50)
+            result["ttfb_p95_ms"] = percentile([t * 1000 for t in self.first_byte], 95)
+        if self.items:
+            result["items_per_second"] = round(self.items / self.elapsed, 2) if self.elapsed else None
+        if self.mock_stats is not None:
+            result["model_calls"] = self.mock_stats.get("requests")
+            result["model_max_in_flight"] = self.mock_stats.get("max_in_flight")
+        return result
+
+
+class RequestFailed(Exception):
+    pass
+
+
+class Benchmark:
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.workflow_ids: List[int] = []
+        self.exec_workflow_id: Optional[int] = None
+        self.counter = 0
+
+    def _next(self) -> int:
+        self.counter += 1
+        return self.counter
+
+    async def _check(self, response: httpx.Response, expected=(200,)) -> httpx.Response:
+        if response.status_code not in expected:
+            raise RequestFailed(f"HTTP {response.status_code}")
+        return response
+
+    async def setup(self):
+        """
+        创建压测数据：若干普通工作流，以及一个用于执行类场景的工作流
+        """
+        for i in range(self.args.seed_workflows):
+            response = await self.client.post(f"{API}/workflows/", json={
+                "name": f"bench-{i}", "description": json.dumps(BENCH_GRAPH),
+            })
+            await self._check(response)
+            self.workflow_ids.append(response.json()["id"])
+        response = await self.client.post(f"{API}/workflows/", json={
+            "name": "bench-execute", "description": json.dumps(BENCH_GRAPH),
+        })
+        await self._check(response)
+        self.exec_workflow_id = response.json()["id"]
+
+    def _exec_params(self) -> dict:
+        # 默认每次请求使用不同的输入并关闭响应缓存，测量的是真实的执行路径
+        return {"input_data": f"bench input {self._next()}", "use_cache": str(self.args.use_cache).lower()}
+
+    async def op_list(self, result: ScenarioResult):
+        await self._check(await self.client.get(f"{API}/workflows/", params={"limit": 50}))
+
+    async def op_summary(self, result: ScenarioResult):
+        await self._check(await self.client.get(f"{API}/workflows/summary", params={"limit": 50}))
+
+    async def op_get(self, result: ScenarioResult):
+        workflow_id = self.workflow_ids[self._next() % len(self.workflow_ids)]
+        await self._check(await self.client.get(f"{API}/workflows/{workflow_id}"))
+
+    async def op_create(self, result: ScenarioResult):
+        await self._check(await self.client.post(f"{API}/workflows/", json={
+            "name": f"bench-create-{self._next()}", "description": json.dumps(BENCH_GRAPH),
+        }))
+
+    async def op_update(self, result: ScenarioResult):
+        n = self._next()
+        workflow_id = self.workflow_ids[n % len(self.workflow_ids)]
+        await self._check(await self.client.put(f"{API}/workflows/{workflow_id}", json={"name": f"bench-update-{n}"}))
+
+    async def op_execute(self, result: ScenarioResult):
+        response = await self._check(await self.client.post(
+            f"{API}/workflows/{self.exec_workflow_id}/execute", params=self._exec_params()))
+        # 有节点失败时最终节点没有输出
+        if response.json().get("final_output") is None:
+            raise RequestFailed("execution failed")
+
+    async def op_stream(self, result: ScenarioResult):
+        started = time.perf_counter()
+        failed = False
+        async with self.client.stream("POST", f"{API}/workflows/{self.exec_workflow_id}/execute/stream",
+                                      params=self._exec_params()) as response:
+            await self._check(response)
+            first = True
+            async for line in response.aiter_lines():
+                if first and line:
+                    result.first_byte.append(time.perf_counter() - started)
+                    first = False
+                if line.startswith("event: run-failed"):
+                    failed = True
+        if failed:
+            raise RequestFailed("execution failed")
+
+    async def op_run(self, result: ScenarioResult):
+        response = await self._check(await self.client.post(
+            f"{API}/workflows/{self.exec_workflow_id}/runs", params=self._exec_params()), expected=(202,))
+        run_id = response.json()["id"]
+        while True:
+            await asyncio.sleep(self.args.poll_interval)
+            run = (await self._check(await self.client.get(f"{API}/runs/{run_id}"))).json()
+            if run["status"] == "succeeded":
+                return
+            if run["status"] == "failed":
+                raise RequestFailed("run failed")
+
+    async def op_batch(self, result: ScenarioResult):
+        n = self._next()
+        body = "\n".join(json.dumps({"input": f"bench batch {n}-{i}"}) for i in range(self.args.batch_size))
+        params = {"concurrency": self.args.batch_concurrency, "use_cache": str(self.args.use_cache).lower()}
+        failed = 0
+        async with self.client.stream("POST", f"{API}/workflows/{self.exec_workflow_id}/batch", params=params,
+                                      content=body, headers={"Content-Type": "application/x-ndjson"}) as response:
+            await self._check(response)
+            async for line in response.aiter_lines():
+                if line:
+                    result.items += 1
+                    failed += json.loads(line)["status"] != "succeeded"
+        if failed:
+            raise RequestFailed("batch items failed")
+
+    async def run_scenario(self, name: str, operation: Callable[[ScenarioResult], Awaitable[None]],
+                           requests: int) -> ScenarioResult:
+        """
+        闭环压测：concurrency 个并发用户，每个用户收到响应后立即发出下一个请求
+        """
+        result = ScenarioResult(name)
+        warmup = ScenarioResult(name)
+        for _ in range(self.args.warmup):
+            try:
+                await operation(warmup)
+            except Exception:
+                pass
+        await self._reset_mock()
+
+        remaining = requests
+        deadline = time.perf_counter() + self.args.duration if self.args.duration else None
+
+        async def user():
+            nonlocal remaining
+            while True:
+                if deadline is not None:
+                    if time.perf_counter() >= deadline:
+                        return
+                elif remaining <= 0:
+                    return
+                else:
+                    remaining -= 1
+                started = time.perf_counter()
+                try:
+                    await operation(result)
+                except RequestFailed as e:
+                    result.add_error(str(e))
+                    continue
+                except httpx.HTTPError as e:
+                    result.add_error(type(e).__name__)
+                    continue
+                result.latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(self.args.concurrency)))
+        result.elapsed = time.perf_counter() - started
+        result.mock_stats = await self._mock_stats()
+        return result
+
+    async def _reset_mock(self):
+        if self.args.mock_url:
+            async with httpx.AsyncClient(base_url=self.args.mock_url) as client:
+                await client.post("/stats/reset")
+
+    async def _mock_stats(self) -> Optional[dict]:
+        if not self.args.mock_url:
+            return None
+        async with httpx.AsyncClient(base_url=self.args.mock_url) as client:
+            return (await client.get("/stats")).json()
+
+
+SCENARIOS = ("list", "summary", "get", "create", "update", "execute", "stream", "run", "batch")
+# 执行类场景耗时较长，默认请求数按比例减少
+HEAVY_SCENARIOS = {"execute": 0.25, "stream": 0.25, "run": 0.25, "batch": 0.02}
+
+
+def format_table(rows: List[dict]) -> str:
+    columns = ["scenario", "ok", "errors", "throughput", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    lines = [columns]
+    for row in rows:
+        cells = []
+        for column in columns:
+            value = row.get(column)
+            if column == "errors":
+                value = sum(value.values())
+            if isinstance(value, float):
+                value = f"{value:.1f}"
+            cells.append("-" if value is None else str(value))
+        lines.append(cells)
+    widths = [max(len(line[i]) for line in lines) for i in range(len(columns))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(line, widths)) for line in lines)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="simpleDify 压测工具")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="后端服务地址")
+    parser.add_argument("--mock-url", help="bench.mock_qwen 地址，提供时统计每个场景的模型调用次数")
+    parser.add_argument("--scenarios", default="list,get,create,execute,stream",
+                        help=f"逗号分隔的场景：{','.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=400, help="CRUD 场景的请求数，执行类场景按比例减少")
+    parser.add_argument("--duration", type=float, help="每个场景的持续秒数，指定时忽略 --requests")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发用户数")
+    parser.add_argument("--warmup", type=int, default=5, help="每个场景正式计时前的预热请求数")
+    parser.add_argument("--seed-workflows", type=int, default=50, help="预先创建的工作流数量")
+    parser.add_argument("--batch-size", type=int, default=50, help="batch 场景每个请求的输入条数")
+    parser.add_argument("--batch-concurrency", type=int, default=8)
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="run 场景轮询运行状态的间隔")
+    parser.add_argument("--use-cache", action="store_true", help="执行时使用模型响应缓存")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", help="将结果写入 JSON 文件")
+    return parser
+
+
+async def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.target, timeout=args.timeout, limits=limits) as client:
+        bench = Benchmark(client, args)
+        await bench.setup()
+        rows = []
+        for name in names:
+            requests = max(1, int(args.requests * HEAVY_SCENARIOS.get(name, 1)))
+            result = await bench.run_scenario(name, getattr(bench, f"op_{name}"), requests)
+            rows.append(result.summary())
+            print(f"{name}: {rows[-1]}", file=sys.stderr)
+
+    print(format_table(rows))
+    if args.json:
+        report = {
+            "params": {key: value for key, value in vars(args).items() if key != "json"},
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": rows,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if any(row["errors"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
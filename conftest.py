@@ -0,0 +1,24 @@
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.database import Base, apply_sqlite_profile
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def sessions(tmp_path):
+    """
+    每个测试使用独立的 SQLite 文件数据库（已建表），返回异步会话工厂
+    使用该夹具的测试需要标记 @pytest.mark.anyio
+    """
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", connect_args={"timeout": 15})
+    # 与应用相同的连接参数（WAL、外键检查等）
+    apply_sqlite_profile(engine.sync_engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
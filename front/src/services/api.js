@@ -15,11 +15,47 @@ export const getWorkflow = (id) => api.get(`/workflows/${id}`);
 export const createWorkflow = (data) => api.post('/workflows/', data);
 export const updateWorkflow = (id, data) => api.put(`/workflows/${id}`, data);
 export const deleteWorkflow = (id) => api.delete(`/workflows/${id}`);
+// 使用 JSON Patch 局部更新工作流，etag 为上次响应中的 ETag（用于乐观并发检查）
+export const patchWorkflow = (id, operations, etag = null) => api.patch(`/workflows/${id}`, operations, {
+  headers: {
+    'Content-Type': 'application/json-patch+json',
+    ...(etag ? { 'If-Match': etag } : {}),
+  },
+});
 export const executeWorkflow = (id, inputData = null) => {
   const data = inputData ? { input_data: inputData } : {};
   return api.post(`/workflows/${id}/execute`, data);
 };
 
+// 以SSE方式执行工作流，onEvent(event, data) 会在每个事件到达时调用
+export const streamWorkflowExecution = async (id, inputData = null, onEvent = () => {}) => {
+  const query = inputData ? `?input_data=${encodeURIComponent(inputData)}` : '';
+  const response = await fetch(`${API_BASE_URL}/workflows/${id}/execute/stream${query}`, { method: 'POST' });
+  if (!response.ok) {
+    throw new Error(`Failed to execute workflow: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const messages = buffer.split('\n\n');
+    buffer = messages.pop();
+    messages.forEach((message) => {
+      let event = 'message';
+      let data = '';
+      message.split('\n').forEach((line) => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      });
+      if (data) onEvent(event, JSON.parse(data));
+    });
+  }
+};
+
 // Model APIs
 export const callQwenPlus = (data) => api.post('/models/qwen-plus', data);
 
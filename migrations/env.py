@@ -0,0 +1,53 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.core.database import Base, engine
+from app.core.migrations import foreign_keys_disabled
+import app.models.workflow
+
+config = context.config
+
+# 通过 alembic 命令行运行时按 alembic.ini 配置日志，应用内调用时沿用应用的日志配置
+if config.config_file_name is not None and not config.attributes.get("connection"):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    """
+    生成SQL脚本而不连接数据库（alembic upgrade head --sql）
+    """
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # 应用内调用（app.core.migrations）时复用传入的连接，外键检查已在调用方关闭
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection, foreign_keys_disabled(connection):
+        _run(connection)
+
+
+def _run(connection):
+    # SQLite 不支持大部分 ALTER TABLE，使用 batch 模式重建表
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
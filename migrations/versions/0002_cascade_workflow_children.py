@@ -0,0 +1,46 @@
+"""cascade deletes of workflow runs and batches
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# SQLite 上由 0001 建立的外键没有名称，重建表时按该约定命名后才能删除
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+FOREIGN_KEYS = [
+    ('workflow_runs', 'workflow_id', 'workflows'),
+    ('workflow_batches', 'workflow_id', 'workflows'),
+    ('batch_items', 'batch_id', 'workflow_batches'),
+]
+
+
+def _replace_foreign_key(table: str, column: str, referred: str, ondelete: Union[str, None]):
+    # PostgreSQL/MySQL 上使用数据库生成的约定名称删除原外键
+    existing = next((fk['name'] for fk in sa.inspect(op.get_bind()).get_foreign_keys(table)
+                     if fk['constrained_columns'] == [column]), None)
+    name = f'fk_{table}_{column}_{referred}'
+    with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(existing or name, type_='foreignkey')
+        batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    for table, column, referred in FOREIGN_KEYS:
+        _replace_foreign_key(table, column, referred, 'CASCADE')
+
+
+def downgrade() -> None:
+    for table, column, referred in reversed(FOREIGN_KEYS):
+        _replace_foreign_key(table, column, referred, None)
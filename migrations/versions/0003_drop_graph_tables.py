@@ -0,0 +1,65 @@
+"""drop workflow_nodes and workflow_edges
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 14:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 节点和连线只保存在 workflows.description 中，这两张表没有读取方
+
+
+def upgrade() -> None:
+    # 引入迁移之前由 create_all 建立的数据库（标记为 0001 后升级）可能没有这两张表
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    for table in ('workflow_nodes', 'workflow_edges'):
+        if table not in tables:
+            continue
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_id')
+
+        op.drop_table(table)
+
+
+def downgrade() -> None:
+    # 只重建表结构，不回填数据
+    op.create_table('workflow_edges',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('workflow_id', sa.Integer(), nullable=False),
+    sa.Column('edge_id', sa.String(), nullable=False),
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('target', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['workflow_id'], ['workflows.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('workflow_id', 'edge_id', name='uq_workflow_edges_workflow_edge'),
+    sqlite_autoincrement=True
+    )
+    with op.batch_alter_table('workflow_edges', schema=None) as batch_op:
+        batch_op.create_index('ix_workflow_edges_id', ['id'], unique=False)
+
+    op.create_table('workflow_nodes',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('workflow_id', sa.Integer(), nullable=False),
+    sa.Column('node_id', sa.String(), nullable=False),
+    sa.Column('type', sa.String(), nullable=True),
+    sa.Column('position_x', sa.Float(), nullable=True),
+    sa.Column('position_y', sa.Float(), nullable=True),
+    sa.Column('data', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['workflow_id'], ['workflows.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('workflow_id', 'node_id', name='uq_workflow_nodes_workflow_node'),
+    sqlite_autoincrement=True
+    )
+    with op.batch_alter_table('workflow_nodes', schema=None) as batch_op:
+        batch_op.create_index('ix_workflow_nodes_id', ['id'], unique=False)
@@ -0,0 +1,50 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.crud import batch_crud
+from app.models.workflow import Workflow, WorkflowBatch
+
+
+async def _create_batch(sessions, status: str = batch_crud.PENDING) -> int:
+    async with sessions() as db:
+        workflow = Workflow(name="w")
+        db.add(workflow)
+        await db.flush()
+        batch = await batch_crud.create_batch(db, workflow.id, ["a", "b"], 2, status=status)
+        return batch.id
+
+
+async def _claim(sessions, batch_id, lease_seconds=60):
+    async with sessions() as db:
+        return await batch_crud.claim_batch(db, batch_id, lease_seconds)
+
+
+@pytest.mark.anyio
+async def test_concurrent_resumes_claim_once(sessions):
+    batch_id = await _create_batch(sessions)
+    claimed = await asyncio.gather(*(_claim(sessions, batch_id) for _ in range(5)))
+    assert sorted(claimed) == [False] * 4 + [True]
+
+
+@pytest.mark.anyio
+async def test_running_and_completed_batches_are_not_claimed(sessions):
+    batch_id = await _create_batch(sessions, status=batch_crud.RUNNING)
+    assert not await _claim(sessions, batch_id)
+    async with sessions() as db:
+        await batch_crud.set_batch_status(db, batch_id, batch_crud.COMPLETED)
+    assert not await _claim(sessions, batch_id, lease_seconds=0)
+
+
+@pytest.mark.anyio
+async def test_stale_running_batch_can_be_claimed(sessions):
+    batch_id = await _create_batch(sessions, status=batch_crud.RUNNING)
+    async with sessions() as db:
+        # 执行者退出后不再刷新心跳
+        await db.execute(update(WorkflowBatch).where(WorkflowBatch.id == batch_id)
+                         .values(updated_at=datetime.utcnow() - timedelta(seconds=120)))
+        await db.commit()
+    assert await _claim(sessions, batch_id)
+    assert not await _claim(sessions, batch_id)
@@ -0,0 +1,92 @@
+import gc
+import json
+import os
+import time
+
+import pytest
+
+from app.crud import async_workflow_crud, run_crud
+from app.schemas.workflow import WorkflowCreate
+from app.services.workflow_execution_service import WorkflowExecutionService
+from app.utils.blob_store import BlobStore, blob_store
+
+LONG_AGO = 10 * 86400
+
+
+def _age_files(path: str, seconds: float):
+    old = time.time() - seconds
+    for root, _, names in os.walk(path):
+        for name in names:
+            os.utime(os.path.join(root, name), (old, old))
+
+
+def test_prune_skips_referenced_blobs(tmp_path):
+    store = BlobStore(str(tmp_path), inline_max_bytes=0, ttl=60, max_bytes=1024 ** 3)
+    kept = store.put_text("kept" * 100)
+    dropped = store.put_text("dropped" * 100)
+    dropped_path = dropped._path
+    del dropped
+    gc.collect()
+    _age_files(str(tmp_path), LONG_AGO)
+
+    assert store.prune() == 1
+    assert not os.path.exists(dropped_path)
+    assert kept.text() == "kept" * 100
+
+    del kept
+    gc.collect()
+    assert store.prune() == 1
+
+
+def test_automatic_prune_skips_referenced_blobs(tmp_path):
+    store = BlobStore(str(tmp_path), inline_max_bytes=0, ttl=60, max_bytes=1024 ** 3)
+    kept = store.put_text("kept" * 100)
+    dropped = store.put_text("dropped" * 100)
+    dropped_path = dropped._path
+    del dropped
+    gc.collect()
+    _age_files(str(tmp_path), LONG_AGO)
+
+    # 每写入100个新块自动清理一次
+    for i in range(98):
+        store.put_text(f"filler {i}")
+    assert store.stats["pruned"] == 1
+    assert not os.path.exists(dropped_path)
+    assert kept.text() == "kept" * 100
+
+
+class _FakeModelService:
+    def __init__(self):
+        self.calls = 0
+
+    async def process_with_qwen_plus(self, prompt, **kwargs):
+        self.calls += 1
+        return {"success": True, "cached": False,
+                "data": {"choices": [{"message": {"content": f"out{self.calls}:" + "x" * 200_000}}]}}
+
+
+@pytest.mark.anyio
+async def test_old_run_readable_after_prune(sessions, tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "path", str(tmp_path / "blobs"))
+    monkeypatch.setattr(blob_store, "inline_max_bytes", 1024)
+    nodes = [{"id": f"n{i}", "type": "modelNode", "data": {"label": f"N{i}", "prompt": "p {{input}}"}}
+             for i in range(2)]
+    description = json.dumps({"nodes": nodes, "edges": [{"id": "e", "source": "n0", "target": "n1"}]})
+    async with sessions() as db:
+        workflow = await async_workflow_crud.create_workflow(db, WorkflowCreate(name="w", description=description))
+        run = await run_crud.create_run(db, workflow.id, "in")
+        await run_crud.claim_next_run(db, "worker")
+        service = WorkflowExecutionService(db, _FakeModelService())
+        result = await service.run_plan(await service.load_plan(workflow.id), "in", use_cache=False)
+        await run_crud.finish_run(db, run.id, "worker", result)
+
+    # 执行结束后块文件不再被引用，超过保留时间后全部清理
+    del service, result
+    gc.collect()
+    _age_files(blob_store.path, LONG_AGO)
+    assert blob_store.prune() == 2
+
+    async with sessions() as db:
+        result = json.loads((await run_crud.get_run(db, run.id)).result)
+    assert [entry["result"]["data"] for entry in result["results"]] == [f"out{i}:" + "x" * 200_000 for i in (1, 2)]
+    assert result["final_output"] == "out2:" + "x" * 200_000
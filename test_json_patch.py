@@ -0,0 +1,51 @@
+import pytest
+
+from app.utils.json_patch import JsonPatchError, apply_patch
+
+
+def _graph():
+    return {"nodes": [{"id": "a"}, {"id": "b"}, {"id": "c"}], "flag": True, "count": 1}
+
+
+def test_remove_reports_removed_value_not_shifted_element():
+    changes = []
+    doc = apply_patch(_graph(), [{"op": "remove", "path": "/nodes/1"}], changes)
+    assert doc["nodes"] == [{"id": "a"}, {"id": "c"}]
+    assert changes == [{"op": "remove", "path": "/nodes/1", "old_value": {"id": "b"}}]
+
+
+def test_move_reports_source_and_moved_value():
+    changes = []
+    apply_patch(_graph(), [{"op": "move", "from": "/nodes/0", "path": "/nodes/2"}], changes)
+    assert changes == [{"op": "move", "from": "/nodes/0", "path": "/nodes/2", "value": {"id": "a"}}]
+
+
+def test_changes_are_recorded_in_order():
+    changes = []
+    apply_patch(_graph(), [
+        {"op": "add", "path": "/nodes/-", "value": {"id": "d"}},
+        {"op": "replace", "path": "/nodes/3/id", "value": "e"},
+        {"op": "remove", "path": "/nodes/0"},
+    ], changes)
+    assert changes == [
+        {"op": "add", "path": "/nodes/3", "value": {"id": "d"}},
+        {"op": "replace", "path": "/nodes/3/id", "value": "e", "old_value": "d"},
+        {"op": "remove", "path": "/nodes/0", "old_value": {"id": "a"}},
+    ]
+
+
+@pytest.mark.parametrize("path, value", [
+    ("/flag", 1),
+    ("/count", True),
+    ("/nodes", [{"id": "a"}, {"id": "b"}, {"id": 1}]),
+    ("/nodes/0", {"id": "a", "x": None}),
+])
+def test_test_op_requires_json_type_equality(path, value):
+    with pytest.raises(JsonPatchError):
+        apply_patch(_graph(), [{"op": "test", "path": path, "value": value}])
+
+
+def test_test_op_compares_numbers_by_value():
+    # RFC 6902 4.6：数字按数值比较
+    apply_patch(_graph(), [{"op": "test", "path": "/count", "value": 1.0},
+                           {"op": "test", "path": "/flag", "value": True}])
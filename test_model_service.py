@@ -0,0 +1,50 @@
+import asyncio
+
+from app.services.model_service import ModelService
+from app.utils.qwen_client import QwenClient
+from app.utils.rate_limiter import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+
+class _SlowClient(QwenClient):
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+        self.finished = 0
+
+    async def send(self, data, priority=PRIORITY_INTERACTIVE):
+        self.sent.append(priority)
+        await asyncio.sleep(0.05)
+        self.finished += 1
+        return {"choices": [{"message": {"content": "ok"}}]}
+
+
+def test_identical_calls_are_merged_per_priority():
+    client = _SlowClient()
+    service = ModelService(client)
+
+    async def run():
+        return await asyncio.gather(service.process_with_qwen_plus("p"), service.process_with_qwen_plus("p"),
+                                    service.process_with_qwen_plus("p", priority=PRIORITY_BATCH))
+
+    results = asyncio.run(run())
+    assert all(result["success"] for result in results)
+    # 相同优先级的两个调用合并，批量优先级的调用单独发送
+    assert sorted(client.sent) == [PRIORITY_INTERACTIVE, PRIORITY_BATCH]
+
+
+def test_cancelled_waiter_leaves_shared_call_running():
+    client = _SlowClient()
+    service = ModelService(client)
+
+    async def run():
+        leader = asyncio.ensure_future(service.process_with_qwen_plus("p"))
+        follower = asyncio.ensure_future(service.process_with_qwen_plus("p"))
+        await asyncio.sleep(0.01)
+        # 发起调用的请求取消后，另一个等待者仍能得到结果
+        leader.cancel()
+        return leader, await follower
+
+    leader, result = asyncio.run(run())
+    assert leader.cancelled()
+    assert result["success"] and result["data"]["choices"][0]["message"]["content"] == "ok"
+    assert client.sent == [PRIORITY_INTERACTIVE] and client.finished == 1
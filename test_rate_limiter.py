@@ -0,0 +1,37 @@
+from app.utils.rate_limiter import LATENCY_PER_TOKEN, ModelGovernor
+
+
+def test_long_completions_do_not_collapse_limit():
+    governor = ModelGovernor(initial_concurrency=8, latency_tolerance=2.0, latency_window=10, cooldown=0)
+    # 短输出和长输出交替：整体耗时相差百倍，每个 token 的耗时相同
+    for i in range(200):
+        tokens = 5 if i % 2 else 500
+        governor._on_success(LATENCY_PER_TOKEN, tokens * 0.02 / tokens)
+    assert governor.stats["decreases"] == 0
+    assert governor.limit > 8
+
+
+def test_single_slow_sample_does_not_decrease():
+    governor = ModelGovernor(initial_concurrency=8, latency_tolerance=2.0, latency_window=10, cooldown=0)
+    for _ in range(30):
+        governor._on_success(LATENCY_PER_TOKEN, 0.02)
+    governor._on_success(LATENCY_PER_TOKEN, 1.0)
+    assert governor.stats["decreases"] == 0
+
+
+def test_sustained_latency_increase_decreases_limit():
+    governor = ModelGovernor(initial_concurrency=8, latency_tolerance=2.0, latency_window=10, cooldown=0)
+    for _ in range(30):
+        governor._on_success(LATENCY_PER_TOKEN, 0.02)
+    for _ in range(10):
+        governor._on_success(LATENCY_PER_TOKEN, 0.2)
+    assert governor.stats["decreases"] == 1
+
+
+def test_latency_decrease_disabled_by_default():
+    governor = ModelGovernor(initial_concurrency=8, cooldown=0)
+    for latency in [0.02] * 30 + [1.0] * 30:
+        governor._on_success(LATENCY_PER_TOKEN, latency)
+    assert governor.stats["decreases"] == 0
+    governor._on_rate_limited()
+    assert governor.stats["decreases"] == 1
@@ -0,0 +1,42 @@
+import asyncio
+
+from app.utils.qwen_client import QwenClient
+from app.utils.rate_limiter import ModelGovernor
+from app.utils.resilience import ResiliencePolicy
+
+
+def _client(policy, post_seconds):
+    client = QwenClient(governor=ModelGovernor(initial_concurrency=1, max_concurrency=1), resilience=policy)
+
+    async def post(data):
+        await asyncio.sleep(post_seconds)
+        return {"choices": [], "usage": None}
+
+    client._post = post
+    return client
+
+
+def test_latency_excludes_governor_wait():
+    policy = ResiliencePolicy()
+    client = _client(policy, 0.05)
+
+    async def run():
+        await asyncio.gather(*(client.send({"messages": []}) for _ in range(3)))
+
+    asyncio.run(run())
+    # 第三个请求排队约0.1秒，延迟样本只包含上游请求的耗时
+    assert len(policy.latency) == 3
+    assert policy.latency.percentile(100) < 0.09
+
+
+def test_no_hedge_while_calls_wait():
+    policy = ResiliencePolicy(hedge_enabled=True, hedge_min_delay=0.02)
+    client = _client(policy, 0.06)
+
+    async def run():
+        await asyncio.gather(*(client.send({"messages": []}) for _ in range(2)))
+
+    asyncio.run(run())
+    # 第一个请求到达对冲时间时第二个请求在排队，不对冲；第二个请求没有排队者，正常对冲
+    assert policy.stats["hedges_skipped"] == 1
+    assert policy.stats["hedges_sent"] == 1
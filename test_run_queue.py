@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from sqlalchemy import Update, func, select
+
+from app.crud import run_crud
+from app.models.workflow import Workflow, WorkflowRun
+
+
+async def _claim_concurrently(sessions, limit: int, rounds: int = 20):
+    max_running = 0
+    for _ in range(rounds):
+        async with sessions() as db:
+            workflow = Workflow(name="w")
+            db.add(workflow)
+            await db.flush()
+            workflow_id = workflow.id
+            db.add_all([WorkflowRun(workflow_id=workflow_id, status=run_crud.QUEUED) for _ in range(3)])
+            await db.commit()
+
+        # 两个工作者都查询完可领取的运行后才执行各自的第一个 UPDATE，构造最容易超出上限的交错顺序
+        barrier = asyncio.Barrier(2)
+
+        async def claim(worker_id):
+            async with sessions() as db:
+                execute = db.execute
+                first_update = True
+
+                async def interleaved_execute(statement, *args, **kwargs):
+                    nonlocal first_update
+                    if first_update and isinstance(statement, Update):
+                        first_update = False
+                        await barrier.wait()
+                    return await execute(statement, *args, **kwargs)
+
+                db.execute = interleaved_execute
+                return await run_crud.claim_next_run(db, worker_id, per_workflow_limit=limit)
+
+        await asyncio.gather(claim("worker-1"), claim("worker-2"))
+        async with sessions() as db:
+            running = await db.scalar(
+                select(func.count(WorkflowRun.id))
+                .filter(WorkflowRun.workflow_id == workflow_id, WorkflowRun.status == run_crud.RUNNING)
+            )
+        max_running = max(max_running, running)
+    return max_running
+
+
+@pytest.mark.anyio
+async def test_concurrent_claims_respect_per_workflow_limit(sessions):
+    assert await _claim_concurrently(sessions, limit=1) == 1
+
+
+@pytest.mark.anyio
+async def test_concurrent_claims_without_limit(sessions):
+    assert await _claim_concurrently(sessions, limit=0, rounds=1) == 2
+
+
+class _StaleResult:
+    def __init__(self, row):
+        self._row = row
+
+    def first(self):
+        return self._row
+
+
+@pytest.mark.anyio
+async def test_claim_rechecks_limit_in_update(sessions):
+    async with sessions() as db:
+        workflow = Workflow(name="w")
+        db.add(workflow)
+        await db.flush()
+        workflow_id = workflow.id
+        runs = [WorkflowRun(workflow_id=workflow_id, status=run_crud.QUEUED) for _ in range(2)]
+        db.add_all(runs)
+        await db.flush()
+        second_run_id = runs[1].id
+        await db.commit()
+
+    async with sessions() as db:
+        assert await run_crud.claim_next_run(db, "worker-1", per_workflow_limit=1) is not None
+
+    # 另一个工作者在上面的领取之前查询到第二个运行（例如读到旧快照），领取时上限仍然生效
+    async with sessions() as db:
+        execute = db.execute
+        stale = True
+
+        async def stale_execute(statement, *args, **kwargs):
+            nonlocal stale
+            if stale:
+                stale = False
+                return _StaleResult((second_run_id, workflow_id))
+            return await execute(statement, *args, **kwargs)
+
+        db.execute = stale_execute
+        assert await run_crud.claim_next_run(db, "worker-2", per_workflow_limit=1) is None
@@ -0,0 +1,21 @@
+import os
+
+import uvicorn
+
+from app import serve
+from app.core import migrations
+from app.core.config import settings
+
+
+def test_launcher_migrates_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(migrations, "upgrade_database", lambda: calls.append("migrate"))
+    # workers=1 时 uvicorn 在同一进程中加载应用，启动钩子读取的是这里的配置对象
+    monkeypatch.setattr(uvicorn, "run", lambda *args, **kwargs: calls.append(settings.DB_MIGRATE_ON_STARTUP))
+    monkeypatch.setattr(settings, "DB_MIGRATE_ON_STARTUP", True)
+    monkeypatch.setenv("DB_MIGRATE_ON_STARTUP", "true")
+
+    serve.main(["--workers", "1"])
+
+    assert calls == ["migrate", False]
+    assert os.environ["DB_MIGRATE_ON_STARTUP"] == "false"
@@ -0,0 +1,38 @@
+import pytest
+
+from app.crud import async_task_crud, async_workflow_crud
+from app.models.workflow import Workflow
+from app.schemas.task import TaskCreate, TaskUpdate
+
+
+@pytest.mark.anyio
+async def test_task_writes_change_workflow_version(sessions):
+    async def version(workflow_id):
+        async with sessions() as db:
+            return (await async_workflow_crud.get_workflow_version(db, workflow_id)).updated_at
+
+    async with sessions() as db:
+        workflows = [Workflow(name="a"), Workflow(name="b")]
+        db.add_all(workflows)
+        await db.commit()
+        first, second = workflows[0].id, workflows[1].id
+
+    versions = [await version(first)]
+    async with sessions() as db:
+        task = await async_task_crud.create_task(db, TaskCreate(workflow_id=first, name="t", order=0))
+    versions.append(await version(first))
+    async with sessions() as db:
+        await async_task_crud.update_task(db, task.id, TaskUpdate(workflow_id=first, name="t2", order=0))
+    versions.append(await version(first))
+    # 把任务移到另一个工作流时两个工作流的版本都变化
+    second_before = await version(second)
+    async with sessions() as db:
+        await async_task_crud.update_task(db, task.id, TaskUpdate(workflow_id=second, name="t2", order=0))
+    versions.append(await version(first))
+    assert len(set(versions)) == len(versions)
+    assert await version(second) != second_before
+
+    second_before = await version(second)
+    async with sessions() as db:
+        await async_task_crud.delete_task(db, task.id)
+    assert await version(second) != second_before
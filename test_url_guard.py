@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.execution_plan import CompiledNode
+from app.services.node_executors import HTTPExecutor, NodeContext
+from app.utils import http_client, url_guard
+from app.utils.url_guard import BlockedURLError, check_url, host_matches, is_public_address
+
+
+@pytest.mark.parametrize("address", ["127.0.0.1", "10.1.2.3", "172.16.0.1", "192.168.1.1", "169.254.169.254",
+                                     "100.64.0.1", "0.0.0.0", "224.0.0.1", "::1", "fe80::1", "fc00::1",
+                                     "::ffff:127.0.0.1"])
+def test_non_public_addresses(address):
+    assert not is_public_address(address)
+
+
+def test_public_addresses():
+    assert is_public_address("93.184.216.34")
+    assert is_public_address("2606:2800:220:1:248:1893:25c8:1946")
+
+
+def test_host_matches():
+    patterns = ["api.example.com", ".internal.test"]
+    assert host_matches("API.example.com", patterns)
+    assert host_matches("internal.test", patterns)
+    assert host_matches("svc.internal.test", patterns)
+    assert not host_matches("example.com", patterns)
+    assert not host_matches("evilinternal.test", patterns)
+
+
+def _check(url, allowed_hosts=(), allow_private=False):
+    return asyncio.run(check_url(httpx.URL(url), list(allowed_hosts), allow_private))
+
+
+@pytest.mark.parametrize("url", ["file:///etc/passwd", "ftp://example.com/", "http://127.0.0.1:8000/",
+                                 "http://localhost/", "http://169.254.169.254/latest/meta-data/",
+                                 "http://0x7f.1/", "http://[::1]/"])
+def test_blocked_urls(url):
+    with pytest.raises(BlockedURLError):
+        _check(url)
+
+
+def test_resolved_address_is_pinned(monkeypatch):
+    async def resolve(host, port):
+        return ["93.184.216.34"]
+
+    monkeypatch.setattr(url_guard, "resolve", resolve)
+    target, options = _check("https://example.com:8443/a?b=1")
+    assert str(target) == "https://93.184.216.34:8443/a?b=1"
+    assert options == {"headers": {"Host": "example.com:8443"}, "extensions": {"sni_hostname": "example.com"}}
+
+
+def test_any_private_address_blocks(monkeypatch):
+    async def resolve(host, port):
+        return ["93.184.216.34", "10.0.0.1"]
+
+    monkeypatch.setattr(url_guard, "resolve", resolve)
+    with pytest.raises(BlockedURLError):
+        _check("http://example.com/")
+
+
+def test_allowlist():
+    target, options = _check("http://localhost:8000/x", allowed_hosts=["localhost"])
+    assert str(target) == "http://localhost:8000/x" and options == {}
+    with pytest.raises(BlockedURLError):
+        _check("http://example.com/", allowed_hosts=["localhost"])
+
+
+def test_allow_private():
+    assert _check("http://127.0.0.1/", allow_private=True)[0] == httpx.URL("http://127.0.0.1/")
+
+
+def test_http_node_rejects_private_url():
+    node = CompiledNode(task_id=1, name="h", type="http", order=0, node_id="h",
+                        config={"node_data": {"url": "http://127.0.0.1:9/{{input}}"}}, prompt="", input_prefix="",
+                        input_suffix="", max_tokens=0, temperature=0.0, use_cache=False)
+    result = asyncio.run(HTTPExecutor().execute(node, "x", NodeContext(model_service=None)))
+    assert result["success"] is False and "not allowed" in result["error"]
+
+
+def test_http_node_does_not_keep_cookies(monkeypatch):
+    sent = []
+
+    def handler(request):
+        sent.append(request.headers.get("cookie"))
+        return httpx.Response(200, text="ok", headers={"Set-Cookie": "session=abc; Path=/"})
+
+    client = http_client._build_node_client()
+    client._transport = httpx.MockTransport(handler)
+    monkeypatch.setattr(http_client, "_node_client", client)
+    monkeypatch.setattr(settings, "HTTP_NODE_ALLOWED_HOSTS", "example.com")
+    node = CompiledNode(task_id=1, name="h", type="http", order=0, node_id="h",
+                        config={"node_data": {"url": "http://example.com/{{input}}"}}, prompt="", input_prefix="",
+                        input_suffix="", max_tokens=0, temperature=0.0, use_cache=False)
+
+    async def run_twice():
+        executor = HTTPExecutor()
+        return [await executor.execute(node, text, NodeContext(model_service=None)) for text in ("a", "b")]
+
+    results = asyncio.run(run_twice())
+    assert [result["data"] for result in results] == ["ok", "ok"]
+    assert sent == [None, None] and len(client.cookies) == 0
@@ -0,0 +1,25 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.crud import async_workflow_crud, batch_crud, run_crud
+from app.models.workflow import BatchItem, Workflow, WorkflowBatch, WorkflowRun
+
+
+@pytest.mark.anyio
+async def test_delete_workflow_removes_runs_and_batches(sessions):
+    async with sessions() as db:
+        workflows = [Workflow(name="deleted"), Workflow(name="kept")]
+        db.add_all(workflows)
+        await db.commit()
+        for workflow in workflows:
+            await run_crud.create_run(db, workflow.id, "in")
+            await batch_crud.create_batch(db, workflow.id, ["a", "b"], 2)
+
+    async with sessions() as db:
+        assert await async_workflow_crud.delete_workflow(db, workflows[0].id) is not None
+
+    async with sessions() as db:
+        counts = {}
+        for model in (WorkflowRun, WorkflowBatch, BatchItem):
+            counts[model.__tablename__] = await db.scalar(select(func.count()).select_from(model))
+    assert counts == {"workflow_runs": 1, "workflow_batches": 1, "batch_items": 2}
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+from sqlalchemy import event, select
+
+from app.crud import async_workflow_crud
+from app.models.workflow import Task
+from app.schemas.workflow import WorkflowCreate, WorkflowUpdate
+
+
+def _description(nodes, x=0):
+    return json.dumps({
+        "nodes": [{"id": node_id, "type": "modelNode", "position": {"x": x + i * 100, "y": 0},
+                   "data": {"label": node_id.upper(), "prompt": prompt}}
+                  for i, (node_id, prompt) in enumerate(nodes)],
+        "edges": [{"id": f"e{i}", "source": source, "target": target}
+                  for i, ((source, _), (target, _)) in enumerate(zip(nodes, nodes[1:]))],
+    })
+
+
+async def _task_ids(sessions, workflow_id):
+    async with sessions() as db:
+        result = await db.execute(select(Task.id, Task.config).filter(Task.workflow_id == workflow_id))
+        return {json.loads(config)["node_id"]: task_id for task_id, config in result}
+
+
+async def _save(sessions, workflow_id, description):
+    async with sessions() as db:
+        await async_workflow_crud.update_workflow(db, workflow_id, WorkflowUpdate(name="w", description=description))
+
+
+@pytest.mark.anyio
+async def test_task_ids_stable_across_saves(sessions):
+    async with sessions() as db:
+        workflow = await async_workflow_crud.create_workflow(
+            db, WorkflowCreate(name="w", description=_description([("a", "pa"), ("b", "pb")])))
+    before = await _task_ids(sessions, workflow.id)
+
+    # 修改一个节点的提示、新增一个节点
+    await _save(sessions, workflow.id, _description([("a", "pa"), ("b", "pb2"), ("c", "pc")]))
+    after = await _task_ids(sessions, workflow.id)
+    assert after["a"] == before["a"] and after["b"] == before["b"] and "c" in after
+
+    # 删除节点只删除对应的任务
+    await _save(sessions, workflow.id, _description([("a", "pa"), ("c", "pc")]))
+    assert await _task_ids(sessions, workflow.id) == {"a": after["a"], "c": after["c"]}
+
+
+@pytest.mark.anyio
+async def test_position_only_save_writes_no_task_rows(sessions):
+    nodes = [("a", "pa"), ("b", "pb")]
+    async with sessions() as db:
+        workflow = await async_workflow_crud.create_workflow(db, WorkflowCreate(name="w", description=_description(nodes)))
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.split(None, 1)[0].upper() in ("INSERT", "UPDATE", "DELETE"):
+            statements.append(statement)
+
+    engine = sessions.kw["bind"].sync_engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        await _save(sessions, workflow.id, _description(nodes, x=250))
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert len(statements) == 1 and statements[0].startswith("UPDATE workflows")
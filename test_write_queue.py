@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.database import Base, create_writer_engine
+from app.models.workflow import Workflow
+from app.services.write_queue import GroupCommitSession, WriteQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    engine = create_writer_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    # 较长的时间窗口让同时提交的操作落在同一组
+    queue = WriteQueue(window=0.05)
+    queue._session_factory = sessionmaker(bind=engine, class_=GroupCommitSession, autoflush=False,
+                                          expire_on_commit=False)
+    yield queue
+    engine.dispose()
+
+
+def _names(queue):
+    with queue._session_factory() as session:
+        return sorted(session.scalars(select(Workflow.name)))
+
+
+def _add(session, name, fail=False):
+    session.add(Workflow(name=name))
+    session.commit()
+    if fail:
+        raise ValueError(name)
+    return name
+
+
+@pytest.mark.anyio
+async def test_failed_operation_rolls_back_only_its_savepoint(queue):
+    await queue.start()
+    results = await asyncio.gather(queue.submit(_add, "a"), queue.submit(_add, "b", True), queue.submit(_add, "c"),
+                                   return_exceptions=True)
+    await queue.stop()
+
+    assert results[0] == "a" and results[2] == "c" and isinstance(results[1], ValueError)
+    assert _names(queue) == ["a", "c"]
+    assert queue.stats["commits"] == 1 and queue.stats["failed"] == 1
+
+
+@pytest.mark.anyio
+async def test_commit_error_reaches_every_waiter(queue, monkeypatch):
+    def fail_commit(session):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(Session, "commit", fail_commit)
+    await queue.start()
+    results = await asyncio.gather(queue.submit(_add, "a"), queue.submit(_add, "b"), return_exceptions=True)
+    await queue.stop()
+    monkeypatch.undo()
+
+    assert all(isinstance(result, RuntimeError) and str(result) == "disk full" for result in results)
+    assert _names(queue) == []
+    assert queue.stats["commit_errors"] == 1
+
+
+@pytest.mark.anyio
+async def test_cancelled_operation_is_not_executed(queue):
+    started, release = threading.Event(), threading.Event()
+    executed = []
+
+    def blocking(session):
+        started.set()
+        release.wait(5)
+
+    def record(session):
+        executed.append(True)
+
+    queue.window = 0
+    await queue.start()
+    first = asyncio.ensure_future(queue.submit(blocking))
+    # 第一组在写者线程中执行时，第二个操作在队列中等待
+    while not started.is_set():
+        await asyncio.sleep(0.001)
+    second = asyncio.ensure_future(queue.submit(record))
+    await asyncio.sleep(0)
+    second.cancel()
+    release.set()
+    await first
+    await queue.stop()
+
+    assert second.cancelled() and executed == []